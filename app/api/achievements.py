@@ -7,6 +7,8 @@ from app.db.models.user import User
 from app.db.models.achievement import Achievement, UserAchievement, AchievementRarity, AchievementType
 from app.db.models.grand_prix import GrandPrix
 from app.db.models.season import Season # Import necesario para el joinedload
+from app.services.achievement_catalog import invalidate_achievement_catalog
+from app.services.response_cache import bump_rules_version
 
 router = APIRouter(prefix="/achievements", tags=["Achievements"])
 
@@ -81,8 +83,11 @@ def seed_achievements(db: Session):
             exists.icon = d["icon"]
             exists.rarity = AchievementRarity(d["rare"])
             exists.type = AchievementType(d["type"])
-            
+
+    # Los demás workers recargan el catálogo
+    bump_rules_version(db)
     db.commit()
+    invalidate_achievement_catalog()
     print("✅ Logros actualizados.")
 
 @router.get("/")
@@ -12,6 +12,7 @@ from app.db.models.grand_prix import GrandPrix
 from app.db.models.prediction import Prediction
 from app.db.models.prediction_position import PredictionPosition
 from app.db.models.prediction_event import PredictionEvent
+from app.db.models.rebuild_job import RebuildJob
 from app.db.models.race_result import RaceResult
 from app.db.models.race_position import RacePosition
 from app.db.models.race_event import RaceEvent
@@ -22,13 +23,32 @@ from app.db.models.bingo import BingoSelection
 from app.db.models.bingo import BingoTile
 from app.db.models.avatar import Avatar
 from app.db.models.achievement import Achievement, UserAchievement
-from app.db.models.user_stats import UserStats
+from app.db.models.user_stats import UserStats, UserProfileMetrics
 from app.schemas.season import SeasonCreate
 from typing import Optional
 from pydantic import BaseModel
-from app.services.scoring import calculate_prediction_score
-from app.services.achievements_service import evaluate_race_achievements, rebuild_all_achievements
+from app.services.results_service import (
+    save_race_result,
+    refresh_gp_ranks,
+    score_gp_predictions,
+    capture_gp_context,
+    evaluate_rescored_gp,
+)
+from app.services.season_rules import get_season_rules, invalidate_season_rules
+from app.services.rescoring import rescore_season
+from app.services.packing import pack_positions, repack_season
+from app.services.profile_metrics import refresh_profile_metrics, refresh_gp_profile_metrics
+from app.services.rebuild_jobs import (
+    ACTIVE_STATUSES,
+    create_rebuild_job,
+    job_status,
+    launch_rebuild_job,
+    reopen_rebuild_job,
+)
+from app.services.parallel_rebuild import rebuild_all_achievements_parallel
+from app.services.achievement_catalog import invalidate_achievement_catalog
 from app.services.f1_sync import sync_race_data_manual, sync_qualy_results
+from app.services.response_cache import bump_data_version, bump_rules_version
 from app.core.deps import require_admin
 from app.core.security import hash_password
 
@@ -80,6 +100,7 @@ def create_user(
         acronym=acronym.upper() # <--- GUARDARLO (Siempre mayúsculas)
     )
     db.add(user)
+    bump_data_version(db) # Aparece en rankings y clasificaciones de todas las temporadas
     db.commit()
     db.refresh(user)
     db.close()
@@ -92,7 +113,9 @@ def delete_user(user_id: int, current_user = Depends(require_admin)):
     if not user:
         db.close()
         raise HTTPException(404, "Usuario no encontrado")
+    db.query(UserProfileMetrics).filter(UserProfileMetrics.user_id == user_id).delete()
     db.delete(user)
+    bump_data_version(db)
     db.commit()
     db.close()
     return {"message": "Usuario eliminado"}
@@ -163,6 +186,7 @@ def create_season(
     )
     
     db.add(new_season)
+    bump_data_version(db) # Puede cambiar la temporada activa (bingo)
     db.commit()
     db.refresh(new_season)
     db.close()
@@ -177,8 +201,10 @@ def delete_season(season_id: int, current_user = Depends(require_admin)):
         db.close()
         raise HTTPException(404, "Temporada no encontrada")
     db.delete(season)
+    bump_data_version(db)
     db.commit()
     db.close()
+    invalidate_season_rules(season_id)
     return {"message": "Temporada eliminada"}
 
 
@@ -199,6 +225,7 @@ def toggle_season_active(season_id: int, current_user = Depends(require_admin)):
         # Si ya estaba activa y la queremos desactivar
         season.is_active = False
     
+    bump_data_version(db)
     db.commit()
     db.refresh(season)
     db.close()
@@ -217,6 +244,8 @@ def create_grand_prix(season_id: int, name: str, race_datetime: datetime, curren
         raise HTTPException(404, "Temporada no encontrada")
     gp = GrandPrix(name=name, season_id=season_id, race_datetime=race_datetime)
     db.add(gp)
+    refresh_profile_metrics(db) # El compromiso del radar cuenta los GPs del calendario
+    bump_data_version(db, season_id)
     db.commit()
     db.refresh(gp)
     db.close()
@@ -261,6 +290,8 @@ def create_gp_manual(
         race_datetime=race_datetime
     )
     db.add(new_gp)
+    refresh_profile_metrics(db) # El compromiso del radar cuenta los GPs del calendario
+    bump_data_version(db, season_id)
     db.commit()
     db.refresh(new_gp)
     db.close()
@@ -284,10 +315,16 @@ def update_gp_manual(
         db.close()
         raise HTTPException(404, "GP no encontrado")
 
+    # Si cambia de temporada, cambian las dos
+    bump_data_version(db, gp.season_id)
+    if season_id != gp.season_id:
+        bump_data_version(db, season_id)
+
     gp.name = name
     gp.race_datetime = race_datetime
     gp.season_id = season_id
 
+    refresh_profile_metrics(db) # La fecha cambia compromiso y anticipación del radar
     db.commit()
     db.refresh(gp)
     db.close()
@@ -313,7 +350,9 @@ def delete_gp_manual(gp_id: int, current_user = Depends(require_admin)):
     db.query(Prediction).filter(Prediction.gp_id == gp_id).delete()
     # db.query(RaceResult).filter(RaceResult.gp_id == gp_id).delete()
     
+    bump_data_version(db, gp.season_id)
     db.delete(gp)
+    refresh_profile_metrics(db) # El compromiso del radar cuenta los GPs del calendario
     db.commit()
     db.close()
     return {"message": "GP eliminado correctamente"}
@@ -374,6 +413,8 @@ async def import_gps(
                 db.add(gp)
                 created_count += 1
         
+        refresh_profile_metrics(db) # El compromiso del radar cuenta los GPs del calendario
+        bump_data_version(db, season_id)
         db.commit()
         db.close()
         
@@ -392,7 +433,9 @@ def delete_grand_prix(gp_id: int, current_user = Depends(require_admin)):
     if not gp:
         db.close()
         raise HTTPException(404, "GP no encontrado")
+    bump_data_version(db, gp.season_id)
     db.delete(gp)
+    refresh_profile_metrics(db) # El compromiso del radar cuenta los GPs del calendario
     db.commit()
     db.close()
     return {"message": "GP eliminado"}
@@ -431,6 +474,7 @@ def upsert_race_result(
     gp_id: int,
     positions: dict[int, str],    # {1: "Verstappen", 2: "Leclerc", ...}
     events: dict[str, str],       # {"FASTEST_LAP": "Verstappen", "SAFETY_CAR": "Yes"}
+    full: bool = False,           # Forzar re-puntuación de TODAS las predicciones
     current_user = Depends(require_admin)
 ):
     db = SessionLocal()
@@ -448,51 +492,18 @@ def upsert_race_result(
             detail="✋ No corras tanto. No puedes introducir resultados de una carrera futura."
     )
 
-    # Comprobar si ya hay resultado
-    result = db.query(RaceResult).filter(RaceResult.gp_id == gp_id).first()
-    if not result:
-        result = RaceResult(gp_id=gp_id)
-        db.add(result)
-        db.flush()
-
-    # Borrar posiciones y eventos anteriores
-    db.query(RacePosition).filter(RacePosition.race_result_id == result.id).delete()
-    db.query(RaceEvent).filter(RaceEvent.race_result_id == result.id).delete()
-
-    # Guardar posiciones
-    for pos, driver in positions.items():
-        db.add(RacePosition(race_result_id=result.id, position=pos, driver_name=driver))
-
-    # Guardar eventos
-    for event_type, value in events.items():
-        db.add(RaceEvent(race_result_id=result.id, event_type=event_type, value=value))
-
-    db.commit()
-
     # -------------------------
-    # 🔥 Calcular puntuaciones automáticamente
+    # 🔥 Guardar (delta), re-puntuar y recalcular logros solo de lo afectado
     # -------------------------
-    predictions = db.query(Prediction).filter(Prediction.gp_id == gp_id).all()
-    season_id = gp.season_id
-    multipliers = db.query(MultiplierConfig).filter(MultiplierConfig.season_id == season_id).all()
-
-    for prediction in predictions:
-        result_score = calculate_prediction_score(
-            prediction,
-            result,
-            multipliers
-        )
-        prediction.points = result_score["final_points"]
-        prediction.points_base = result_score["base_points"]
-        prediction.multiplier = result_score["multiplier"]
-
-    db.commit()
-
-    print(f"🔄 Calculando logros para GP {gp_id}...")
-    evaluate_race_achievements(db, gp_id)
+    print(f"🔄 Guardando resultado y calculando logros para GP {gp_id}...")
+    report = save_race_result(db, gp, positions, events, full=full)
     
     db.close()
-    return {"message": "Resultado guardado, puntos calculados y logros actualizados."}
+    return {
+        "message": "Resultado guardado, puntos calculados y logros actualizados.",
+        "report": report
+    }
+
 @router.post("/predictions/{user_id}/{gp_id}")
 
 def upsert_prediction_admin(
@@ -534,12 +545,29 @@ def upsert_prediction_admin(
     # Guardar posiciones
     for pos, driver in positions.items():
         db.add(PredictionPosition(prediction_id=prediction.id, position=pos, driver_name=driver))
+    prediction.packed_positions = pack_positions(
+        positions.items(), get_season_rules(db, gp.season_id).roster_slots
+    )
 
     # Guardar eventos
     for event_type, value in events.items():
         db.add(PredictionEvent(prediction_id=prediction.id, event_type=event_type, value=value))
 
+    # Si el GP ya tiene resultado, la predicción se puntúa ya (y con ella los puestos)
+    db.flush()
+    scored = gp.race_result is not None
+    context_before = capture_gp_context(db, gp) if scored else None
+    changed_rows = score_gp_predictions(db, gp, [prediction.id])
+
+    # Radar de perfil y percentiles: también cambia la participación del GP para el resto
+    refresh_gp_profile_metrics(db, gp_id)
+    refresh_gp_ranks(db, [gp_id])
+    bump_data_version(db, gp.season_id)
     db.commit()
+
+    if scored:
+        # El usuario y quienes dependen del máximo del GP o del líder (como al guardar resultados)
+        evaluate_rescored_gp(db, gp, {user_id}, changed_rows, context_before)
     db.close()
     return {"message": "Predicción guardada"}
 
@@ -597,6 +625,7 @@ def create_team(season_id: int, name: str, current_user = Depends(require_admin)
     db = SessionLocal()
     team = Team(name=name, season_id=season_id)
     db.add(team)
+    bump_data_version(db, season_id)
     db.commit()
     db.refresh(team)
     db.close()
@@ -632,6 +661,7 @@ def add_team_member(team_id: int, user_id: int, current_user = Depends(require_a
         season_id=team.season_id
     )
     db.add(new_member)
+    bump_data_version(db, team.season_id)
     db.commit()
     db.close()
     return {"message": "Usuario añadido al equipo"}
@@ -654,7 +684,9 @@ def remove_team_member(team_id: int, user_id: int, current_user = Depends(requir
         raise HTTPException(status_code=404, detail="El usuario no es miembro de este equipo")
 
     # Borrar la relación
+    season_id = membership.season_id
     db.delete(membership)
+    bump_data_version(db, season_id)
     db.commit()
     
     # Opcional: Verificar si el equipo se quedó vacío y borrarlo (limpieza)
@@ -664,6 +696,7 @@ def remove_team_member(team_id: int, user_id: int, current_user = Depends(requir
         team = db.query(Team).get(team_id)
         if team:
             db.delete(team)
+            bump_data_version(db, season_id)
             db.commit()
 
     db.close()
@@ -679,6 +712,7 @@ def delete_team(team_id: int, current_user = Depends(require_admin)):
         
     # Borrar miembros primero (cascade manual si no está configurado en DB)
     db.query(TeamMember).filter(TeamMember.team_id == team_id).delete()
+    bump_data_version(db, team.season_id)
     db.delete(team)
     db.commit()
     db.close()
@@ -723,9 +757,11 @@ def create_constructor(
 
     new_c = Constructor(name=name, color=color, season_id=season_id)
     db.add(new_c)
+    bump_rules_version(db, season_id)
     db.commit()
     db.refresh(new_c)
     db.close()
+    invalidate_season_rules(season_id)
     return new_c
 
 @router.post("/constructors/{constructor_id}/drivers")
@@ -742,9 +778,14 @@ def create_driver(
         constructor_id=constructor_id
     )
     db.add(driver)
+    db.flush()
+    if driver.constructor:
+        # Las filas con este piloto ya se pueden empaquetar (misma transacción que el alta)
+        repack_season(db, driver.constructor.season_id)
     db.commit()
     db.refresh(driver)
     db.close()
+    invalidate_season_rules()
     return driver
 
 @router.delete("/constructors/{id}")
@@ -756,9 +797,15 @@ def delete_constructor(id: int, current_user = Depends(require_admin)):
         raise HTTPException(404)
     # Borrar pilotos asociados primero
     db.query(Driver).filter(Driver.constructor_id == id).delete()
+    season_id = c.season_id
     db.delete(c)
+    db.flush()
+    # Quitar pilotos desplaza los índices de la parrilla: se re-empaqueta (y sube
+    # la versión de la temporada) en la misma transacción que el borrado
+    repack_season(db, season_id)
     db.commit()
     db.close()
+    invalidate_season_rules(season_id)
     return {"message": "Constructor eliminado"}
 
 @router.delete("/drivers/{id}")
@@ -766,11 +813,45 @@ def delete_driver(id: int, current_user = Depends(require_admin)):
     db = SessionLocal()
     d = db.query(Driver).get(id)
     if d:
+        season_id = d.constructor.season_id if d.constructor else None
         db.delete(d)
+        db.flush()
+        if season_id:
+            # Quitar pilotos desplaza los índices de la parrilla: se re-empaqueta (y
+            # sube la versión de la temporada) en la misma transacción que el borrado
+            repack_season(db, season_id)
         db.commit()
     db.close()
+    invalidate_season_rules()
     return {"message": "Piloto eliminado"}
 
+@router.post("/seasons/{season_id}/rescore")
+def rescore_season_admin(season_id: int, workers: Optional[int] = None, current_user = Depends(require_admin)):
+    """
+    Re-puntúa todos los GPs con resultado de la temporada (tras cambiar multiplicadores).
+    Reparte los GPs en un pool de procesos y devuelve el progreso por GP y el tiempo total.
+    Si cambia algún punto, lanza una reconstrucción de logros en segundo plano
+    (progreso en GET /admin/jobs/{rebuild_job_id}).
+    """
+    db = SessionLocal()
+    season = db.query(Season).get(season_id)
+    if not season:
+        db.close()
+        raise HTTPException(404, "Temporada no encontrada")
+    if db.query(RebuildJob.id).filter(RebuildJob.status.in_(ACTIVE_STATUSES)).first():
+        # Los GPs que ya ha repasado no verían los puntos nuevos
+        db.close()
+        raise HTTPException(409, "Hay una reconstrucción de logros en marcha")
+
+    try:
+        report = rescore_season(db, season_id, workers=workers)
+    finally:
+        db.close()
+
+    if report["rebuild_job_id"]:
+        launch_rebuild_job(report["rebuild_job_id"])
+    return {"message": "Temporada re-puntuada", "report": report}
+
 # -----------------------
 # ZONA DE PÁNICO
 # -----------------------
@@ -779,13 +860,90 @@ def delete_driver(id: int, current_user = Depends(require_admin)):
 def panic_rebuild_achievements(current_user = Depends(require_admin)):
     """
     🚨 BOTÓN DEL PÁNICO: Borra y recalcula TODOS los logros y estadísticas.
+    Se ejecuta en segundo plano con checkpoint por GP; el progreso se consulta en
+    GET /admin/jobs/{job_id}. Si ya hay una reconstrucción en marcha, devuelve esa.
     """
     db = SessionLocal()
     try:
-        rebuild_all_achievements(db)
+        active = db.query(RebuildJob).filter(RebuildJob.status.in_(ACTIVE_STATUSES)).first()
+        if not active:
+            # Por si la parrilla/multiplicadores/logros se tocaron fuera de la API (scripts de seed)
+            invalidate_season_rules()
+            invalidate_achievement_catalog()
+            bump_rules_version(db)
+            for (season_id,) in db.query(Season.id).all():
+                repack_season(db, season_id)
+            db.commit()
+        job = create_rebuild_job(db)
+        launch_rebuild_job(job.id)
+        status = job_status(job)
         db.close()
-        return {"message": "Reconstrucción completada con éxito. Todos los logros han sido recalculados."}
+        return {
+            "message": "Reconstrucción en marcha. Todos los logros se están recalculando.",
+            "job_id": job.id,
+            "job": status,
+        }
     except Exception as e:
         db.close()
         print(f"Error en panic rebuild: {e}")
-        raise HTTPException(status_code=500, detail=f"Error durante la reconstrucción: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error durante la reconstrucción: {str(e)}")
+
+@router.post("/panic/rebuild-achievements/parallel")
+def panic_rebuild_achievements_parallel(workers: Optional[int] = None, current_user = Depends(require_admin)):
+    """
+    Reconstrucción completa repartiendo los usuarios en un pool de procesos.
+    Sin checkpoints: bloquea hasta terminar y lo escribe todo en un solo commit.
+    Devuelve los tiempos por partición y el total.
+    """
+    db = SessionLocal()
+    try:
+        if db.query(RebuildJob).filter(RebuildJob.status.in_(ACTIVE_STATUSES)).first():
+            raise HTTPException(409, "Hay una reconstrucción en marcha")
+
+        invalidate_season_rules()
+        invalidate_achievement_catalog()
+        bump_rules_version(db)
+        for (season_id,) in db.query(Season.id).all():
+            repack_season(db, season_id)
+        db.commit()
+        report = rebuild_all_achievements_parallel(db, workers=workers)
+    finally:
+        db.close()
+
+    return {"message": "Reconstrucción completada", "report": report}
+
+@router.get("/jobs/{job_id}")
+def get_rebuild_job(job_id: int, current_user = Depends(require_admin)):
+    """Progreso de una reconstrucción: GPs procesados/total, ETA y tiempos por GP."""
+    db = SessionLocal()
+    job = db.get(RebuildJob, job_id)
+    if not job:
+        db.close()
+        raise HTTPException(404, "Job no encontrado")
+    status = job_status(job)
+    db.close()
+    return status
+
+@router.post("/jobs/{job_id}/resume")
+def resume_rebuild_job(job_id: int, current_user = Depends(require_admin)):
+    """
+    Reanuda un job FAILED (o RUNNING con el lease caducado) desde su último
+    checkpoint (no vuelve a empezar). Si su worker sigue vivo, no hace nada.
+    """
+    db = SessionLocal()
+    job = db.get(RebuildJob, job_id)
+    if not job:
+        db.close()
+        raise HTTPException(404, "Job no encontrado")
+    if job.status == "DONE":
+        db.close()
+        raise HTTPException(400, "El job ya ha terminado")
+    if job.status == "FAILED" and not reopen_rebuild_job(db, job_id):
+        db.close()
+        raise HTTPException(409, "Hay otra reconstrucción en marcha")
+    db.refresh(job)
+    status = job_status(job)
+    db.close()
+
+    launch_rebuild_job(job_id)
+    return {"message": "Reconstrucción reanudada", "job": status}
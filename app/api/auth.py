@@ -4,6 +4,7 @@ from app.db.session import SessionLocal
 from app.db.models.user import User
 from app.core.security import hash_password, verify_password, create_access_token
 from app.core.deps import get_current_user
+from app.services.response_cache import bump_data_version
 from datetime import timedelta
 from sqlalchemy import or_
 
@@ -35,6 +36,7 @@ def register(user: UserCreate):
         role="user" # Por defecto
     )
     db.add(new_user)
+    bump_data_version(db) # Aparece en rankings y clasificaciones de todas las temporadas
     db.commit()
     db.refresh(new_user)
     db.close()
@@ -98,6 +100,8 @@ def update_profile(
             raise HTTPException(401, "Contraseña actual incorrecta")
         user.hashed_password = hash_password(user_update.new_password)
 
+    if user_update.username or user_update.acronym:
+        bump_data_version(db) # Nombre y acrónimo salen en rankings y clasificaciones
     db.commit()
     db.refresh(user)
     
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
@@ -11,6 +11,7 @@ from app.db.models.user import User
 from app.db.models.season import Season
 from app.db.models.bingo import BingoTile, BingoSelection
 from app.db.models.grand_prix import GrandPrix
+from app.services.response_cache import bump_data_version, cached_json
 
 router = APIRouter(prefix="/bingo", tags=["Bingo"])
 
@@ -87,6 +88,7 @@ def create_bingo_tile(
 
     new_tile = BingoTile(description=tile.description, season_id=season.id)
     db.add(new_tile)
+    bump_data_version(db, season.id)
     db.commit()
     db.refresh(new_tile)
     db.close()
@@ -111,6 +113,7 @@ def update_bingo_tile(
     if update_data.is_completed is not None:
         tile.is_completed = update_data.is_completed
     
+    bump_data_version(db, tile.season_id)
     db.commit()
     db.refresh(tile)
     db.close()
@@ -129,6 +132,7 @@ def delete_bingo_tile(
         db.close()
         raise HTTPException(status_code=404, detail="Casilla no encontrada")
         
+    bump_data_version(db, tile.season_id)
     db.delete(tile)
     db.commit()
     db.close()
@@ -225,6 +229,7 @@ def toggle_selection(
     if existing:
         # Si ya existe, borramos (siempre permitido)
         db.delete(existing)
+        bump_data_version(db, season.id)
         db.commit()
         db.close()
         return {"status": "removed", "msg": "Casilla desmarcada"}
@@ -240,6 +245,7 @@ def toggle_selection(
 
         new_sel = BingoSelection(user_id=current_user.id, bingo_tile_id=tile_id)
         db.add(new_sel)
+        bump_data_version(db, season.id)
         db.commit()
         db.close()
         return {"status": "added", "msg": "Casilla marcada"}
@@ -249,15 +255,20 @@ def toggle_selection(
 # ------------------------------------------------------------------
 
 @router.get("/standings", response_model=List[BingoStandingsItem])
-def get_bingo_standings():
+def get_bingo_standings(request: Request):
     """
     Calcula la clasificación del Bingo incluyendo aciertos, fallos y puntos.
+    Cacheada por versión de datos: cuenta las selecciones de todas las temporadas.
     """
     db = SessionLocal()
-    
+    try:
+        return cached_json(request, db, lambda: _bingo_standings(db))
+    finally:
+        db.close()
+
+def _bingo_standings(db: Session):
     season = db.query(Season).filter(Season.is_active == True).first()
     if not season: 
-        db.close()
         return []
 
     # 1. Obtener Datos Base
@@ -325,7 +336,5 @@ def get_bingo_standings():
             "total_points": total_points
         })
 
-    db.close()
-
-    # Ordenar por puntos descendente
-    return sorted(ranking, key=lambda x: x["total_points"], reverse=True)
\ No newline at end of file
+    # Ordenar por puntos descendente (validado contra el response_model, como antes de la caché)
+    return [BingoStandingsItem(**item) for item in sorted(ranking, key=lambda x: x["total_points"], reverse=True)]
\ No newline at end of file
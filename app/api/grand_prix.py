@@ -4,6 +4,8 @@ from app.db.session import SessionLocal
 from app.db.models.grand_prix import GrandPrix
 from app.db.models.season import Season
 from app.core.deps import get_current_user
+from app.services.profile_metrics import refresh_profile_metrics
+from app.services.response_cache import bump_data_version
 
 router = APIRouter(prefix="/grand-prix", tags=["Grand Prix"])
 
@@ -31,6 +33,9 @@ def create_grand_prix(
     )
 
     db.add(gp)
+    # El compromiso del radar cuenta los GPs del calendario
+    refresh_profile_metrics(db)
+    bump_data_version(db, season_id)
     db.commit()
     db.refresh(gp)
     db.close()
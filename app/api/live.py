@@ -0,0 +1,62 @@
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from app.core.deps import get_current_user, require_admin
+from app.services.live import get_live_channel, gp_exists, publish_live_positions
+
+router = APIRouter(prefix="/live", tags=["Live"])
+
+# Comentario SSE para que proxies no corten la conexión
+KEEPALIVE_SECONDS = 15
+
+@router.post("/{gp_id}")
+def post_live_positions(
+    gp_id: int,
+    positions: dict[int, str],
+    events: dict[str, str] = {},
+    current_user = Depends(require_admin)
+):
+    """
+    Posiciones intermedias de carrera (admin o job de sync).
+    No se guarda nada: solo alimenta la clasificación en directo.
+    """
+    if not gp_exists(gp_id):
+        raise HTTPException(status_code=404, detail="GP no encontrado")
+    publish_live_positions(gp_id, positions, events)
+    return {"message": "Posiciones en directo recibidas"}
+
+@router.get("/{gp_id}/stream")
+async def stream_live_leaderboard(
+    gp_id: int,
+    request: Request,
+    current_user = Depends(get_current_user)
+):
+    """
+    Server-Sent Events con la clasificación provisional (GP + mundial).
+    Todos los clientes reciben el mismo cálculo compartido.
+    """
+    # Sin esto cualquier ID crearía un canal (y lo dejaría en memoria)
+    if not await asyncio.to_thread(gp_exists, gp_id):
+        raise HTTPException(status_code=404, detail="GP no encontrado")
+
+    channel = get_live_channel(gp_id)
+    queue = channel.subscribe()
+
+    async def event_stream():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    version, data = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"id: {version}\nevent: leaderboard\ndata: {data}\n\n"
+        finally:
+            channel.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
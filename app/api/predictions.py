@@ -8,6 +8,11 @@ from app.db.models.prediction_event import PredictionEvent
 from app.db.models.grand_prix import GrandPrix
 from app.db.models.user import User
 from app.core.deps import get_current_user
+from app.services.packing import pack_positions
+from app.services.season_rules import get_season_rules
+from app.services.profile_metrics import refresh_profile_metrics
+from app.services.results_service import refresh_gp_ranks
+from app.services.response_cache import bump_data_version
 
 router = APIRouter(prefix="/predictions", tags=["Predictions"])
 
@@ -63,6 +68,11 @@ def upsert_prediction(
             driver_name=driver
         ))
 
+    # 📦 Copia empaquetada del top 10 (la que leen scoring, logros y stats)
+    prediction.packed_positions = pack_positions(
+        positions.items(), get_season_rules(db, gp.season_id).roster_slots
+    )
+
     # ⚡ Guardar eventos
     for event_type, value in events.items():
         db.add(PredictionEvent(
@@ -71,6 +81,13 @@ def upsert_prediction(
             value=value
         ))
 
+    # Radar de perfil (antelación, compromiso...) del usuario
+    refresh_profile_metrics(db, [current_user.id])
+    # Una predicción nueva cambia el percentil del resto en el GP
+    refresh_gp_ranks(db, [gp_id])
+    # Aparece en la clasificación del GP
+    bump_data_version(db, gp.season_id)
+
     db.commit()
     db.close()
 
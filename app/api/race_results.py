@@ -1,11 +1,9 @@
 from fastapi import APIRouter, HTTPException, Depends
 from app.db.session import SessionLocal
 from app.db.models.race_result import RaceResult
-from app.db.models.race_position import RacePosition
-from app.db.models.race_event import RaceEvent
 from app.db.models.grand_prix import GrandPrix
 from app.core.deps import get_current_user
-from app.services.achievements_service import evaluate_race_achievements
+from app.services.results_service import save_race_result
 
 router = APIRouter(prefix="/results", tags=["Race Results"])
 
@@ -14,6 +12,7 @@ def upsert_race_result(
     gp_id: int,
     positions: dict[int, str],
     events: dict[str, str],
+    full: bool = False,
     current_user = Depends(get_current_user)
 ):
     if current_user.role != "admin":
@@ -26,47 +25,12 @@ def upsert_race_result(
         db.close()
         raise HTTPException(status_code=404, detail="GP no encontrado")
 
-    result = (
-        db.query(RaceResult)
-        .filter(RaceResult.gp_id == gp_id)
-        .first()
-    )
-
-    if not result:
-        result = RaceResult(gp_id=gp_id)
-        db.add(result)
-        db.flush()
-
-    db.query(RacePosition).filter(
-        RacePosition.race_result_id == result.id
-    ).delete()
-
-    db.query(RaceEvent).filter(
-        RaceEvent.race_result_id == result.id
-    ).delete()
-
-    for pos, driver in positions.items():
-        db.add(RacePosition(
-            race_result_id=result.id,
-            position=pos,
-            driver_name=driver
-        ))
-
-    for event_type, value in events.items():
-        db.add(RaceEvent(
-            race_result_id=result.id,
-            event_type=event_type,
-            value=value
-        ))
-
-    db.commit()
-
-    # 🔥 VALIDAR LOGROS AUTOMÁTICAMENTE
-    evaluate_race_achievements(db, gp_id)
+    # 🔥 Guardar (delta), re-puntuar y VALIDAR LOGROS solo de lo afectado
+    report = save_race_result(db, gp, positions, events, full=full)
 
     db.close()
 
-    return {"message": "Resultado guardado y logros calculados"}
+    return {"message": "Resultado guardado y logros calculados", "report": report}
 
 @router.get("/{gp_id}")
 def get_race_result(
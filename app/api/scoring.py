@@ -1,9 +1,10 @@
 from fastapi import APIRouter, HTTPException, Depends
 from app.db.session import SessionLocal
-from app.db.models.prediction import Prediction
 from app.db.models.race_result import RaceResult
-from app.db.models.multiplier_config import MultiplierConfig
-from app.services.scoring import calculate_prediction_score
+from app.services.results_service import score_gp_predictions
+from app.services.simulation import get_gp_snapshot, simulate_gp
+from app.services.profile_metrics import refresh_gp_profile_metrics
+from app.services.response_cache import bump_data_version
 from app.core.deps import get_current_user
 
 router = APIRouter(prefix="/scoring", tags=["Scoring"])
@@ -28,30 +29,36 @@ def score_gp(
         db.close()
         raise HTTPException(status_code=400, detail="Resultado no introducido")
 
-    predictions = (
-        db.query(Prediction)
-        .filter(Prediction.gp_id == gp_id)
-        .all()
-    )
-
     season_id = race_result.grand_prix.season_id
 
-    multipliers = (
-        db.query(MultiplierConfig)
-        .filter(MultiplierConfig.season_id == season_id)
-        .all()
-    )
-
-    for prediction in predictions:
-        result = calculate_prediction_score(
-            prediction,
-            race_result,
-            multipliers
-        )
-
-        prediction.points = result["final_points"]
+    changed_rows = score_gp_predictions(db, race_result.grand_prix)
+    if changed_rows:
+        refresh_gp_profile_metrics(db, gp_id)
+        bump_data_version(db, season_id)
 
     db.commit()
     db.close()
 
-    return {"message": "Puntuaciones calculadas"}
+    return {"message": "Puntuaciones calculadas", "updated": len(changed_rows)}
+
+@router.post("/simulate/{gp_id}")
+def simulate(
+    gp_id: int,
+    positions: dict[int, str],
+    events: dict[str, str] = {},
+    current_user = Depends(get_current_user)
+):
+    """
+    "¿Y si acabara así?": puntúa un resultado hipotético sin escribir nada.
+    Las predicciones del GP se leen de una foto en memoria con TTL corto.
+    """
+    db = SessionLocal()
+    try:
+        snapshot = get_gp_snapshot(db, gp_id)
+    finally:
+        db.close()
+
+    if not snapshot:
+        raise HTTPException(status_code=404, detail="GP no encontrado")
+
+    return simulate_gp(snapshot, positions, events)
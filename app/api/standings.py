@@ -1,4 +1,4 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
 from sqlalchemy import func
 from app.db.session import SessionLocal
 from app.db.models.user import User
@@ -6,68 +6,85 @@ from app.db.models.prediction import Prediction
 from app.db.models.grand_prix import GrandPrix
 from app.db.models.team import Team
 from app.db.models.team_member import TeamMember
+from app.db.models.user_stats import UserSeasonStats
+from app.services.response_cache import cached_json
 
 router = APIRouter(prefix="/standings", tags=["Standings"])
 
+# Las clasificaciones se cachean por versión de datos (ver services/response_cache.py);
+# las filas van como dict ({"id", "username", "points"}...) para serializarlas
+
 @router.get("/season/{season_id}")
-def individual_season_standings(season_id: int):
+def individual_season_standings(season_id: int, request: Request):
     db = SessionLocal()
 
-    results = (
-        db.query(
-            User.id,
-            User.username,
-            func.coalesce(func.sum(Prediction.points), 0).label("points")
+    def compute():
+        # Puntos ya acumulados en UserSeasonStats: recorre el índice (season_id, points DESC)
+        results = (
+            db.query(
+                User.id,
+                User.username,
+                UserSeasonStats.points
+            )
+            .join(UserSeasonStats, UserSeasonStats.user_id == User.id)
+            .filter(UserSeasonStats.season_id == season_id)
+            .order_by(UserSeasonStats.points.desc(), UserSeasonStats.user_id)
+            .all()
         )
-        .join(Prediction, Prediction.user_id == User.id)
-        .join(GrandPrix, GrandPrix.id == Prediction.gp_id)
-        .filter(GrandPrix.season_id == season_id)
-        .group_by(User.id)
-        .order_by(func.sum(Prediction.points).desc())
-        .all()
-    )
+        return [row._asdict() for row in results]
 
-    db.close()
-    return results
+    try:
+        return cached_json(request, db, compute, season_id)
+    finally:
+        db.close()
 
 @router.get("/gp/{gp_id}")
-def gp_standings(gp_id: int):
+def gp_standings(gp_id: int, request: Request):
     db = SessionLocal()
 
-    results = (
-        db.query(
-            User.id,
-            User.username,
-            Prediction.points
+    def compute():
+        results = (
+            db.query(
+                User.id,
+                User.username,
+                Prediction.points
+            )
+            .join(Prediction, Prediction.user_id == User.id)
+            .filter(Prediction.gp_id == gp_id)
+            .order_by(Prediction.points.desc())
+            .all()
         )
-        .join(Prediction, Prediction.user_id == User.id)
-        .filter(Prediction.gp_id == gp_id)
-        .order_by(Prediction.points.desc())
-        .all()
-    )
+        return [row._asdict() for row in results]
 
-    db.close()
-    return results
+    try:
+        season_id = db.query(GrandPrix.season_id).filter(GrandPrix.id == gp_id).scalar()
+        return cached_json(request, db, compute, season_id)
+    finally:
+        db.close()
 
 @router.get("/teams/season/{season_id}")
-def team_standings(season_id: int):
+def team_standings(season_id: int, request: Request):
     db = SessionLocal()
 
-    results = (
-        db.query(
-            Team.id,
-            Team.name,
-            func.coalesce(func.sum(Prediction.points), 0).label("points")
+    def compute():
+        results = (
+            db.query(
+                Team.id,
+                Team.name,
+                func.coalesce(func.sum(Prediction.points), 0).label("points")
+            )
+            .join(TeamMember, TeamMember.team_id == Team.id)
+            .join(User, User.id == TeamMember.user_id)
+            .join(Prediction, Prediction.user_id == User.id)
+            .join(GrandPrix, GrandPrix.id == Prediction.gp_id)
+            .filter(Team.season_id == season_id, GrandPrix.season_id == season_id)
+            .group_by(Team.id)
+            .order_by(func.sum(Prediction.points).desc())
+            .all()
         )
-        .join(TeamMember, TeamMember.team_id == Team.id)
-        .join(User, User.id == TeamMember.user_id)
-        .join(Prediction, Prediction.user_id == User.id)
-        .join(GrandPrix, GrandPrix.id == Prediction.gp_id)
-        .filter(Team.season_id == season_id)
-        .group_by(Team.id)
-        .order_by(func.sum(Prediction.points).desc())
-        .all()
-    )
+        return [row._asdict() for row in results]
 
-    db.close()
-    return results
+    try:
+        return cached_json(request, db, compute, season_id)
+    finally:
+        db.close()
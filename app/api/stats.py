@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Query, HTTPException, Depends
+from fastapi import APIRouter, Query, HTTPException, Depends, Request
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import or_, func, desc
 from app.db.session import SessionLocal
@@ -13,144 +13,105 @@ from app.db.models.race_event import RaceEvent
 from app.db.models.prediction_position import PredictionPosition
 from app.db.models.prediction_event import PredictionEvent
 from app.db.models.achievement import Achievement, UserAchievement
+from app.services.profile_metrics import RADAR_AXES, load_profile_metrics
+from app.services.results_service import refresh_gp_ranks
+from app.services.rankings import accumulate, load_team_matrix, load_user_matrix, rounded, top_order
+from app.services.response_cache import cached_json
 
-import statistics
 from datetime import datetime, timezone
 
 router = APIRouter(prefix="/stats", tags=["Stats"])
 
 @router.get("/evolution")
 def evolution(
+    request: Request,
     season_id: int,
     type: str = Query(..., pattern="^(users|teams)$"),
     ids: list[int] = Query(None),
     names: list[str] = Query(None),
-    mode: str = Query("total", pattern="^(base|total|multiplier)$")
+    mode: str = Query("total", pattern="^(base|total|multiplier)$"),
+    columnar: bool = False
 ):
     db: Session = SessionLocal()
-    response = {}
-
     try:
-        # --- PROCESAMIENTO SEGÚN TIPO ---
-        # Hemos eliminado el filtro automático de Top 5 para devolver todos los datos
-        # y que el frontend pueda buscar usuarios.
-
-        if type == "users":
-            query = db.query(User)
-            
-            # Aplicar filtros solo si se especifican
-            if ids and names:
-                query = query.filter(or_(User.id.in_(ids), User.username.in_(names)))
-            elif ids:
-                query = query.filter(User.id.in_(ids))
-            elif names:
-                query = query.filter(User.username.in_(names))
-            
-            # Si no hay filtros, query.all() devuelve TODOS los usuarios (admins incluidos)
-            items = query.all()
-            
-            if not items:
-                return {}
-
-            for user in items:
-                # Solo incluir predicciones de GPs que tengan resultados guardados
-                preds = (
-                    db.query(Prediction)
-                    .join(GrandPrix)
-                    .join(RaceResult, RaceResult.gp_id == GrandPrix.id)  # JOIN con RaceResult
-                    .filter(
-                        Prediction.user_id == user.id,
-                        GrandPrix.season_id == season_id
-                    )
-                    .order_by(GrandPrix.race_datetime)
-                    .all()
-                )
-
-                acc_value = 1.0 if mode == "multiplier" else 0
-                evolution_list = []
-
-                for p in preds:
-                    if mode == "base":
-                        acc_value += p.points_base
-                    elif mode == "total":
-                        acc_value += p.points
-                    elif mode == "multiplier":
-                        acc_value *= p.multiplier
-
-                    evolution_list.append({
-                        "gp_id": p.gp_id,
-                        "value": round(acc_value, 4)
-                    })
-
-                response[user.username] = evolution_list
-
-        elif type == "teams":
-            query = db.query(Team).filter(Team.season_id == season_id)
-            
-            if ids and names:
-                query = query.filter(or_(Team.id.in_(ids), Team.name.in_(names)))
-            elif ids:
-                query = query.filter(Team.id.in_(ids))
-            elif names:
-                query = query.filter(Team.name.in_(names))
-
-            items = query.all()
-            if not items:
-                return {}
-
-            for team in items:
-                member_ids = [tm.user_id for tm in team.members]
-                # Solo incluir predicciones de GPs que tengan resultados guardados
-                preds = (
-                    db.query(Prediction)
-                    .join(GrandPrix)
-                    .join(RaceResult, RaceResult.gp_id == GrandPrix.id)  # JOIN con RaceResult
-                    .filter(
-                        Prediction.user_id.in_(member_ids),
-                        GrandPrix.season_id == season_id
-                    )
-                    .order_by(GrandPrix.race_datetime, Prediction.user_id)
-                    .all()
-                )
-
-                # Agrupar predicciones por GP
-                gp_map = {}
-                for p in preds:
-                    gp_map.setdefault(p.gp_id, []).append(p)
-
-                acc_value = 1.0 if mode == "multiplier" else 0
-                evolution_list = []
-
-                for gp_id in sorted(gp_map.keys()):
-                    gp_preds = gp_map[gp_id]
-
-                    if mode == "base":
-                        gp_points = sum(p.points_base for p in gp_preds)
-                        acc_value += gp_points
-                    elif mode == "total":
-                        gp_points = sum(p.points for p in gp_preds)
-                        acc_value += gp_points
-                    elif mode == "multiplier":
-                        gp_multiplier = 1.0
-                        for p in gp_preds:
-                            gp_multiplier *= p.multiplier
-                        acc_value *= gp_multiplier
-
-                    evolution_list.append({
-                        "gp_id": gp_id,
-                        "value": round(acc_value, 4)
-                    })
-
-                response[team.name] = evolution_list
-
-        return response
-
+        return cached_json(
+            request, db,
+            lambda: _evolution(db, season_id, type, ids, names, mode, columnar),
+            season_id
+        )
     finally:
         db.close()
 
+def _evolution(db: Session, season_id: int, type: str, ids, names, mode: str, columnar: bool):
+    # --- PROCESAMIENTO SEGÚN TIPO ---
+    # Hemos eliminado el filtro automático de Top 5 para devolver todos los datos
+    # y que el frontend pueda buscar usuarios.
+
+    if type == "users":
+        query = db.query(User.id, User.username, User.acronym)
+
+        # Aplicar filtros solo si se especifican
+        if ids and names:
+            query = query.filter(or_(User.id.in_(ids), User.username.in_(names)))
+        elif ids:
+            query = query.filter(User.id.in_(ids))
+        elif names:
+            query = query.filter(User.username.in_(names))
+
+        # Si no hay filtros, devuelve TODOS los usuarios (admins incluidos)
+        items = query.order_by(User.id).all()
+        if not items:
+            return {}
+
+        # Una sola query de predicciones para todos los usuarios, solo de GPs con resultados
+        matrix = load_user_matrix(db, season_id, mode, users=items, completed_only=True)
+
+    elif type == "teams":
+        query = db.query(Team.id, Team.name).filter(Team.season_id == season_id)
+
+        if ids and names:
+            query = query.filter(or_(Team.id.in_(ids), Team.name.in_(names)))
+        elif ids:
+            query = query.filter(Team.id.in_(ids))
+        elif names:
+            query = query.filter(Team.name.in_(names))
+
+        items = query.order_by(Team.id).all()
+        if not items:
+            return {}
+
+        matrix = load_team_matrix(db, season_id, mode, teams=items, completed_only=True)
+
+    # Acumulado GP a GP; cada serie solo tiene puntos en los GPs en que predijo
+    acc = accumulate(matrix.values, mode)
+
+    if columnar:
+        # Formato compacto para la gráfica: un array de GPs y uno de valores por serie
+        # (null en los GPs sin predicción)
+        series = {}
+        for i, (name, _) in enumerate(matrix.labels):
+            hits = matrix.predicted[i].tolist()
+            series[name] = [
+                value if hit else None
+                for value, hit in zip(rounded(acc[i]), hits)
+            ]
+        return {"gp_ids": matrix.gp_ids, "series": series}
+
+    response = {}
+    for i, (name, _) in enumerate(matrix.labels):
+        hits = matrix.predicted[i].tolist()
+        response[name] = [
+            {"gp_id": gp_id, "value": value}
+            for gp_id, value, hit in zip(matrix.gp_ids, rounded(acc[i]), hits)
+            if hit
+        ]
+
+    return response
+
 
 @router.get("/ranking")
 def ranking(
+    request: Request,
     season_id: int,
     type: str = Query(..., pattern="^(users|teams)$"),
     mode: str = Query("total", pattern="^(base|total|multiplier)$"),
@@ -158,151 +119,54 @@ def ranking(
 ):
     db: Session = SessionLocal()
     try:
-        result = {}
+        return cached_json(request, db, lambda: _ranking(db, season_id, type, mode, limit), season_id)
+    finally:
+        db.close()
 
-        # Obtener todos los GPs de la temporada
-        gps = db.query(GrandPrix).filter(GrandPrix.season_id == season_id).order_by(GrandPrix.race_datetime).all()
-        if not gps:
-            # Si no hay GPs, devolvemos listas vacías pero estructura válida
-            return {"by_gp": {}, "overall": []}
+def _ranking(db: Session, season_id: int, type: str, mode: str, limit):
+    # Una sola query de predicciones para toda la temporada, pivotada en una
+    # matriz filas × GPs; los acumulados son sumas/productos corridos por fila
+    if type == "users":
+        matrix = load_user_matrix(db, season_id, mode)
+    else:
+        matrix = load_team_matrix(db, season_id, mode)
 
-        # FIX: Identificar GPs con resultados para no incluir los futuros en "by_gp"
-        completed_gp_ids = {res.gp_id for res in db.query(RaceResult.gp_id).filter(RaceResult.gp_id.in_([gp.id for gp in gps])).all()}
+    # Sin GPs (o sin filas) devolvemos listas vacías pero estructura válida
+    if not matrix.gp_ids or not matrix.row_ids:
+        return {"by_gp": {}, "overall": []}
 
-        gp_ids = [gp.id for gp in gps]
+    acc = accumulate(matrix.values, mode)
 
+    def entry(i, accumulated, gp_points=None):
+        name, acronym = matrix.labels[i]
+        row = {"name": name}
         if type == "users":
-            users = db.query(User).all()
-            if not users:
-                 return {"by_gp": {}, "overall": []}
-
-            # Inicializar acumuladores por usuario
-            acc = {u.username: 1.0 if mode=="multiplier" else 0 for u in users}
-
-            # Ranking por GP
-            ranking_by_gp = {}
-            for gp_id in gp_ids:
-                preds = db.query(Prediction).filter(Prediction.gp_id==gp_id).all()
-                gp_ranking = []
-                
-                # Crear mapa rápido de predicciones para este GP
-                preds_map = {p.user_id: p for p in preds}
-
-                for u in users:
-                    p = preds_map.get(u.id)
-                    gp_points = 0
-                    if mode == "multiplier": gp_points = 1.0
-
-                    if p:
-                        if mode == "base":
-                            gp_points = p.points_base
-                            acc[u.username] += gp_points
-                        elif mode == "total":
-                            gp_points = p.points
-                            acc[u.username] += gp_points
-                        elif mode == "multiplier":
-                            gp_points = p.multiplier
-                            acc[u.username] *= gp_points
-                    else:
-                        # Si no hay predicción en modo multiplier, multiplicamos por 1.0 (neutro)
-                        if mode == "multiplier":
-                            acc[u.username] *= gp_points  # gp_points ya es 1.0
-
-                    gp_ranking.append({
-                        "name": u.username,
-                        "acronym": u.acronym, # <--- Devolvemos el acrónimo
-                        "gp_points": gp_points,
-                        "accumulated": round(acc[u.username], 4)
-                    })
-
-                # Ordenar descendente por acumulado
-                gp_ranking.sort(key=lambda x: x["accumulated"], reverse=True)
-                if limit:
-                    gp_ranking = gp_ranking[:limit]
-                
-                # FIX: Solo añadir al desglose si el GP tiene resultados
-                if gp_id in completed_gp_ids:
-                    ranking_by_gp[gp_id] = gp_ranking
+            row["acronym"] = acronym
+        if gp_points is not None:
+            row["gp_points"] = gp_points
+        row["accumulated"] = accumulated
+        return row
+
+    # Ranking por GP: solo los GPs con resultados (los futuros no se desglosan)
+    ranking_by_gp = {}
+    for j, gp_id in enumerate(matrix.gp_ids):
+        if gp_id not in matrix.completed_gp_ids:
+            continue
+        accumulated = rounded(acc[:, j])
+        gp_points = matrix.values[:, j].tolist()
+        ranking_by_gp[gp_id] = [
+            entry(i, accumulated[i], gp_points[i])
+            for i in top_order(accumulated, limit)
+        ]
+
+    # Ranking GENERAL final (por el acumulado sin redondear)
+    final = acc[:, -1]
+    order = top_order(final, limit)
+    final_rounded = rounded(final)
+    overall_list = [entry(i, final_rounded[i]) for i in order]
+
+    return {"by_gp": ranking_by_gp, "overall": overall_list}
 
-            result["by_gp"] = ranking_by_gp
-            
-            # Ranking GENERAL final
-            overall_list = [
-                {
-                    "name": u.username, 
-                    "acronym": u.acronym, # <--- Devolvemos el acrónimo
-                    "accumulated": round(acc[u.username], 4)
-                }
-                for u in sorted(users, key=lambda u: acc[u.username], reverse=True)
-            ]
-            
-            if limit:
-                overall_list = overall_list[:limit]
-            
-            result["overall"] = overall_list
-
-        elif type == "teams":
-            teams = db.query(Team).filter(Team.season_id==season_id).all()
-            if not teams:
-                 return {"by_gp": {}, "overall": []}
-
-            # Inicializar acumuladores
-            acc = {t.name: 1.0 if mode=="multiplier" else 0 for t in teams}
-            ranking_by_gp = {}
-
-            for gp_id in gp_ids:
-                gp_ranking = []
-                for t in teams:
-                    member_ids = [tm.user_id for tm in t.members]
-                    preds = db.query(Prediction).filter(
-                        Prediction.user_id.in_(member_ids),
-                        Prediction.gp_id==gp_id
-                    ).all()
-
-                    gp_points = 0
-                    if mode == "multiplier": gp_points = 1.0
-
-                    if preds:
-                        if mode == "base":
-                            gp_points = sum(p.points_base for p in preds)
-                            acc[t.name] += gp_points
-                        elif mode == "total":
-                            gp_points = sum(p.points for p in preds)
-                            acc[t.name] += gp_points
-                        elif mode == "multiplier":
-                            for p in preds:
-                                gp_points *= p.multiplier
-                            acc[t.name] *= gp_points
-                    else:
-                        # Si no hay predicciones en modo multiplier, multiplicamos por 1.0 (neutro)
-                        if mode == "multiplier":
-                            acc[t.name] *= gp_points  # gp_points ya es 1.0
-                    
-                    gp_ranking.append({
-                        "name": t.name,
-                        "gp_points": gp_points,
-                        "accumulated": round(acc[t.name], 4)
-                    })
-
-                # Ordenar descendente
-                gp_ranking.sort(key=lambda x: x["accumulated"], reverse=True)
-                if limit:
-                    gp_ranking = gp_ranking[:limit]
-
-                # FIX: Solo añadir al desglose si el GP tiene resultados
-                if gp_id in completed_gp_ids:
-                    ranking_by_gp[gp_id] = gp_ranking
-
-            result["by_gp"] = ranking_by_gp
-            result["overall"] = [
-                {"name": t.name, "accumulated": round(acc[t.name], 4)}
-                for t in sorted(teams, key=lambda t: acc[t.name], reverse=True)
-            ][:limit]
-
-        return result
-    
-    finally:
-        db.close()
 
 # --- UTILIDADES ---
 def normalize_score(value, min_val, max_val, reverse=False):
@@ -319,74 +183,22 @@ def normalize_score(value, min_val, max_val, reverse=False):
 # --- LÓGICA CORE (REUTILIZABLE) ---
 def _calculate_stats(db: Session, target_user_id: int):
     """Calcula las estadísticas completas para un usuario específico comparado con el global."""
-    
-    # ... (Parte 1 y 2 idénticas: Datos globales y Bucle Araña) ...
-    # Para ahorrar espacio, asumo que las líneas 1 a 95 del bloque anterior están bien.
-    # El error estaba en la PARTE 3. Aquí tienes la función CORREGIDA desde la parte 3:
 
-    # (Asegúrate de mantener la parte 1 y 2 que te di antes, si las has borrado dímelo)
-    # Aquí retomo desde el cálculo del usuario target:
-
-    # 1. DATOS PRELIMINARES GLOBALES (Re-incluido para contexto, asegura tener los imports)
-    all_users = db.query(User).all()
+    # 1. DATOS PRELIMINARES GLOBALES
     gps_data = {gp.id: gp for gp in db.query(GrandPrix).all()}
     gps_dates = {gp.id: gp.race_datetime.replace(tzinfo=timezone.utc) if gp.race_datetime.tzinfo is None else gp.race_datetime for gp in gps_data.values()}
-    
-    part_counts = db.query(Prediction.gp_id, func.count(Prediction.user_id)).group_by(Prediction.gp_id).all()
-    gp_participation_map = {gp_id: count for gp_id, count in part_counts}
-
-    race_results_db = db.query(RaceResult).all()
-    official_results = {}
-    for rr in race_results_db:
-        official_results[rr.gp_id] = {
-            "positions": {p.position: p.driver_name for p in rr.positions},
-            "events": {e.event_type: e.value for e in rr.events}
-        }
-
-    # 2. BUCLE GLOBAL (ARAÑA)
-    metrics_raw = []
-    for u in all_users:
-        u_preds = db.query(Prediction).filter(Prediction.user_id == u.id).all()
-        if not u_preds: continue
-
-        points_list = [p.points for p in u_preds]
-        regularity_raw = statistics.variance(points_list) if len(points_list) >= 3 else 999999
-
-        user_created_at = u.created_at.replace(tzinfo=timezone.utc) if u.created_at else datetime.min.replace(tzinfo=timezone.utc)
-        relevant_gps = sum(1 for d in gps_dates.values() if (d if d.tzinfo else d.replace(tzinfo=timezone.utc)) > (user_created_at if user_created_at.tzinfo else user_created_at.replace(tzinfo=timezone.utc)))
-        commitment_raw = 1.0 if relevant_gps == 0 else len(u_preds) / relevant_gps
-
-        deltas = []
-        for p in u_preds:
-            gp_date = gps_dates.get(p.gp_id)
-            if gp_date:
-                p_date = p.updated_at.replace(tzinfo=timezone.utc) if p.updated_at.tzinfo is None else p.updated_at
-                gp_dt = gp_date.replace(tzinfo=timezone.utc) if gp_date.tzinfo is None else gp_date
-                deltas.append(max(0, (gp_dt - p_date).total_seconds()))
-        anticipation_raw = statistics.mean(deltas) if deltas else 0
-
-        weighted_sum = sum((p.points * gp_participation_map.get(p.gp_id, 1)) for p in u_preds)
-        podium_raw = weighted_sum / len(u_preds) if u_preds else 0
-
-        hits, possible = 0, 0
-        for p in u_preds:
-            official = official_results.get(p.gp_id)
-            if not official: continue
-            for pp in p.positions:
-                possible += 1
-                if official["positions"].get(pp.position) == pp.driver_name: hits += 1
-            for pe in p.events:
-                possible += 1
-                if official["events"].get(pe.event_type, "").lower() == pe.value.lower(): hits += 1
-        vidente_raw = hits / possible if possible > 0 else 0
-
-        metrics_raw.append({
-            "id": u.id, "reg": regularity_raw, "com": commitment_raw, 
-            "ant": anticipation_raw, "pod": podium_raw, "vid": vidente_raw
-        })
+
+    # 2. MÉTRICAS DEL RADAR: materializadas en user_profile_metrics (ver services/profile_metrics.py)
+    my_m, bounds = load_profile_metrics(db, target_user_id)
 
     # 3. DATOS DEL USUARIO TARGET (AQUÍ ESTABA EL ERROR)
     target_preds = db.query(Prediction).filter(Prediction.user_id == target_user_id).all()
+    # Puesto y percentil vienen precalculados por GP; los que falten (BD anterior) se calculan una vez
+    unranked_gp_ids = {p.gp_id for p in target_preds if p.gp_rank is None}
+    if unranked_gp_ids:
+        refresh_gp_ranks(db, unranked_gp_ids)
+        db.commit()
+        target_preds = db.query(Prediction).filter(Prediction.user_id == target_user_id).all()
     # Ordenar
     target_preds_sorted = sorted(target_preds, key=lambda p: gps_dates.get(p.gp_id, datetime.min))
     
@@ -396,10 +208,9 @@ def _calculate_stats(db: Session, target_user_id: int):
 
     trophies = {"gold": 0, "silver": 0, "bronze": 0}
     for p in target_preds:
-        better = db.query(func.count(Prediction.id)).filter(Prediction.gp_id == p.gp_id, Prediction.points > p.points).scalar()
-        if better == 0: trophies["gold"] += 1
-        elif better == 1: trophies["silver"] += 1
-        elif better == 2: trophies["bronze"] += 1
+        if p.gp_rank == 1: trophies["gold"] += 1
+        elif p.gp_rank == 2: trophies["silver"] += 1
+        elif p.gp_rank == 3: trophies["bronze"] += 1
     
     # CORRECCIÓN AQUÍ: Definimos la variable correctamente
     podium_ratio_percent = int(((trophies["gold"]+trophies["silver"]+trophies["bronze"]) / races_played * 100)) if races_played > 0 else 0
@@ -423,11 +234,7 @@ def _calculate_stats(db: Session, target_user_id: int):
         best_p = max(target_preds, key=lambda p: p.points)
         bgp = gps_data.get(best_p.gp_id)
         if bgp:
-            total_in_race = gp_participation_map.get(best_p.gp_id, 1)
-            worse = db.query(func.count(Prediction.id)).filter(Prediction.gp_id == best_p.gp_id, Prediction.points < best_p.points).scalar()
-            perc = 100
-            if total_in_race > 1:
-                perc = 100 - int((worse / (total_in_race - 1)) * 100)
+            perc = best_p.gp_percentile
             insights["best_race"] = {"gp_name": bgp.name, "year": bgp.season.year if bgp.season else 2026, "points": best_p.points, "percentile": f"Top {max(1, perc)}%"}
 
         # Momentum
@@ -439,20 +246,11 @@ def _calculate_stats(db: Session, target_user_id: int):
 
     # 5. RADAR FINAL
     radar_data = []
-    if metrics_raw:
-        regs = [m["reg"] for m in metrics_raw]; coms = [m["com"] for m in metrics_raw]
-        ants = [m["ant"] for m in metrics_raw]; pods = [m["pod"] for m in metrics_raw]
-        vids = [m["vid"] for m in metrics_raw]
-        my_m = next((m for m in metrics_raw if m["id"] == target_user_id), None)
-        
-        if my_m:
-            radar_data = [
-                {"subject": "Regularidad", "A": normalize_score(my_m["reg"], min(regs), max(regs), reverse=True), "fullMark": 100},
-                {"subject": "Compromiso", "A": normalize_score(my_m["com"], min(coms), max(coms)), "fullMark": 100},
-                {"subject": "Anticipación", "A": normalize_score(my_m["ant"], min(ants), max(ants)), "fullMark": 100},
-                {"subject": "Calidad/Podios", "A": normalize_score(my_m["pod"], min(pods), max(pods)), "fullMark": 100},
-                {"subject": "Vidente", "A": normalize_score(my_m["vid"], min(vids), max(vids)), "fullMark": 100}
-            ]
+    if my_m:
+        radar_data = [
+            {"subject": label, "A": normalize_score(getattr(my_m, column), *bounds[column], reverse=reverse), "fullMark": 100}
+            for column, label, reverse in RADAR_AXES
+        ]
             
     if not radar_data:
         radar_data = [{"subject": "N/A", "A": 0, "fullMark": 100}]
@@ -475,11 +273,14 @@ def get_all_users_light(current_user: User = Depends(get_current_user)):
     return [{"id": u.id, "username": u.username, "acronym": u.acronym, "avatar": u.avatar, "created_at": u.created_at} for u in users]
 
 @router.get("/me")
-def get_my_stats(current_user: User = Depends(get_current_user)):
+def get_my_stats(request: Request, current_user: User = Depends(get_current_user)):
     db = SessionLocal()
-    res = _calculate_stats(db, current_user.id)
-    db.close()
-    return res
+    try:
+        # Mismo path para todos: la clave de caché lleva el usuario.
+        # Lee datos de todas las temporadas, así que se etiqueta con la versión global
+        return cached_json(request, db, lambda: _calculate_stats(db, current_user.id), vary=f"user:{current_user.id}")
+    finally:
+        db.close()
 
 @router.get("/user/{user_id}")
 def get_user_stats(user_id: int, current_user: User = Depends(get_current_user)):
@@ -8,6 +8,7 @@ from app.db.models.team_member import TeamMember
 from app.db.models.season import Season
 from app.core.deps import get_current_user
 from app.services.achievements_service import grant_achievements
+from app.services.response_cache import bump_data_version
 
 router = APIRouter(prefix="/teams", tags=["Player Teams"])
 
@@ -108,6 +109,7 @@ def create_team_player(name: str, current_user = Depends(get_current_user)):
     )
     db.add(membership)
     
+    bump_data_version(db, active_season.id)
     db.commit()
     db.refresh(new_team)
     grant_achievements(db, current_user.id, ["event_founder","event_join_team"])
@@ -167,6 +169,7 @@ def join_team_player(code: str, current_user = Depends(get_current_user)):
     # -------------------------------------------------------
     team_name = team.name 
     
+    bump_data_version(db, active_season.id)
     db.commit()
     grant_achievements(db, current_user.id, ["event_join_team"])
     db.close()
@@ -201,6 +204,7 @@ def leave_team_player(current_user = Depends(get_current_user)):
     
     # 2. Borrar membresía
     db.delete(membership)
+    bump_data_version(db, active_season.id)
     db.commit() # Confirmamos la salida
 
     # 3. Verificar si el equipo quedó vacío
@@ -211,6 +215,7 @@ def leave_team_player(current_user = Depends(get_current_user)):
         team_to_delete = db.query(Team).get(team_id)
         if team_to_delete:
             db.delete(team_to_delete)
+            bump_data_version(db, active_season.id)
             db.commit()
 
     db.close()
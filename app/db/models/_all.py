@@ -16,4 +16,6 @@ from app.db.models.bingo import BingoSelection
 from app.db.models.bingo import BingoTile
 from app.db.models.avatar import Avatar
 from app.db.models.achievement import Achievement, UserAchievement
-from app.db.models.user_stats import UserStats
\ No newline at end of file
+from app.db.models.user_stats import UserStats, UserSeasonStats, UserProfileMetrics
+from app.db.models.rebuild_job import RebuildJob
+from app.db.models.data_version import DataVersion
\ No newline at end of file
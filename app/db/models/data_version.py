@@ -0,0 +1,23 @@
+# app/db/models/data_version.py
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DateTime, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.session import Base
+
+class DataVersion(Base):
+    """
+    Contador de cambios por temporada (season_id 0 = datos globales: usuarios,
+    temporadas...). Las rutas de escritura lo incrementan en su misma transacción
+    y la caché de respuestas lo compara: vive en la BD para que todos los workers
+    vean el mismo valor. `rules_version` solo sube cuando cambian las reglas
+    (parrilla y multiplicadores; en la fila 0, el catálogo de logros).
+    """
+    __tablename__ = "data_versions"
+
+    # Sin FK a seasons: la fila 0 no es una temporada y borrar una no debe fallar
+    season_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    version: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    rules_version: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
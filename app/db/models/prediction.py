@@ -1,9 +1,10 @@
 # app/db/models/prediction.py
-from sqlalchemy import Integer, ForeignKey, Boolean, UniqueConstraint, DateTime # <--- AÑADIR DateTime
+from sqlalchemy import Integer, ForeignKey, Boolean, UniqueConstraint, DateTime, LargeBinary # <--- AÑADIR DateTime
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func # <--- AÑADIR func
 from app.db.session import Base
 from datetime import datetime # <--- AÑADIR datetime
+from typing import Optional
 
 class Prediction(Base):
     __tablename__ = "predictions"
@@ -18,6 +19,12 @@ class Prediction(Base):
     points_base: Mapped[int] = mapped_column(Integer, default=0)
     multiplier: Mapped[float] = mapped_column(default=1.0)
     points: Mapped[int] = mapped_column(Integer, default=0)
+    # Top 10 empaquetado: 1 byte por posición con el índice del piloto en la parrilla de la temporada
+    packed_positions: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+    # Puesto en su GP (1 + predicciones con más puntos; empates comparten puesto) y
+    # percentil del "Top X%" de /stats. Los mantiene refresh_gp_ranks al puntuar
+    gp_rank: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    gp_percentile: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
     
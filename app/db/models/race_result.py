@@ -1,5 +1,7 @@
 # app/db/models/race_result.py
-from sqlalchemy import Integer, ForeignKey
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import Integer, ForeignKey, LargeBinary, DateTime
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.session import Base
 
@@ -8,6 +10,11 @@ class RaceResult(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     gp_id: Mapped[int] = mapped_column(Integer, ForeignKey("grand_prix.id"), nullable=False)
+    # Clasificación empaquetada: 1 byte por posición con el índice del piloto en la parrilla de la temporada
+    packed_positions: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+    # Última vez que se puntuaron TODAS las predicciones del GP contra este resultado.
+    # Una predicción con updated_at posterior está sin puntuar (ver results_service)
+    scored_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
 
     # Relaciones
     grand_prix: Mapped["GrandPrix"] = relationship("GrandPrix", back_populates="race_result")
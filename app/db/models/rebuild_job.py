@@ -0,0 +1,44 @@
+# app/db/models/rebuild_job.py
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Boolean, DateTime, Integer, JSON, String, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.session import Base
+
+class RebuildJob(Base):
+    """
+    Reconstrucción de logros en segundo plano. El estado acumulado vive en las
+    propias tablas (user_stats, user_gp_stats, user_achievements), que se
+    actualizan en el mismo commit que `processed_gps`: ese commit es el checkpoint.
+    """
+    __tablename__ = "rebuild_jobs"
+    __table_args__ = (
+        # Solo un job activo a la vez, aunque dos workers lo creen a la vez
+        UniqueConstraint("active", name="uq_rebuild_jobs_active"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    status: Mapped[str] = mapped_column(String, default="PENDING") # PENDING, RUNNING, DONE, FAILED
+
+    # Plan fijado al crear el job: IDs de GP en orden cronológico
+    gp_ids: Mapped[list] = mapped_column(JSON, default=list)
+    total_gps: Mapped[int] = mapped_column(Integer, default=0)
+    processed_gps: Mapped[int] = mapped_column(Integer, default=0)
+    last_gp_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+
+    # [{"gp_id", "name", "seconds"}] de cada GP procesado
+    timings: Mapped[list] = mapped_column(JSON, default=list)
+    error: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+
+    # True mientras está PENDING/RUNNING y NULL al terminar (los NULL no chocan en el índice único)
+    active: Mapped[Optional[bool]] = mapped_column(Boolean, nullable=True)
+    # Worker que lo ejecuta ("host:pid") y su último latido: si el latido es más
+    # viejo que el lease (rebuild_jobs.LEASE_SECONDS), otro worker puede reclamarlo
+    owner: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
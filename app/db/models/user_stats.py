@@ -1,5 +1,5 @@
 # app/db/models/user_stats.py
-from sqlalchemy import Column, Integer, String, ForeignKey, JSON, Boolean, Float, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, JSON, Boolean, Float, DateTime, Index, text
 from sqlalchemy.orm import relationship
 from app.db.session import Base
 
@@ -40,6 +40,7 @@ class UserStats(Base):
     season_rankings = Column(JSON, default=dict)
 
     # --- SEASON STATS ACTUALES ---
+    # Puntos de la temporada de su último GP jugado (copia de su UserSeasonStats)
     current_season_points = Column(Float, default=0.0)
     
     user = relationship("User", backref="stats")
@@ -62,4 +63,54 @@ class UserGpStats(Base):
     fastest_lap_hit = Column(Boolean, default=False)
     safety_car_hit = Column(Boolean, default=False)
     dnf_count_hit = Column(Boolean, default=False)
-    dnf_driver_hit = Column(Boolean, default=False)
\ No newline at end of file
+    dnf_driver_hit = Column(Boolean, default=False)
+
+    # Métricas solo para logros de EVENTO: la revocación consulta aquí (EXISTS)
+    # en vez de recalcular todas las predicciones del usuario
+    exact_top5_hit = Column(Boolean, default=False)
+    p10_hit = Column(Boolean, default=False)
+    events_hit = Column(Integer, default=0) # 0-4: FL, SC, nº DNFs, piloto DNF
+    oracle_hit = Column(Boolean, default=False) # Top 10 completo (sin importar el orden)
+
+    __table_args__ = (
+        Index("ix_user_gp_stats_user_exact", "user_id", "exact_positions"),
+        Index("ix_user_gp_stats_user_points", "user_id", "points"),
+    )
+
+class UserSeasonStats(Base):
+    """
+    Acumulado de un usuario en UNA temporada, mantenido desde UserGpStats
+    (mismo suma/resta incremental que UserStats). Clasificaciones de temporada,
+    premios finales y logros SEASON leen de aquí.
+    """
+    __tablename__ = "user_season_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    season_id = Column(Integer, ForeignKey("seasons.id"), primary_key=True)
+
+    points = Column(Float, default=0.0)
+    gps_played = Column(Integer, default=0)
+    exact_positions_count = Column(Integer, default=0)
+    last_gp_played_id = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        # Clasificación de una temporada (más puntos primero, empates por user_id):
+        # el líder o el top N se leen del índice sin ordenar
+        Index("ix_user_season_stats_season_points", "season_id", text("points DESC"), "user_id"),
+    )
+
+class UserProfileMetrics(Base):
+    """
+    Valores en bruto del radar de perfil (/stats/me, /stats/user/{id}) de cada
+    usuario con predicciones. Los mínimos y máximos globales salen de los índices
+    de cada columna; se refresca desde app/services/profile_metrics.py.
+    """
+    __tablename__ = "user_profile_metrics"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+
+    regularity = Column(Float, default=0.0, index=True)     # Varianza de puntos (menos es mejor)
+    commitment = Column(Float, default=0.0, index=True)     # Predicciones / GPs desde el alta
+    anticipation = Column(Float, default=0.0, index=True)   # Segundos medios de antelación
+    podium = Column(Float, default=0.0, index=True)         # Puntos ponderados por participación
+    vidente = Column(Float, default=0.0, index=True)        # Aciertos / elementos predichos
@@ -250,12 +250,8 @@ def generate_prediction(real_pos, real_evts, skill):
     
     return pred_pos, pred_evts
 
-def simulate_gp(db, season, gp_name, race_date, users, skill_map, drivers, multipliers):
-    # Crear GP
-    gp = GrandPrix(name=f"GP {gp_name}", race_datetime=race_date, season_id=season.id)
-    db.add(gp); db.commit()
-    
-    # 1. Generar Resultado Real
+def generate_race_result(drivers):
+    """Devuelve (real_pos, real_evts) de una carrera aleatoria con la parrilla dada."""
     top_tier = ["VER", "NOR", "LEC", "HAM", "PIA"]
     mid_tier = ["RUS", "SAI", "ALO", "GAS", "TSU"]
     low_tier = [d for d in drivers if d not in top_tier and d not in mid_tier]
@@ -282,6 +278,15 @@ def simulate_gp(db, season, gp_name, race_date, users, skill_map, drivers, multi
         "DNFS": str(num_dnfs),
         "DNF_DRIVER": dnf_str,
     }
+    return real_pos, real_evts
+
+def simulate_gp(db, season, gp_name, race_date, users, skill_map, drivers, multipliers):
+    # Crear GP
+    gp = GrandPrix(name=f"GP {gp_name}", race_datetime=race_date, season_id=season.id)
+    db.add(gp); db.commit()
+    
+    # 1. Generar Resultado Real
+    real_pos, real_evts = generate_race_result(drivers)
     
     # Guardar Resultado
     res = RaceResult(gp_id=gp.id)
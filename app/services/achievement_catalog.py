@@ -0,0 +1,78 @@
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from sqlalchemy.orm import Session
+
+from app.db.models.achievement import Achievement, AchievementRarity, AchievementType
+from app.services.response_cache import rules_version
+
+# ==============================================================================
+# CATÁLOGO DE LOGROS (SLUG -> ID, TIPO, RAREZA)
+# ==============================================================================
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    # Lo mínimo para conceder/revocar sin tocar la tabla achievements
+    id: int
+    slug: str
+    type: AchievementType
+    rarity: AchievementRarity
+
+@dataclass(frozen=True)
+class AchievementCatalog:
+    by_slug: Mapping[str, CatalogEntry]
+    by_id: Mapping[int, CatalogEntry]
+
+    def get(self, slug: str) -> Optional[CatalogEntry]:
+        return self.by_slug.get(slug)
+
+def load_achievement_catalog(db: Session) -> AchievementCatalog:
+    entries = [
+        CatalogEntry(ach_id, slug, ach_type, rarity)
+        for ach_id, slug, ach_type, rarity in db.query(
+            Achievement.id, Achievement.slug, Achievement.type, Achievement.rarity
+        )
+    ]
+    return AchievementCatalog(
+        by_slug=MappingProxyType({e.slug: e for e in entries}),
+        by_id=MappingProxyType({e.id: e for e in entries}),
+    )
+
+# ==============================================================================
+# CACHÉ EN PROCESO
+# ==============================================================================
+
+# (versión de reglas global con la que se cargó, catálogo)
+_catalog: Optional[tuple[int, AchievementCatalog]] = None
+_catalog_lock = threading.Lock()
+
+def get_achievement_catalog(db: Session) -> AchievementCatalog:
+    """
+    Catálogo cacheado con la rules_version global de data_versions: si otro
+    worker siembra o re-tipa logros (y sube la versión), aquí se recarga.
+    """
+    global _catalog
+    version = rules_version(db)
+    with _catalog_lock:
+        entry = _catalog
+    if entry and entry[0] == version:
+        return entry[1]
+
+    catalog = load_achievement_catalog(db)
+    # Un catálogo vacío (BD aún sin sembrar) no se guarda: se vuelve a leer la próxima vez
+    if catalog.by_slug:
+        with _catalog_lock:
+            _catalog = (version, catalog)
+    return catalog
+
+def invalidate_achievement_catalog():
+    """
+    Descarta la caché de este proceso. Crear, borrar o re-tipar logros debe
+    además subir la versión de reglas global (bump_rules_version(db)) en su
+    transacción para que los demás workers recarguen (seed_achievements lo hace).
+    """
+    global _catalog
+    with _catalog_lock:
+        _catalog = None
@@ -0,0 +1,183 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, Iterable, Mapping, Sequence, Set, Tuple
+
+import numpy as np
+
+from app.db.models.achievement import AchievementType
+
+# ==============================================================================
+# 1. REGLAS
+# ==============================================================================
+
+@dataclass(frozen=True)
+class AchievementRule:
+    """
+    Un logro dinámico: su tipo, las columnas que lee y un predicado sobre ellas.
+    El predicado recibe {columna: array} (una fila por usuario, o un escalar común
+    a todo el GP) y devuelve un array de bool. Solo ve las columnas de `inputs`.
+    """
+    slug: str
+    type: AchievementType
+    inputs: Tuple[str, ...]
+    predicate: Callable[[Mapping[str, np.ndarray]], np.ndarray]
+
+def _at_least(slug: str, type_: AchievementType, column: str, minimum: float) -> AchievementRule:
+    return AchievementRule(slug, type_, (column,), lambda c: c[column] >= minimum)
+
+def _rule(slug: str, inputs: str, predicate: Callable) -> AchievementRule:
+    return AchievementRule(slug, AchievementType.EVENT, tuple(inputs.split()), predicate)
+
+CAREER, SEASON = AchievementType.CAREER, AchievementType.SEASON
+
+# --- CAREER / SEASON: sobre los UserStats acumulados ---
+CAREER_SEASON_RULES = (
+    # CAREER (Acumulativo Global)
+    _at_least("career_debut", CAREER, "total_gps_played", 1),
+    _at_least("career_500", CAREER, "total_points", 500),
+    _at_least("career_1000", CAREER, "total_points", 1000),
+    _at_least("career_2500", CAREER, "total_points", 2500),
+    _at_least("career_50_gps", CAREER, "total_gps_played", 50),
+    _at_least("career_50_exact", CAREER, "exact_positions_count", 50),
+    _at_least("career_goat", CAREER, "total_points", 5000),
+    _at_least("career_100_exact", CAREER, "exact_positions_count", 100),
+    _at_least("career_10_full_podium", CAREER, "exact_podiums_count", 10),
+    _at_least("career_5_sc", CAREER, "safety_car_hits", 5),
+    _at_least("career_10_sc", CAREER, "safety_car_hits", 10),
+    _at_least("career_5_fl", CAREER, "fastest_lap_hits", 5),
+    _at_least("career_10_fl", CAREER, "fastest_lap_hits", 10),
+    _at_least("career_5_dnf_count", CAREER, "dnf_count_hits", 5),
+    _at_least("career_10_dnf_count", CAREER, "dnf_count_hits", 10),
+    _at_least("career_5_dnf_driver", CAREER, "dnf_driver_hits", 5),
+    _at_least("career_10_dnf_driver", CAREER, "dnf_driver_hits", 10),
+    # SEASON (Acumulativo de la temporada del GP: UserSeasonStats)
+    _at_least("season_100", SEASON, "season_points", 100),
+    _at_least("season_300", SEASON, "season_points", 300),
+    _at_least("season_500", SEASON, "season_points", 500),
+)
+
+# --- EVENT: sobre las métricas del GP (ver event_features en achievements_service) ---
+EVENT_RULES = (
+    # Puntos
+    _rule("event_first", "points", lambda c: c["points"] > 0),
+    _rule("event_25pts", "points", lambda c: c["points"] > 25),
+    _rule("event_50pts", "points", lambda c: c["points"] > 50),
+    _rule("event_diamante", "points", lambda c: c["points"] > 75),
+    _rule("event_maldonado", "points", lambda c: c["points"] == 0),
+    # Aciertos exactos
+    _rule("event_nostradamus", "exact_podium_hit", lambda c: c["exact_podium_hit"]),
+    _rule("event_el_profesor", "exact_top5_hit", lambda c: c["exact_top5_hit"]),
+    _rule("event_high_five", "exact_positions", lambda c: c["exact_positions"] >= 5),
+    _rule("event_sexto_sentido", "exact_positions", lambda c: c["exact_positions"] >= 6),
+    _rule("event_7_maravillas", "exact_positions", lambda c: c["exact_positions"] >= 7),
+    _rule("event_bola_8", "exact_positions", lambda c: c["exact_positions"] >= 8),
+    _rule("event_nube_9", "exact_positions", lambda c: c["exact_positions"] >= 9),
+    _rule("event_la_decima", "exact_positions", lambda c: c["exact_positions"] >= 10),
+    _rule("event_francotirador_p10", "p10_hit", lambda c: c["p10_hit"]),
+    # Eventos perfectos y combinados (Dios: 10 posiciones + 4 eventos)
+    _rule("event_mc", "events_hit", lambda c: c["events_hit"] == 4),
+    _rule("event_el_narrador", "events_hit", lambda c: c["events_hit"] == 4),
+    _rule("event_god", "exact_positions events_hit",
+          lambda c: (c["exact_positions"] == 10) & (c["events_hit"] == 4)),
+    _rule("event_casi_dios", "exact_positions events_hit", lambda c: (
+        ((c["exact_positions"] == 10) & (c["events_hit"] == 3))
+        | ((c["exact_positions"] == 9) & (c["events_hit"] == 4))
+    )),
+    _rule("event_oracle", "oracle_hit", lambda c: c["oracle_hit"]),
+    # Posiciones concretas
+    _rule("event_grand_chelem", "safety_car_hit fastest_lap_hit hit_p1",
+          lambda c: c["safety_car_hit"] & c["fastest_lap_hit"] & c["hit_p1"]),
+    _rule("event_chaos", "real_dnfs dnf_count_hit", lambda c: (c["real_dnfs"] > 4) & c["dnf_count_hit"]),
+    _rule("event_el_optimista", "predicted_dnfs dnf_count_hit",
+          lambda c: (c["predicted_dnfs"] == 0) & c["dnf_count_hit"]),
+    _rule("event_la_escoba", "fastest_lap_hit fastest_lap_off_podium",
+          lambda c: c["fastest_lap_hit"] & c["fastest_lap_off_podium"]),
+    _rule("event_la_maldicion", "p1_dnf", lambda c: c["p1_dnf"]),
+    _rule("event_podio_invertido", "inverted_podium", lambda c: c["inverted_podium"]),
+    _rule("event_el_sandwich", "hit_p1 hit_p2 hit_p3", lambda c: c["hit_p1"] & c["hit_p3"] & ~c["hit_p2"]),
+    # Solo P1 acertado y ningún evento
+    _rule("event_el_elegido", "hit_p1 exact_positions events_hit",
+          lambda c: c["hit_p1"] & (c["exact_positions"] == 1) & (c["events_hit"] == 0)),
+    # Compañeros de equipo (parrilla de la temporada)
+    _rule("event_civil_war", "civil_war", lambda c: c["civil_war"]),
+    _rule("event_el_muro", "teammates_wall", lambda c: c["teammates_wall"]),
+    # Globales: dependen de OTROS usuarios (GpContext)
+    _rule("event_join_team", "has_team", lambda c: c["has_team"]),
+    # Lobo Solitario: MVP del GP sin equipo (max_points es NaN si nadie predijo)
+    _rule("event_lobo_solitario", "points max_points has_team",
+          lambda c: (c["points"] == c["max_points"]) & ~c["has_team"]),
+    # David vs Goliath: el doble que el líder del mundial en este GP
+    _rule("event_david_goliath", "points max_points has_leader leader_gp_points", lambda c: (
+        ~np.isnan(c["max_points"]) & c["has_leader"]
+        & (c["points"] >= c["leader_gp_points"] * 2) & (c["leader_gp_points"] > 0)
+    )),
+)
+
+ACHIEVEMENT_RULES = CAREER_SEASON_RULES + EVENT_RULES
+
+def dynamic_slugs(rules: Iterable[AchievementRule] = ACHIEVEMENT_RULES) -> FrozenSet[str]:
+    """Logros que se conceden y revocan según las reglas (los finales de temporada no)."""
+    return frozenset(rule.slug for rule in rules)
+
+# ==============================================================================
+# 2. EVALUACIÓN VECTORIZADA
+# ==============================================================================
+
+def stats_columns(rows: Sequence, season_points: Sequence[float]) -> Dict[str, np.ndarray]:
+    """
+    Columnas de CAREER_SEASON_RULES a partir de filas UserStats (o planas) y de
+    los puntos de temporada de cada una (mismo orden).
+    """
+    names = {name for rule in CAREER_SEASON_RULES for name in rule.inputs} - {"season_points"}
+    columns = {name: np.array([getattr(row, name) for row in rows], dtype=np.float64) for name in names}
+    columns["season_points"] = np.array(season_points, dtype=np.float64)
+    return columns
+
+def _same(before, after) -> bool:
+    return before is not None and np.shape(before) == np.shape(after) and np.array_equal(before, after)
+
+class RuleEvaluator:
+    """
+    Evalúa un grupo de reglas en una sola pasada sobre columnas NumPy.
+    Recuerda las columnas de la pasada anterior: si las entradas de una regla no
+    cambiaron (mismos usuarios, mismos valores), reutiliza su resultado.
+    """
+
+    def __init__(self, rules: Iterable[AchievementRule]):
+        self.rules = tuple(rules)
+        self.inputs = sorted({name for rule in self.rules for name in rule.inputs})
+        self.skipped = 0
+        self._last_keys = None
+        self._last_columns = {}
+        self._last_results = {}
+
+    def evaluate(self, keys: Sequence[int], columns: Mapping[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """{slug: máscara bool} con una posición por cada elemento de `keys` (user_ids)."""
+        keys = np.asarray(keys)
+        if not _same(self._last_keys, keys):
+            self._last_columns, self._last_results = {}, {}
+        changed = {name for name in self.inputs if not _same(self._last_columns.get(name), columns[name])}
+
+        results = {}
+        for rule in self.rules:
+            if rule.slug in self._last_results and changed.isdisjoint(rule.inputs):
+                results[rule.slug] = self._last_results[rule.slug]
+                self.skipped += 1
+                continue
+            mask = rule.predicate({name: columns[name] for name in rule.inputs})
+            results[rule.slug] = np.broadcast_to(np.asarray(mask, dtype=bool), keys.shape)
+
+        self._last_keys = keys
+        self._last_columns = {name: columns[name] for name in self.inputs}
+        self._last_results = results
+        return results
+
+    def slugs_by_key(self, keys: Sequence[int], columns: Mapping[str, np.ndarray]) -> Dict[int, Set[str]]:
+        """{key: slugs que cumple} a partir de evaluate()."""
+        keys = list(keys)
+        unlocks = {key: set() for key in keys}
+        if not keys:
+            return unlocks
+        for slug, mask in self.evaluate(keys, columns).items():
+            for i in np.flatnonzero(mask).tolist():
+                unlocks[keys[i]].add(slug)
+        return unlocks
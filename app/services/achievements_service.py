@@ -1,6 +1,10 @@
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, desc, and_, or_
-from typing import Set, List, Optional
+from collections import defaultdict
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+import numpy as np
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import func, desc, and_, or_, bindparam, case, insert, delete
+from typing import Callable, FrozenSet, Iterable, NamedTuple, Set, List, Optional, Tuple
 
 # Modelos
 from app.db.models.achievement import Achievement, UserAchievement, AchievementType
@@ -14,48 +18,40 @@ from app.db.models.grand_prix import GrandPrix
 from app.db.models.user import User
 from app.db.models.driver import Driver
 from app.db.models.constructor import Constructor
-from app.db.models.user_stats import UserStats, UserGpStats # <--- IMPORTANTE
+from app.db.models.user_stats import UserStats, UserGpStats, UserSeasonStats # <--- IMPORTANTE
 from app.db.models.team_member import TeamMember
+from app.services.scoring import ResultIndex, build_result_index
+from app.services.season_rules import SeasonRules, get_season_rules
+from app.services.packing import PackedPosition, positions_of, unpack_positions
+from app.services.achievement_catalog import AchievementCatalog, CatalogEntry, get_achievement_catalog
+from app.services.response_cache import bump_data_version
+from app.services.achievement_rules import (
+    CAREER_SEASON_RULES,
+    EVENT_RULES,
+    RuleEvaluator,
+    dynamic_slugs,
+    stats_columns,
+)
 
 # ==============================================================================
 # 0. CONFIGURACIÓN
 # ==============================================================================
 
 def get_dynamic_slugs() -> Set[str]:
-    return {
-        # Career Stats
-        "career_debut", "career_500", "career_1000", "career_2500", 
-        "career_50_gps", "career_50_exact", 
-        "career_goat", "career_100_exact", "career_10_full_podium",
-        "career_5_fl", "career_10_fl",
-        "career_5_sc", "career_10_sc",
-        "career_5_dnf_count", "career_10_dnf_count",
-        "career_5_dnf_driver", "career_10_dnf_driver",
-        # Season Stats (Puntos)
-        "season_100", "season_300", "season_500",
-        # Eventos
-        "event_first", "event_join_team", "event_25pts", "event_50pts", 
-        "event_nostradamus", "event_high_five", "event_la_decima", 
-        "event_oracle", "event_mc", "event_god", "event_grand_chelem", 
-        "event_civil_war", "event_chaos", "event_maldonado",
-        # NUEVOS
-        "event_el_profesor", "event_sexto_sentido", "event_7_maravillas",
-        "event_bola_8", "event_nube_9", "event_el_narrador",
-        "event_casi_dios", "event_diamante", "event_el_optimista",
-        "event_la_escoba", "event_el_muro", "event_francotirador_p10",
-        "event_la_maldicion", "event_podio_invertido",
-        "event_el_elegido", "event_el_sandwich", "event_lobo_solitario",
-        "event_david_goliath"
-    }
+    # Se deriva del registro de reglas (achievement_rules.py): no hay lista a mano
+    return set(dynamic_slugs())
+
+_DYNAMIC_SLUGS = frozenset(get_dynamic_slugs())
 
 # ==============================================================================
 # 1. GESTIÓN DE ESTADÍSTICAS (INCREMENTAL ROBUSTO + CACHÉ)
 # ==============================================================================
 
-def calculate_gp_metrics(prediction: Prediction, result: RaceResult) -> dict:
+def calculate_gp_metrics(prediction: Prediction, result: RaceResult | ResultIndex) -> dict:
     """
     Compara predicción y resultado y devuelve un diccionario con los contadores.
     No guarda nada en DB, solo calcula lógica pura.
+    `result` puede ser un RaceResult o su ResultIndex ya construido.
     """
     metrics = {
         "points": prediction.points or 0,
@@ -66,15 +62,18 @@ def calculate_gp_metrics(prediction: Prediction, result: RaceResult) -> dict:
         "safety_car_hit": False,
         "dnf_count_hit": False,
         "dnf_driver_hit": False,
-        "p10_hit": False # Nuevo
+        "p10_hit": False, # Nuevo
+        "events_hit": 0,
+        "oracle_hit": False
     }
 
     if not result: return metrics
 
-    u_pos = {p.position: p.driver_name for p in prediction.positions}
-    r_pos = {p.position: p.driver_name for p in result.positions}
+    index = build_result_index(result)
+    u_pos = {p.position: p.driver_name for p in positions_of(prediction, index.roster)}
+    r_pos = index.drivers_by_position
     u_evts = {e.event_type: e.value for e in prediction.events}
-    r_evts = {e.event_type: e.value for e in result.events}
+    r_evts = index.events
 
     # 1. Posiciones Exactas
     metrics["exact_positions"] = sum(1 for i in range(1, 11) if u_pos.get(i) == r_pos.get(i))
@@ -103,56 +102,81 @@ def calculate_gp_metrics(prediction: Prediction, result: RaceResult) -> dict:
 
     # 4. DNF Driver
     u_dnf = str(u_evts.get("DNF_DRIVER", "")).strip()
-    r_dnf_raw = str(r_evts.get("DNF_DRIVER", ""))
-    r_dnf_list = [x.strip() for x in r_dnf_raw.split(",")]
     r_dnf_count = int(r_evts.get("DNFS", 0))
 
     if r_dnf_count == 0 and u_dnf in ["", "0", "None", "-", "no"]:
         metrics["dnf_driver_hit"] = True
-    elif r_dnf_count > 0 and u_dnf and u_dnf in r_dnf_list:
+    elif r_dnf_count > 0 and u_dnf and u_dnf in index.dnf_drivers:
         metrics["dnf_driver_hit"] = True
 
-    return metrics
+    metrics["events_hit"] = sum([
+        metrics["safety_car_hit"], metrics["fastest_lap_hit"], metrics["dnf_count_hit"], metrics["dnf_driver_hit"]
+    ])
 
+    # 5. Oracle: los 10 del Top 10 real, sin importar el orden
+    user_top10 = {u_pos.get(i) for i in range(1, 11) if u_pos.get(i)}
+    metrics["oracle_hit"] = len(index.top10) == 10 and index.top10 == user_top10
 
-def update_stats_incremental(db: Session, user_id: int, gp: GrandPrix) -> UserStats:
-    """
-    Actualiza UserStats usando UserGpStats como caché intermedia.
-    Permite re-ejecutar el mismo GP y corrige los datos (Restar anterior, Sumar nuevo).
-    """
-    # 1. Obtener Stats Globales
-    stats = db.query(UserStats).filter(UserStats.user_id == user_id).first()
-    if not stats:
-        stats = UserStats(user_id=user_id)
-        db.add(stats)
+    return metrics
 
-    # 2. Protección de orden cronológico:
-    # No calculamos GPs pasados si ya vamos por delante, a menos que sea un Rebuild forzado.
-    # Pero si es el mismo GP que el último jugado (o posterior), permitimos la actualización.
-    if stats.last_gp_played_id and gp.id < stats.last_gp_played_id:
-        # Podríamos lanzar warning, pero simplemente devolvemos stats sin tocar
-        return stats
 
-    # 3. Obtener Predicción y Resultado
-    pred = db.query(Prediction).filter(Prediction.user_id == user_id, Prediction.gp_id == gp.id).first()
-    if not pred or not gp.race_result: 
-        return stats
+# Contadores a 0 ya en memoria (los defaults de columna solo llegan al hacer flush)
+_NEW_STATS_COUNTERS = dict(
+    total_points=0.0, current_season_points=0.0, total_gps_played=0,
+    exact_positions_count=0, exact_podiums_count=0, fastest_lap_hits=0,
+    safety_car_hits=0, dnf_count_hits=0, dnf_driver_hits=0,
+)
 
-    # 4. Calcular Métricas ACTUALES de este GP (En memoria)
-    new = calculate_gp_metrics(pred, gp.race_result)
+_NEW_SEASON_STATS_COUNTERS = dict(points=0.0, gps_played=0, exact_positions_count=0)
 
-    # 5. Buscar si ya existían métricas guardadas para este GP (La "Caché")
-    gp_stats = db.query(UserGpStats).filter(UserGpStats.user_id == user_id, UserGpStats.gp_id == gp.id).first()
+def _new_user_stats(user_id: int) -> UserStats:
+    return UserStats(user_id=user_id, **_NEW_STATS_COUNTERS)
+
+def _new_user_season_stats(user_id: int, season_id: int) -> UserSeasonStats:
+    return UserSeasonStats(user_id=user_id, season_id=season_id, **_NEW_SEASON_STATS_COUNTERS)
 
+def _apply_gp_stats(
+    db: Session,
+    stats: UserStats,
+    season_stats: UserSeasonStats,
+    gp_stats: Optional[UserGpStats],
+    pred: Prediction,
+    gp: GrandPrix,
+    index: Optional[ResultIndex] = None,
+    metrics: Optional[dict] = None
+) -> UserGpStats:
+    """
+    Resta lo que el GP sumó antes (si hay caché) y suma las métricas actuales.
+    No hace queries ni commit; devuelve la fila de caché (nueva o actualizada).
+    """
+    is_new = gp_stats is None
+    # Calcular Métricas ACTUALES de este GP (En memoria)
+    new = metrics or calculate_gp_metrics(pred, index or gp.race_result)
+    gp_stats = _accumulate_gp_stats(stats, season_stats, gp_stats, new, gp)
+    if is_new:
+        db.add(gp_stats)
+    return gp_stats
+
+def _accumulate_gp_stats(
+    stats: UserStats,
+    season_stats: UserSeasonStats,
+    gp_stats: Optional[UserGpStats],
+    new: dict,
+    gp: GrandPrix,
+    new_row: Callable = UserGpStats
+) -> UserGpStats:
+    """
+    Lógica de _apply_gp_stats sin sesión ni cálculo: `new` son las métricas del GP.
+    `season_stats` es el UserSeasonStats del usuario en la temporada del GP.
+    El replay pasa `new_row` para crear filas planas en vez de objetos ORM.
+    """
     if gp_stats:
         # --- MODO CORRECCIÓN: RESTAR LO VIEJO ---
         stats.total_points -= gp_stats.points
-        
-        # Asumimos que estamos corrigiendo la temporada actual
-        if gp.season_id == gp.season_id: 
-            stats.current_season_points -= gp_stats.points
+        season_stats.points -= gp_stats.points
         
         stats.exact_positions_count -= gp_stats.exact_positions
+        season_stats.exact_positions_count -= gp_stats.exact_positions
         if gp_stats.exact_podium_hit: stats.exact_podiums_count -= 1
         if gp_stats.fastest_lap_hit: stats.fastest_lap_hits -= 1
         if gp_stats.safety_car_hit: stats.safety_car_hits -= 1
@@ -161,15 +185,16 @@ def update_stats_incremental(db: Session, user_id: int, gp: GrandPrix) -> UserSt
         
     else:
         # --- MODO NUEVO: CREAR CACHÉ ---
-        gp_stats = UserGpStats(user_id=user_id, gp_id=gp.id)
+        gp_stats = new_row(user_id=stats.user_id, gp_id=gp.id)
         stats.total_gps_played += 1
-        db.add(gp_stats)
+        season_stats.gps_played += 1
 
-    # 6. --- APLICAR: SUMAR LO NUEVO ---
+    # --- APLICAR: SUMAR LO NUEVO ---
     stats.total_points += new["points"]
-    stats.current_season_points += new["points"]
+    season_stats.points += new["points"]
     
     stats.exact_positions_count += new["exact_positions"]
+    season_stats.exact_positions_count += new["exact_positions"]
     if new["exact_podium_hit"]: stats.exact_podiums_count += 1
     if new["fastest_lap_hit"]: stats.fastest_lap_hits += 1
     if new["safety_car_hit"]: stats.safety_car_hits += 1
@@ -180,8 +205,14 @@ def update_stats_incremental(db: Session, user_id: int, gp: GrandPrix) -> UserSt
     if not stats.last_gp_played_id or gp.id >= stats.last_gp_played_id:
         stats.last_gp_played_id = gp.id
         stats.last_gp_played_date = gp.race_datetime
+    if not season_stats.last_gp_played_id or gp.id >= season_stats.last_gp_played_id:
+        season_stats.last_gp_played_id = gp.id
 
-    # 7. Actualizar la "Caché" con los nuevos valores para el futuro
+    # La temporada "actual" del usuario es la de su último GP jugado
+    if season_stats.last_gp_played_id == stats.last_gp_played_id:
+        stats.current_season_points = season_stats.points
+
+    # Actualizar la "Caché" con los nuevos valores para el futuro
     gp_stats.points = new["points"]
     gp_stats.exact_positions = new["exact_positions"]
     gp_stats.exact_podium_hit = new["exact_podium_hit"]
@@ -189,7 +220,45 @@ def update_stats_incremental(db: Session, user_id: int, gp: GrandPrix) -> UserSt
     gp_stats.safety_car_hit = new["safety_car_hit"]
     gp_stats.dnf_count_hit = new["dnf_count_hit"]
     gp_stats.dnf_driver_hit = new["dnf_driver_hit"]
+    gp_stats.exact_top5_hit = new["exact_top5_hit"]
+    gp_stats.p10_hit = new["p10_hit"]
+    gp_stats.events_hit = new["events_hit"]
+    gp_stats.oracle_hit = new["oracle_hit"]
+    return gp_stats
 
+def update_stats_incremental(db: Session, user_id: int, gp: GrandPrix, index: Optional[ResultIndex] = None) -> UserStats:
+    """
+    Actualiza UserStats usando UserGpStats como caché intermedia.
+    Permite re-ejecutar el mismo GP y corrige los datos (Restar anterior, Sumar nuevo).
+    """
+    # 1. Obtener Stats Globales
+    stats = db.query(UserStats).filter(UserStats.user_id == user_id).first()
+    if not stats:
+        stats = _new_user_stats(user_id)
+        db.add(stats)
+
+    # 2. Protección de orden cronológico:
+    # No calculamos GPs pasados si ya vamos por delante, a menos que sea un Rebuild forzado.
+    # Pero si es el mismo GP que el último jugado (o posterior), permitimos la actualización.
+    if stats.last_gp_played_id and gp.id < stats.last_gp_played_id:
+        # Podríamos lanzar warning, pero simplemente devolvemos stats sin tocar
+        return stats
+
+    # 3. Obtener Predicción y Resultado
+    pred = db.query(Prediction).filter(Prediction.user_id == user_id, Prediction.gp_id == gp.id).first()
+    if not pred or not gp.race_result: 
+        return stats
+
+    # 4. Buscar si ya existían métricas guardadas para este GP (La "Caché") y aplicar
+    gp_stats = db.query(UserGpStats).filter(UserGpStats.user_id == user_id, UserGpStats.gp_id == gp.id).first()
+    season_stats = db.get(UserSeasonStats, (user_id, gp.season_id))
+    if not season_stats:
+        season_stats = _new_user_season_stats(user_id, gp.season_id)
+        db.add(season_stats)
+    _apply_gp_stats(db, stats, season_stats, gp_stats, pred, gp, index)
+
+    # Cambian los puntos de temporada (clasificación, líder...)
+    bump_data_version(db, gp.season_id)
     db.commit()
     return stats
 
@@ -197,229 +266,220 @@ def update_stats_incremental(db: Session, user_id: int, gp: GrandPrix) -> UserSt
 # 2. CALCULADORA DE LOGROS (CHECKERS)
 # ==============================================================================
 
-def check_event_achievements(db: Session, user_id: int, gp: GrandPrix) -> Set[str]:
-    """Verifica logros tipo EVENT basándose ÚNICAMENTE en el GP actual."""
+@dataclass(frozen=True)
+class GpContext:
+    """
+    Lo que los logros de un GP necesitan de OTROS usuarios, calculado una vez por GP
+    (después de aplicar las stats del GP a todos).
+    """
+    max_points: Optional[int]          # Máximo del GP (Lobo Solitario); None si nadie predijo
+    leader_id: Optional[int]           # Líder de la temporada del GP según UserSeasonStats
+    leader_gp_points: int              # Puntos del líder en este GP (David vs Goliath)
+    team_user_ids: FrozenSet[int]      # Usuarios con equipo en la temporada del GP
+    rules: SeasonRules                 # Parrilla (compañeros de equipo) de la temporada
+
+def season_leader_id(db: Session, season_id: int) -> Optional[int]:
+    """
+    "Líder del Mundial": el primero en UserSeasonStats de la temporada (ya con el
+    GP sumado). Empates: el de menor user_id. Lectura por el índice de temporada.
+    """
+    leader = db.query(UserSeasonStats.user_id)\
+        .filter(UserSeasonStats.season_id == season_id)\
+        .order_by(desc(UserSeasonStats.points), UserSeasonStats.user_id)\
+        .first()
+    return leader[0] if leader else None
+
+def build_gp_context(db: Session, gp: GrandPrix) -> GpContext:
+    max_points = db.query(func.max(Prediction.points)).filter(Prediction.gp_id == gp.id).scalar()
+
+    leader_id = season_leader_id(db, gp.season_id)
+    leader_gp_points = 0
+    if leader_id is not None:
+        leader_gp_points = db.query(Prediction.points).filter(
+            Prediction.user_id == leader_id, Prediction.gp_id == gp.id
+        ).scalar() or 0
+
+    team_user_ids = frozenset(
+        uid for (uid,) in db.query(TeamMember.user_id).filter(TeamMember.season_id == gp.season_id)
+    )
+
+    return GpContext(
+        max_points=max_points,
+        leader_id=leader_id,
+        leader_gp_points=leader_gp_points,
+        team_user_ids=team_user_ids,
+        rules=get_season_rules(db, gp.season_id),
+    )
+
+def check_event_achievements(
+    db: Session,
+    user_id: int,
+    gp: GrandPrix,
+    index: Optional[ResultIndex] = None,
+    pred: Optional[Prediction] = None,
+    ctx: Optional[GpContext] = None,
+    metrics: Optional[dict] = None
+) -> Set[str]:
+    """
+    Verifica logros tipo EVENT basándose ÚNICAMENTE en el GP actual.
+    `pred` es la predicción del usuario si ya está cargada, `ctx` el contexto
+    global del GP (se calcula aquí si no se pasa) y `metrics` su
+    calculate_gp_metrics si ya se calculó para las stats.
+    """
     unlocks = set()
     
-    pred = db.query(Prediction).filter(Prediction.user_id == user_id, Prediction.gp_id == gp.id).first()
+    if pred is None:
+        pred = db.query(Prediction).filter(Prediction.user_id == user_id, Prediction.gp_id == gp.id).first()
     if not pred or not gp.race_result: return unlocks
+    ctx = ctx or build_gp_context(db, gp)
+    index = index or build_result_index(gp.race_result, ctx.rules.roster)
     
-    # Reutilizamos la lógica de métricas para no repetir código
-    m = calculate_gp_metrics(pred, gp.race_result)
-    
-    # --- PUNTOS ---
-    points = m["points"]
-    if points > 0: unlocks.add("event_first")
-    if points > 25: unlocks.add("event_25pts")
-    if points > 50: unlocks.add("event_50pts")
-    if points > 75: unlocks.add("event_diamante") # Nuevo
-    if points == 0: unlocks.add("event_maldonado")
-
-    # --- HISTOS EXACTOS ---
-    if m["exact_podium_hit"]: unlocks.add("event_nostradamus")
-    if m["exact_top5_hit"]: unlocks.add("event_el_profesor") # Nuevo
-
-    hits = m["exact_positions"]
-    if hits >= 5: unlocks.add("event_high_five")
-    if hits >= 6: unlocks.add("event_sexto_sentido") # Nuevo
-    if hits >= 7: unlocks.add("event_7_maravillas") # Nuevo
-    if hits >= 8: unlocks.add("event_bola_8") # Nuevo
-    if hits >= 9: unlocks.add("event_nube_9") # Nuevo
-    if hits >= 10: unlocks.add("event_la_decima")
-    
-    if m["p10_hit"]: unlocks.add("event_francotirador_p10") # Nuevo
-
-    # --- EVENTOS PERFECTOS ---
-    events_hit_count = sum([m["safety_car_hit"], m["fastest_lap_hit"], m["dnf_count_hit"], m["dnf_driver_hit"]])
-    if events_hit_count == 4: 
-        unlocks.add("event_mc")
-        unlocks.add("event_el_narrador") # Renegombrado/Nuevo
-
-    # --- COMBINADOS (DIOS / CASI DIOS) ---
-    # Dios: 10 posiciones + 4 eventos
-    if hits == 10 and events_hit_count == 4: 
-        unlocks.add("event_god")
-    
-    # Casi Dios: (10 pos + 3 ev) OR (9 pos + 4 ev)
-    if (hits == 10 and events_hit_count == 3) or (hits == 9 and events_hit_count == 4):
-        unlocks.add("event_casi_dios")
+    metrics = {user_id: metrics} if metrics else None
+    return event_achievement_slugs([user_id], {user_id: pred}, ctx, index, metrics)[user_id]
 
-    # --- ORACLE (Top 10 presencia) ---
-    u_pos = {p.position: p.driver_name for p in pred.positions}
-    r_pos = {p.position: p.driver_name for p in gp.race_result.positions}
+def event_features(user_id: int, pred: Prediction, index: ResultIndex, m: dict, ctx: GpContext) -> dict:
+    """
+    Las métricas de calculate_gp_metrics más lo que EVENT_RULES necesita saber de
+    posiciones concretas, compañeros de equipo y contexto del GP.
+    """
+    u_pos = {p.position: p.driver_name for p in positions_of(pred, index.roster)}
+    r_pos = index.drivers_by_position
     u_evts = {e.event_type: e.value for e in pred.events}
-    r_evts = {e.event_type: e.value for e in gp.race_result.events}
-
-    real_top10 = {r_pos.get(i) for i in range(1,11) if r_pos.get(i)}
-    user_top10 = {u_pos.get(i) for i in range(1,11) if u_pos.get(i)}
-    if len(real_top10) == 10 and real_top10 == user_top10: unlocks.add("event_oracle")
-    
-    # --- GRAND CHELEM ---
-    hit_p1 = u_pos.get(1) == r_pos.get(1)
-    if m["safety_car_hit"] and m["fastest_lap_hit"] and hit_p1: unlocks.add("event_grand_chelem")
-
-    # --- CAOS / OPTIMISTA ---
-    real_dnf_num = int([e.value for e in gp.race_result.events if e.event_type == "DNFS"][0] or 0)
-    user_dnf_num = int([e.value for e in pred.events if e.event_type == "DNFS"][0] or 0)
-    
-    if real_dnf_num > 4 and m["dnf_count_hit"]: unlocks.add("event_chaos")
-    if user_dnf_num == 0 and m["dnf_count_hit"]: unlocks.add("event_el_optimista") # Nuevo
-
-    # --- LA ESCOBA (VR Ok, pero Piloto NO en Podio) ---
-    vr_driver = str(r_evts.get("FASTEST_LAP", ""))
-    podium_drivers = [r_pos.get(1), r_pos.get(2), r_pos.get(3)]
-    if m["fastest_lap_hit"] and vr_driver not in podium_drivers:
-        unlocks.add("event_la_escoba") # Nuevo
-
-    # --- LA MALDICIÓN (Tu P1 es DNF) ---
-    my_p1 = u_pos.get(1)
-    real_dnf_list = [x.strip() for x in str(r_evts.get("DNF_DRIVER", "")).split(",")]
-    if my_p1 in real_dnf_list:
-        unlocks.add("event_la_maldicion") # Nuevo
-
-    # --- PODIO INVERTIDO ---
-    # Real: 1:A, 2:B, 3:C -> User: 1:C, 2:B, 3:A
-    if (u_pos.get(1) == r_pos.get(3) and 
-        u_pos.get(2) == r_pos.get(2) and 
-        u_pos.get(3) == r_pos.get(1)):
-        unlocks.add("event_podio_invertido") # Nuevo
-
-    # --- EL SANDWICH (P1 ok, P3 ok, P2 fail) ---
-    hit_p3 = u_pos.get(3) == r_pos.get(3)
-    hit_p2 = u_pos.get(2) == r_pos.get(2)
-    if hit_p1 and hit_p3 and not hit_p2:
-        unlocks.add("event_el_sandwich") # Nuevo
-    
-    # --- EL ELEGIDO (Solo P1 acertado, todo lo demás fallado) ---
-    # Verifica que points no sea 0 (implica que P1 puntuó) y que exact_positions sea 1 (solo P1)
-    # y además que eventos sea 0. Ojo: "points" puede venir de P1, pero también de proximidad.
-    # El requisito dice "Acertar solo al Ganador (P1) y fallar absolutamente todas las demás posiciones y eventos".
-    if hit_p1 and hits == 1 and events_hit_count == 0:
-        # Falta asegurar que NO acertó posiciones parciales (ej: P4 en P5).
-        # Verificamos que para i=2..10, u_pos[i] != r_pos[i]. Ya cubierto por hits==1.
-        # ¿Y si acertó P2 en P3? Eso da puntos pero no es hit exacto.
-        # El user dice "sacar puntos solo por el ganador". El sistema de puntos da puntos por acierto exacto.
-        # Asumiremos la interpretación estricta: Hits=1 (P1) y Events=0.
-        unlocks.add("event_el_elegido")
-
-    # --- CIVIL WAR (1-2 Compañeros) ---
+    rules = ctx.rules
     p1, p2 = u_pos.get(1), u_pos.get(2)
-    if p1 and p2 and p1 == r_pos.get(1) and p2 == r_pos.get(2):
-        d1 = db.query(Driver).filter_by(code=p1).first()
-        d2 = db.query(Driver).filter_by(code=p2).first()
-        if d1 and d2 and d1.constructor_id == d2.constructor_id:
-            unlocks.add("event_civil_war")
-    
-    # --- EL MURO (Compañeros consecutivos) ---
-    # Buscar si existen i, i+1 tal que u_pos[i] y u_pos[i+1] sean compañeros Y acertados.
-    # La descripción dice: "Acertar que dos compañeros de equipo acaban consecutivos (ej: P5 y P6)".
-    # Entiendo que deben ser ACIERTOS.
-    found_wall = False
-    for i in range(1, 10):
-        da = u_pos.get(i)
-        db_drv = u_pos.get(i+1)
-        # Ambos acertados
-        if da == r_pos.get(i) and db_drv == r_pos.get(i+1):
-            driver_a = db.query(Driver).filter_by(code=da).first()
-            driver_b = db.query(Driver).filter_by(code=db_drv).first()
-            if driver_a and driver_b and driver_a.constructor_id == driver_b.constructor_id:
-                found_wall = True
-                break
-    if found_wall: unlocks.add("event_el_muro") # Nuevo
-
-    # --- JOIN TEAM ---
-    has_team = db.query(TeamMember).filter(TeamMember.user_id == user_id, TeamMember.season_id == gp.season_id).first()
-    if has_team: unlocks.add("event_join_team")
-
-    # --- LOBO SOLITARIO & DAVID vs GOLIATH (Globales) ---
-    # Requieren contexto de OTROS usuarios.
-    
-    # 1. Obtener puntos de todos en este GP
-    all_preds = db.query(Prediction.user_id, Prediction.points).filter(Prediction.gp_id == gp.id).all()
-    if all_preds:
-        max_points = max(p.points for p in all_preds)
-        
-        # Lobo Solitario: Ser MVP (max_points) Y no tener equipo
-        if points == max_points and not has_team:
-            unlocks.add("event_lobo_solitario")
-
-        # David vs Goliath: Sacar el doble que el Líder del Mundial
-        # ¿Quién es el líder? El que tenga más current_season_points antes de sumar este GP o incluyendo?
-        # Normalmente "Líder del Mundial" es el que va primero en la general.
-        # Usaremos UserStats (que ya tiene los puntos actualizados con este GP si se corrió update_stats).
-        # Aunque update_stats se corre user a user.
-        # Haremos una query rápida para ver quién tiene más puntos en UserStats.
-        leader_stat = db.query(UserStats).order_by(desc(UserStats.current_season_points)).first()
-        if leader_stat:
-            # Puntos que sacó el líder en ESTE GP.
-            leader_pred = db.query(Prediction).filter(Prediction.user_id == leader_stat.user_id, Prediction.gp_id == gp.id).first()
-            leader_gp_points = leader_pred.points if leader_pred else 0
-            
-            if points >= (leader_gp_points * 2) and leader_gp_points > 0:
-                 unlocks.add("event_david_goliath")
 
+    return {
+        **m,
+        "hit_p1": u_pos.get(1) == r_pos.get(1),
+        "hit_p2": u_pos.get(2) == r_pos.get(2),
+        "hit_p3": u_pos.get(3) == r_pos.get(3),
+        "predicted_dnfs": int(u_evts.get("DNFS") or 0),
+        # La Escoba: VR acertada con un piloto fuera del podio
+        "fastest_lap_off_podium": str(index.events.get("FASTEST_LAP", "")) not in index.podium,
+        # La Maldición: tu P1 es DNF
+        "p1_dnf": p1 in index.dnf_drivers,
+        # Real: 1:A, 2:B, 3:C -> User: 1:C, 2:B, 3:A
+        "inverted_podium": (
+            u_pos.get(1) == r_pos.get(3) and u_pos.get(2) == r_pos.get(2) and u_pos.get(3) == r_pos.get(1)
+        ),
+        # Civil War: 1-2 acertado de compañeros de equipo
+        "civil_war": bool(p1 and p2 and p1 == r_pos.get(1) and p2 == r_pos.get(2) and rules.are_teammates(p1, p2)),
+        # El Muro: dos compañeros consecutivos, ambos acertados
+        "teammates_wall": any(
+            u_pos.get(i) == r_pos.get(i) and u_pos.get(i + 1) == r_pos.get(i + 1)
+            and rules.are_teammates(u_pos.get(i), u_pos.get(i + 1))
+            for i in range(1, 10)
+        ),
+        "has_team": user_id in ctx.team_user_ids,
+    }
+
+_EVENT_FLAG_COLUMNS = (
+    "exact_podium_hit", "exact_top5_hit", "p10_hit", "oracle_hit",
+    "safety_car_hit", "fastest_lap_hit", "dnf_count_hit",
+    "hit_p1", "hit_p2", "hit_p3", "fastest_lap_off_podium", "p1_dnf",
+    "inverted_podium", "civil_war", "teammates_wall", "has_team",
+)
+_EVENT_COUNT_COLUMNS = ("points", "exact_positions", "events_hit", "predicted_dnfs")
+
+def event_columns(rows: List[dict], ctx: GpContext, index: ResultIndex) -> dict:
+    """Columnas NumPy de EVENT_RULES: una fila por usuario y los escalares del GP."""
+    columns = {name: np.array([row[name] for row in rows], dtype=bool) for name in _EVENT_FLAG_COLUMNS}
+    columns.update({name: np.array([row[name] for row in rows]) for name in _EVENT_COUNT_COLUMNS})
+    columns["real_dnfs"] = np.int64(int(index.events.get("DNFS") or 0))
+    columns["max_points"] = np.float64(np.nan if ctx.max_points is None else ctx.max_points)
+    columns["has_leader"] = np.bool_(ctx.leader_id is not None)
+    columns["leader_gp_points"] = np.float64(ctx.leader_gp_points)
+    return columns
+
+def event_achievement_slugs(
+    user_ids: Iterable[int],
+    preds: dict,
+    ctx: GpContext,
+    index: ResultIndex,
+    metrics: Optional[dict] = None,
+    rules: Optional[RuleEvaluator] = None
+) -> dict:
+    """
+    {user_id: slugs EVENT} del GP en una pasada de EVENT_RULES sobre todos los
+    usuarios con predicción. `metrics` {user_id: calculate_gp_metrics} si ya se
+    calcularon para las stats; `rules` un evaluador reutilizado entre GPs.
+    """
+    user_ids = list(user_ids)
+    predictors = [uid for uid in user_ids if preds.get(uid)]
+    unlocks = {uid: set() for uid in user_ids}
+    if not predictors:
+        return unlocks
+
+    metrics = metrics or {}
+    rows = [
+        event_features(uid, preds[uid], index, metrics.get(uid) or calculate_gp_metrics(preds[uid], index), ctx)
+        for uid in predictors
+    ]
+    rules = rules or RuleEvaluator(EVENT_RULES)
+    unlocks.update(rules.slugs_by_key(predictors, event_columns(rows, ctx, index)))
     return unlocks
 
+def career_season_slugs(
+    user_ids: Iterable[int],
+    stats_by_user: dict,
+    season_points: Optional[dict] = None,
+    rules: Optional[RuleEvaluator] = None
+) -> dict:
+    """
+    {user_id: slugs CAREER/SEASON} en una pasada de CAREER_SEASON_RULES.
+    `season_points` {user_id: puntos} de la temporada del GP (UserSeasonStats; 0
+    si no ha jugado en ella). Sin él, los de su temporada actual.
+    """
+    user_ids = list(user_ids)
+    rows = [stats_by_user[uid] for uid in user_ids]
+    if season_points is None:
+        points = [st.current_season_points for st in rows]
+    else:
+        points = [season_points.get(uid, 0.0) for uid in user_ids]
+    rules = rules or RuleEvaluator(CAREER_SEASON_RULES)
+    return rules.slugs_by_key(user_ids, stats_columns(rows, points))
+
 def check_career_season_achievements(db: Session, user_id: int, stats: UserStats) -> Set[str]:
     """Verifica logros CAREER y SEASON contra los Stats Acumulados."""
-    unlocks = set()
-    
-    # CAREER (Acumulativo Global)
-    if stats.total_gps_played >= 1: unlocks.add("career_debut")
-    if stats.total_points >= 500: unlocks.add("career_500")
-    if stats.total_points >= 1000: unlocks.add("career_1000")
-    if stats.total_points >= 2500: unlocks.add("career_2500")
-    if stats.total_gps_played >= 50: unlocks.add("career_50_gps")
-    if stats.exact_positions_count >= 50: unlocks.add("career_50_exact")
-    
-    # NUEVOS
-    if stats.total_points >= 5000: unlocks.add("career_goat")
-    if stats.exact_positions_count >= 100: unlocks.add("career_100_exact")
-    if stats.exact_podiums_count >= 10: unlocks.add("career_10_full_podium")
-    if stats.safety_car_hits >= 5: unlocks.add("career_5_sc")
-    if stats.safety_car_hits >= 10: unlocks.add("career_10_sc")
-    if stats.fastest_lap_hits >= 5: unlocks.add("career_5_fl")
-    if stats.fastest_lap_hits >= 10: unlocks.add("career_10_fl")
-    if stats.dnf_count_hits >= 5: unlocks.add("career_5_dnf_count")
-    if stats.dnf_count_hits >= 10: unlocks.add("career_10_dnf_count")
-    if stats.dnf_driver_hits >= 5: unlocks.add("career_5_dnf_driver")
-    if stats.dnf_driver_hits >= 10: unlocks.add("career_10_dnf_driver")
-
-    # SEASON (Acumulativo Temporada Actual)
-    if stats.current_season_points >= 100: unlocks.add("season_100")
-    if stats.current_season_points >= 300: unlocks.add("season_300")
-    if stats.current_season_points >= 500: unlocks.add("season_500")
-    
-    return unlocks
+    return career_season_slugs([user_id], {user_id: stats})[user_id]
 
 def check_season_finale_achievements(db: Session, user_id: int, season_id: int) -> Set[str]:
     """
     Logros que SOLO se dan al cerrar la temporada (Campeón, Mochila).
     """
-    unlocks = set()
-    
-    stats_all = db.query(UserStats)\
-        .filter(UserStats.last_gp_played_id.isnot(None))\
-        .order_by(desc(UserStats.current_season_points))\
+    stats_all = db.query(UserSeasonStats)\
+        .filter(UserSeasonStats.season_id == season_id)\
+        .order_by(desc(UserSeasonStats.points), UserSeasonStats.user_id)\
         .all()
-    
+
+    mate_ids = []
+    tm = db.query(TeamMember).filter(TeamMember.user_id == user_id, TeamMember.season_id == season_id).first()
+    if tm:
+        mates = db.query(TeamMember.user_id).filter(TeamMember.team_id == tm.team_id, TeamMember.season_id == season_id).all()
+        mate_ids = [m[0] for m in mates]
+
+    return season_finale_slugs(user_id, stats_all, mate_ids)
+
+def season_finale_slugs(user_id: int, stats_all: List[UserSeasonStats], mate_ids: List[int]) -> Set[str]:
+    """
+    Núcleo sin queries de check_season_finale_achievements.
+    `stats_all`: UserSeasonStats de la temporada, de más a menos puntos.
+    `mate_ids`: miembros de su escudería esa temporada (él incluido), o vacío.
+    """
+    unlocks = set()
+
     rank = next((i+1 for i, s in enumerate(stats_all) if s.user_id == user_id), 999)
     if rank == 1: unlocks.add("career_champion")
     if rank == 2: unlocks.add("career_runner_up")
     if rank == 3: unlocks.add("career_bronze")
 
     stat_entry = next((s for s in stats_all if s.user_id == user_id), None)
-    if stat_entry:
-        tm = db.query(TeamMember).filter(TeamMember.user_id == user_id, TeamMember.season_id == season_id).first()
-        if tm:
-            mates = db.query(TeamMember.user_id).filter(TeamMember.team_id == tm.team_id, TeamMember.season_id == season_id).all()
-            mate_ids = [m[0] for m in mates]
-            if len(mate_ids) > 1:
-                team_stats = [s for s in stats_all if s.user_id in mate_ids]
-                if team_stats:
-                    team_pts = [s.current_season_points for s in team_stats]
-                    if stat_entry.current_season_points == max(team_pts): unlocks.add("season_squad_leader")
-                    if stat_entry.current_season_points == min(team_pts): unlocks.add("season_backpack")
+    if stat_entry and len(mate_ids) > 1:
+        team_stats = [s for s in stats_all if s.user_id in mate_ids]
+        if team_stats:
+            team_pts = [s.points for s in team_stats]
+            if stat_entry.points == max(team_pts): unlocks.add("season_squad_leader")
+            if stat_entry.points == min(team_pts): unlocks.add("season_backpack")
     
     return unlocks
 
@@ -427,34 +487,88 @@ def check_season_finale_achievements(db: Session, user_id: int, season_id: int)
 # 3. VERIFICACIÓN HISTÓRICA
 # ==============================================================================
 
+# Condición sobre UserGpStats que cumple un GP donde se ganó cada logro de EVENTO.
+# Los logros que dependen del contexto (compañeros, otros usuarios...) no están:
+# para esos no se puede comprobar el histórico y se conservan.
+# Cada condición recibe la clase (-> expresión SQL) o una fila en memoria (-> bool).
+HISTORICAL_GP_CONDITIONS = {
+    "event_25pts": lambda gs: gs.points > 25,
+    "event_50pts": lambda gs: gs.points > 50,
+    "event_diamante": lambda gs: gs.points > 75,
+    "event_maldonado": lambda gs: gs.points == 0,
+    "event_nostradamus": lambda gs: gs.exact_podium_hit == True,
+    "event_el_profesor": lambda gs: gs.exact_top5_hit == True,
+    "event_high_five": lambda gs: gs.exact_positions >= 5,
+    "event_sexto_sentido": lambda gs: gs.exact_positions >= 6,
+    "event_7_maravillas": lambda gs: gs.exact_positions >= 7,
+    "event_bola_8": lambda gs: gs.exact_positions >= 8,
+    "event_nube_9": lambda gs: gs.exact_positions >= 9,
+    "event_la_decima": lambda gs: gs.exact_positions >= 10,
+    "event_francotirador_p10": lambda gs: gs.p10_hit == True,
+    "event_mc": lambda gs: gs.events_hit == 4,
+    "event_el_narrador": lambda gs: gs.events_hit == 4,
+    "event_god": lambda gs: (gs.exact_positions == 10) & (gs.events_hit == 4),
+    "event_casi_dios": lambda gs: (
+        ((gs.exact_positions == 10) & (gs.events_hit == 3))
+        | ((gs.exact_positions == 9) & (gs.events_hit == 4))
+    ),
+    "event_oracle": lambda gs: gs.oracle_hit == True,
+}
+
+def historical_event_slugs(gp_stats: UserGpStats) -> Set[str]:
+    """Slugs de HISTORICAL_GP_CONDITIONS que cumple una fila (en memoria)."""
+    return {slug for slug, condition in HISTORICAL_GP_CONDITIONS.items() if condition(gp_stats)}
+
 def verify_historical_validity(db: Session, user_id: int, slug: str) -> bool:
-    # Mantenemos esta función para el sistema de revocación
-    # aunque ahora con UserGpStats es menos crítico, sigue siendo útil
-    # para auditorías.
-    def _has_gp_with_exact_hits(n):
-        preds = db.query(Prediction).filter(Prediction.user_id == user_id).all()
-        for p in preds:
-            rr = db.query(RaceResult).filter(RaceResult.gp_id == p.gp_id).first()
-            if not rr: continue
-            # Usamos el helper nuevo
-            m = calculate_gp_metrics(p, rr)
-            if m["exact_positions"] >= n: return True
-        return False
-
-    if slug == "event_25pts": return db.query(Prediction).filter(Prediction.user_id==user_id, Prediction.points > 25).first() is not None
-    if slug == "event_50pts": return db.query(Prediction).filter(Prediction.user_id==user_id, Prediction.points > 50).first() is not None
-    if slug == "event_maldonado": return db.query(Prediction).filter(Prediction.user_id==user_id, Prediction.points == 0).first() is not None
-    if slug == "event_high_five": return _has_gp_with_exact_hits(5)
-    if slug == "event_la_decima": return _has_gp_with_exact_hits(10)
-    if slug == "event_join_team": return db.query(TeamMember).filter(TeamMember.user_id == user_id).first() is not None
-    if slug == "event_first": return db.query(Prediction).filter(Prediction.user_id == user_id).count() >= 1
+    """
+    ¿Sigue mereciendo el logro por OTRO GP? Un EXISTS indexado sobre la caché
+    UserGpStats (ya con el GP actual aplicado) en vez de recalcular su carrera.
+    """
+    condition = HISTORICAL_GP_CONDITIONS.get(slug)
+    if condition is not None:
+        return db.query(
+            db.query(UserGpStats).filter(UserGpStats.user_id == user_id, condition(UserGpStats)).exists()
+        ).scalar()
+
+    if slug == "event_join_team": return db.query(db.query(TeamMember).filter(TeamMember.user_id == user_id).exists()).scalar()
+    if slug == "event_first": return db.query(db.query(Prediction).filter(Prediction.user_id == user_id).exists()).scalar()
 
     return True
 
+def load_historical_event_slugs(db: Session, user_ids: Iterable[int]) -> dict:
+    """
+    Versión por lotes de verify_historical_validity: {user_id: slugs de
+    HISTORICAL_GP_CONDITIONS que cumple en algún GP}, con una sola query agrupada.
+    """
+    slugs = list(HISTORICAL_GP_CONDITIONS)
+    rows = db.query(
+        UserGpStats.user_id,
+        *(func.max(case((HISTORICAL_GP_CONDITIONS[slug](UserGpStats), 1), else_=0)) for slug in slugs)
+    ).filter(UserGpStats.user_id.in_(list(user_ids))).group_by(UserGpStats.user_id)
+
+    return {
+        row[0]: {slug for slug, hit in zip(slugs, row[1:]) if hit}
+        for row in rows
+    }
+
+def historical_checker(db: Session, user_id: int, historical: Set[str]) -> Callable[[str], bool]:
+    """`still_valid` para plan_revokes a partir de load_historical_event_slugs."""
+    def still_valid(slug: str) -> bool:
+        if slug in HISTORICAL_GP_CONDITIONS:
+            return slug in historical
+        return verify_historical_validity(db, user_id, slug)
+    return still_valid
+
 # ==============================================================================
 # 4. ORQUESTADOR PRINCIPAL
 # ==============================================================================
 
+class OwnedAchievement(NamedTuple):
+    # Lo que hace falta de un UserAchievement para decidir si se revoca
+    id: int
+    achievement_id: int
+    season_id: Optional[int]
+
 def grant_achievements(
     db: Session, 
     user_id: int, 
@@ -462,195 +576,688 @@ def grant_achievements(
     season_id: int = None, 
     gp_id: int = None
 ):
-    existing_rows = db.query(UserAchievement).filter(UserAchievement.user_id == user_id).all()
-    
-    for slug in slugs:
-        ach = db.query(Achievement).filter_by(slug=slug).first()
-        if not ach: continue
+    catalog = get_achievement_catalog(db)
+    owned_ids = {
+        ach_id for (ach_id,) in
+        db.query(UserAchievement.achievement_id).filter(UserAchievement.user_id == user_id)
+    }
+    grants = plan_grants(catalog, user_id, slugs, owned_ids, season_id, gp_id)
+    apply_achievement_diff(db, grants, [])
+    db.commit()
 
-        already_has = any(r.achievement_id == ach.id for r in existing_rows)
+# --- Diff "debería tener" vs "tiene" (sin queries salvo la validez histórica) ---
 
-        if not already_has:
-            print(f"🏆 DESBLOQUEADO: {slug}")
-            save_season = season_id
-            save_gp = None
-            
+def plan_grants(
+    catalog: AchievementCatalog,
+    user_id: int,
+    should_have: Iterable[str],
+    owned_ids: Set[int],
+    season_id: int = None,
+    gp_id: int = None
+) -> List[dict]:
+    """Filas a insertar: logros que debería tener y aún no tiene."""
+    rows = []
+    seen = set()
+    for slug in should_have:
+        ach = catalog.get(slug)
+        if not ach or ach.id in owned_ids or ach.id in seen: continue
+        seen.add(ach.id)
+        print(f"🏆 DESBLOQUEADO: {slug}")
+        rows.append(_new_user_achievement(ach, user_id, season_id, gp_id))
+    return rows
+
+def plan_revokes(
+    catalog: AchievementCatalog,
+    owned: Iterable[OwnedAchievement],
+    should_have: Set[str],
+    season_id: int,
+    still_valid: Callable[[str], bool]
+) -> List[int]:
+    """
+    IDs de UserAchievement a borrar: logros dinámicos que ya no se cumplen.
+    `still_valid(slug)` dice si un logro de EVENTO se sigue mereciendo por otro GP
+    (historical_checker, o el estado en memoria del replay).
+    """
+    dynamic_slugs = _DYNAMIC_SLUGS
+    revoke_ids = []
+    for ua in owned:
+        ach = catalog.by_id.get(ua.achievement_id)
+        if not ach or ach.slug not in dynamic_slugs: continue
+        if ach.type == AchievementType.SEASON:
+            if ua.season_id is not None and ua.season_id != season_id:
+                continue
+
+        if ach.slug not in should_have:
+            must_delete = True
             if ach.type == AchievementType.EVENT:
-                save_gp = gp_id
-            elif ach.type == AchievementType.CAREER:
-                save_gp = gp_id 
-            
-            db.add(UserAchievement(
-                user_id=user_id, 
-                achievement_id=ach.id, 
-                season_id=save_season,
-                gp_id=save_gp
-            ))
-            
-    db.commit()
+                if still_valid(ach.slug):
+                    must_delete = False
+
+            if must_delete:
+                print(f"🚫 REVOCADO: {ach.slug} (Season {ua.season_id})")
+                revoke_ids.append(ua.id)
+    return revoke_ids
+
+def apply_achievement_diff(db: Session, grants: List[dict], revoke_ids: List[int]):
+    """Un INSERT masivo y un DELETE masivo. No hace commit."""
+    if grants:
+        db.execute(insert(UserAchievement), grants)
+    if revoke_ids:
+        db.execute(
+            delete(UserAchievement).where(UserAchievement.id.in_(revoke_ids)),
+            execution_options={"synchronize_session": False},
+        )
+
+def _new_user_achievement(ach: CatalogEntry, user_id: int, season_id: int = None, gp_id: int = None) -> dict:
+    # Los EVENT y CAREER guardan el GP donde se consiguieron; los SEASON solo la temporada
+    save_gp = gp_id if ach.type in (AchievementType.EVENT, AchievementType.CAREER) else None
+    return {
+        "user_id": user_id,
+        "achievement_id": ach.id,
+        "season_id": season_id,
+        "gp_id": save_gp,
+    }
 
 
-def sync_achievements(db: Session, user_id: int, current_gp: GrandPrix):
+def sync_achievements(db: Session, user_id: int, current_gp: GrandPrix, index: Optional[ResultIndex] = None):
     """
     Sincroniza logros usando el método INCREMENTAL.
+    `index` es el ResultIndex del GP, compartido entre todos los usuarios.
     """
-    # 1. Stats Actuales (Incremental con soporte de Corrección)
-    stats = update_stats_incremental(db, user_id, current_gp)
-    
-    # 2. Qué debería tener HOY
-    should_have = set()
-    should_have.update(check_career_season_achievements(db, user_id, stats))
-    should_have.update(check_event_achievements(db, user_id, current_gp))
-    
-    # 3. GRANT
-    grant_achievements(
-        db, 
-        user_id, 
-        list(should_have), 
-        season_id=current_gp.season_id,
-        gp_id=current_gp.id
-    )
-    
-    # 4. REVOKE
-    current_achs_rows = db.query(UserAchievement, Achievement.slug, Achievement.type)\
-        .join(Achievement).filter(UserAchievement.user_id == user_id).all()
-        
-    dynamic_slugs = get_dynamic_slugs()
+    sync_race_achievements(db, current_gp, [user_id], index)
 
-    for ua, slug, atype in current_achs_rows:
-        if slug not in dynamic_slugs: continue
-        if atype == AchievementType.SEASON:
-            if ua.season_id is not None and ua.season_id != current_gp.season_id:
-                continue 
-        
-        if slug not in should_have:
-            must_delete = True
-            if atype == AchievementType.EVENT:
-                if verify_historical_validity(db, user_id, slug):
-                    must_delete = False
-            
-            if must_delete:
-                print(f"🚫 REVOCADO: {slug} (Season {ua.season_id})")
-                db.delete(ua)
-            
+def sync_race_achievements(
+    db: Session,
+    gp: GrandPrix,
+    user_ids: Iterable[int],
+    index: Optional[ResultIndex] = None
+):
+    """
+    Sincroniza stats y logros de varios usuarios en un GP por lotes:
+    1. Carga predicciones, UserStats, UserGpStats, logros y catálogo en pocas queries.
+    2. Aplica las stats del GP a todos y calcula el GpContext una sola vez.
+    3. Evalúa los logros usuario a usuario en memoria.
+    4. Un único commit: stats, un INSERT masivo de altas y un DELETE masivo de bajas.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    if index is None and gp.race_result:
+        index = build_result_index(gp.race_result, get_season_rules(db, gp.season_id).roster)
+
+    # --- 1. CARGA ---
+    preds = {
+        p.user_id: p
+        for p in db.query(Prediction)
+        .options(selectinload(Prediction.events))
+        .filter(Prediction.gp_id == gp.id, Prediction.user_id.in_(user_ids))
+    }
+    unpacked_ids = [p.id for p in preds.values() if p.packed_positions is None]
+    if unpacked_ids:
+        # Solo las predicciones sin empaquetar necesitan sus filas de posiciones
+        db.query(Prediction).options(selectinload(Prediction.positions)).filter(Prediction.id.in_(unpacked_ids)).all()
+
+    stats_by_user = {s.user_id: s for s in db.query(UserStats).filter(UserStats.user_id.in_(user_ids))}
+    season_by_user = {
+        s.user_id: s
+        for s in db.query(UserSeasonStats).filter(
+            UserSeasonStats.season_id == gp.season_id, UserSeasonStats.user_id.in_(user_ids)
+        )
+    }
+    gp_stats_by_user = {
+        s.user_id: s
+        for s in db.query(UserGpStats).filter(UserGpStats.gp_id == gp.id, UserGpStats.user_id.in_(user_ids))
+    }
+    owned = defaultdict(list)
+    for row in db.query(
+        UserAchievement.id, UserAchievement.user_id, UserAchievement.achievement_id, UserAchievement.season_id
+    ).filter(UserAchievement.user_id.in_(user_ids)):
+        owned[row.user_id].append(OwnedAchievement(row.id, row.achievement_id, row.season_id))
+
+    catalog = get_achievement_catalog(db)
+
+    # --- 2. STATS DE TODOS (Incremental con soporte de Corrección) ---
+    metrics = {}
+    for uid in user_ids:
+        stats = stats_by_user.get(uid)
+        if not stats:
+            stats = stats_by_user[uid] = _new_user_stats(uid)
+            db.add(stats)
+
+        pred = preds.get(uid)
+        if pred and gp.race_result:
+            metrics[uid] = calculate_gp_metrics(pred, index)
+        # Protección de orden cronológico (ver update_stats_incremental)
+        in_order = not (stats.last_gp_played_id and gp.id < stats.last_gp_played_id)
+        if in_order and pred and gp.race_result:
+            season_stats = season_by_user.get(uid)
+            if not season_stats:
+                season_stats = season_by_user[uid] = _new_user_season_stats(uid, gp.season_id)
+                db.add(season_stats)
+            _apply_gp_stats(db, stats, season_stats, gp_stats_by_user.get(uid), pred, gp, index, metrics[uid])
+
+    # --- 3. CONTEXTO GLOBAL DEL GP (una vez, con las stats ya al día) ---
+    ctx = build_gp_context(db, gp)
+
+    # --- 4. LOGROS EN MEMORIA ---
+    # Validez histórica de todos los usuarios en una query (ya con las stats del GP)
+    historical = load_historical_event_slugs(db, user_ids)
+    # Qué debería tener HOY cada uno: una pasada por grupo de reglas
+    season_points = {uid: st.points for uid, st in season_by_user.items()}
+    should_have_by_user = career_season_slugs(user_ids, stats_by_user, season_points)
+    if gp.race_result:
+        for uid, slugs in event_achievement_slugs(user_ids, preds, ctx, index, metrics).items():
+            should_have_by_user[uid] |= slugs
+
+    grants, revoke_ids = [], []
+    for uid in user_ids:
+        should_have = should_have_by_user[uid]
+
+        # Diff contra lo que ya tiene
+        owned_ids = {ua.achievement_id for ua in owned[uid]}
+        grants.extend(plan_grants(catalog, uid, should_have, owned_ids, gp.season_id, gp.id))
+        still_valid = historical_checker(db, uid, historical.get(uid, set()))
+        revoke_ids.extend(plan_revokes(catalog, owned[uid], should_have, gp.season_id, still_valid))
+
+    # --- 5. UNA SOLA TRANSACCIÓN: un INSERT y un DELETE para todo el GP ---
+    apply_achievement_diff(db, grants, revoke_ids)
+    bump_data_version(db, gp.season_id)
     db.commit()
 
 # Entry Points
-def evaluate_race_achievements(db: Session, gp_id: int):
+def evaluate_race_achievements(db: Session, gp_id: int, user_ids: Optional[Set[int]] = None):
+    """
+    Sincroniza logros de todos los participantes del GP, o solo de `user_ids`
+    si se indica (re-evaluación delta tras corregir un resultado).
+    """
     gp = db.query(GrandPrix).get(gp_id)
     if not gp: return
     users = [u[0] for u in db.query(Prediction.user_id).filter(Prediction.gp_id == gp_id).distinct().all()]
-    for uid in users: sync_achievements(db, uid, gp)
+    if user_ids is not None:
+        users = [uid for uid in users if uid in user_ids]
+    # El resultado se indexa una sola vez para todos los usuarios
+    roster = get_season_rules(db, gp.season_id).roster
+    index = build_result_index(gp.race_result, roster) if gp.race_result else None
+    sync_race_achievements(db, gp, users, index)
+
+# Logros exclusivos de final de temporada (se borran y reasignan al cerrarla)
+SEASON_FINALE_SLUGS = [
+    "career_champion", 
+    "career_runner_up", 
+    "career_bronze", 
+    "season_squad_leader", 
+    "season_backpack"
+]
 
 def evaluate_season_finale_achievements(db: Session, season_id: int):
     """
-    Evalúa premios finales aplicando lógica WIPE & ASSIGN.
+    Evalúa premios finales aplicando lógica WIPE & ASSIGN, en tiempo lineal.
     1. Borra todos los logros de final de temporada existentes para esa season_id.
-    2. Recalcula quién los merece ahora (basado en los stats ya corregidos).
-    3. Los otorga de nuevo.
+    2. Recalcula quién los merece ahora (basado en los stats ya corregidos) con
+       una query ordenada de UserSeasonStats y una de escuderías.
+    3. Los otorga de nuevo con un INSERT masivo. Un solo commit.
     """
     print(f"🏆 Evaluando Premios Finales Temporada {season_id} (Modo Wipe & Assign)...")
-    
+    catalog = get_achievement_catalog(db)
+    target_ids = [catalog.by_slug[slug].id for slug in SEASON_FINALE_SLUGS if slug in catalog.by_slug]
+
     # --- 0. WIPE (LIMPIEZA DE PREMIOS ANTERIORES) ---
-    # Definimos qué logros son exclusivos de final de temporada
-    finale_slugs = [
-        "career_champion", 
-        "career_runner_up", 
-        "career_bronze", 
-        "season_squad_leader", 
-        "season_backpack"
-    ]
-    
-    # Obtenemos los IDs de estos logros
-    target_achs = db.query(Achievement.id).filter(Achievement.slug.in_(finale_slugs)).all()
-    target_ids = [t[0] for t in target_achs]
-    
     if target_ids:
         deleted_count = db.query(UserAchievement).filter(
             UserAchievement.season_id == season_id,
             UserAchievement.achievement_id.in_(target_ids)
         ).delete(synchronize_session=False)
-        
-        db.commit()
         print(f"🧹 Se han revocado {deleted_count} logros antiguos de la temporada {season_id}.")
 
     # --- 1. ASSIGN (CÁLCULO Y ASIGNACIÓN NUEVA) ---
     # Nota: No necesitamos recalcular stats aquí, confiamos en que update_stats_incremental 
-    # ya tiene los UserStats al día.
-    
-    all_users = db.query(User).all()
-    
-    for user in all_users:
-        # Checkeamos qué merece el usuario con los datos actuales
-        slugs = check_season_finale_achievements(db, user.id, season_id)
-        
-        if slugs: 
-            # Grant achievements se encarga de no duplicar, pero como acabamos de borrar,
-            # los insertará limpios.
-            grant_achievements(db, user.id, list(slugs), season_id=season_id, gp_id=None)
+    # ya tiene los UserSeasonStats al día.
+    standings = db.query(UserSeasonStats.user_id, UserSeasonStats.points)\
+        .filter(UserSeasonStats.season_id == season_id)\
+        .order_by(desc(UserSeasonStats.points), UserSeasonStats.user_id)\
+        .all()
+    user_ids = [st.user_id for st in standings]
+    awards = season_finale_awards(standings, load_season_memberships(db, season_id), user_ids)
+
+    # Los de otras temporadas siguen ahí: grant_achievements nunca duplicaba
+    owned = defaultdict(set)
+    if awards and target_ids:
+        for uid, ach_id in db.query(UserAchievement.user_id, UserAchievement.achievement_id).filter(
+            UserAchievement.user_id.in_(list(awards)),
+            UserAchievement.achievement_id.in_(target_ids)
+        ):
+            owned[uid].add(ach_id)
+
+    grants = []
+    for uid, slugs in awards.items():
+        grants.extend(plan_grants(catalog, uid, slugs, owned[uid], season_id, None))
+    apply_achievement_diff(db, grants, [])
+    db.commit()
 
     print(f"✅ Evaluación de temporada {season_id} completada.")
     
 def rebuild_all_achievements(db: Session):
     """
     ⚠️ DANGER ZONE: Recalcula TODO desde cero (Stats + Achievements).
-    1. Borra user_stats, user_gp_stats, user_achievements.
-    2. Recorre GPs pasados y ejecuta sync_achievements.
-    3. Al final de cada temporada, ejecuta evaluate_season_finale_achievements.
+    1. Reproduce en memoria los GPs pasados en orden cronológico (AchievementReplay).
+    2. Al final de cada temporada, aplica los premios finales (mismas reglas que
+       evaluate_season_finale_achievements).
+    3. Sustituye user_stats, user_gp_stats y user_achievements en un solo commit.
+    Para la versión en segundo plano con checkpoints, ver rebuild_jobs.py.
     """
     print("🔥 INICIANDO RECONSTRUCCIÓN TOTAL DE LOGROS Y ESTADÍSTICAS...")
-    
-    # 1. Resetear Tablas
-    db.query(UserAchievement).delete()
-    db.query(UserStats).delete()
-    db.query(UserGpStats).delete()
+
+    # 1. Obtener todos los GPs pasados ordenados por fecha (con su resultado)
+    past_gps = load_rebuild_plan(db)
+    closing_ids = season_closing_gp_ids(past_gps)
+
+    user_ids = [uid for (uid,) in db.query(User.id).order_by(User.id)]
+    replay = AchievementReplay(db, user_ids)
+
+    # 2. Re-procesar uno a uno cronológicamente (lista plana: el orden entre temporadas se respeta)
+    for gp in past_gps:
+        replay.replay_gp(gp, gp.id in closing_ids)
+
+    # 3. Escritura final
+    replay.write(db)
+    bump_data_version(db)
     db.commit()
+    print("✅ RECONSTRUCCIÓN COMPLETADA.")
 
-    # 2. Obtener todos los GPs pasados ordenados por fecha
+def load_rebuild_plan(db: Session, gp_ids: Optional[List[int]] = None) -> List[GrandPrix]:
+    """
+    GPs pasados con resultado, en orden cronológico y con el resultado cargado.
+    Con `gp_ids` (plan guardado de un job) devuelve esos GPs en ese orden.
+    """
     from datetime import datetime
-    past_gps = db.query(GrandPrix)\
+    query = db.query(GrandPrix).options(selectinload(GrandPrix.race_result).selectinload(RaceResult.events))
+    if gp_ids is not None:
+        by_id = {gp.id: gp for gp in query.filter(GrandPrix.id.in_(gp_ids))}
+        return [by_id[gp_id] for gp_id in gp_ids if gp_id in by_id and by_id[gp_id].race_result]
+
+    past_gps = query\
         .filter(GrandPrix.race_datetime <= datetime.utcnow())\
         .order_by(GrandPrix.race_datetime.asc())\
         .all()
+    return [gp for gp in past_gps if gp.race_result] # Solo procesar si tiene resultados
 
-    users = db.query(User).all()
-    user_ids = [u.id for u in users]
-    
-    # Agrupar GPs por temporada para saber cuándo cerrar temporada
-    from collections import defaultdict
-    gps_by_season = defaultdict(list)
-    for gp in past_gps:
-        if gp.race_result: # Solo procesar si tiene resultados
-            gps_by_season[gp.season_id].append(gp)
+def season_closing_gp_ids(gps: List[GrandPrix]) -> Set[int]:
+    """
+    Último GP jugado de cada temporada: ahí se cierra la temporada.
+    Si luego hay más carreras, se recalculará.
+    """
+    return set({gp.season_id: gp.id for gp in gps}.values())
 
-    # 3. Re-procesar uno a uno cronológicamente
-    # Pero cuidado, si iteramos por seasons separadas podríamos perder orden cronológico inter-season (raro pero posible).
-    # Mejor iterar la lista plana y detectar fin de season.
-    
-    processed_seasons = set()
-    
-    for gp in past_gps:
-        if not gp.race_result: continue
-        
+# ==============================================================================
+# 5. REPLAY CRONOLÓGICO EN MEMORIA
+# ==============================================================================
+
+class ReplayEvent(NamedTuple):
+    # Mismos atributos que PredictionEvent
+    event_type: str
+    value: str
+
+@dataclass
+class ReplayPrediction:
+    """
+    Lo que métricas y checkers leen de una Prediction, sin objeto ORM.
+    Las posiciones se decodifican una vez al cargar: packed_positions queda a
+    None para que positions_of no vuelva a desempaquetar en cada checker.
+    """
+    user_id: int
+    points: Optional[int]
+    packed_positions: Optional[bytes] = None
+    positions: list = field(default_factory=list)   # PackedPosition, ya decodificadas
+    events: list = field(default_factory=list)      # ReplayEvent
+
+def _plain_row(model, **values) -> SimpleNamespace:
+    # Fila con las columnas de `model` sin instrumentación ORM (se inserta al final)
+    return SimpleNamespace(**{**dict.fromkeys(model.__table__.columns.keys()), **values})
+
+def load_replay_predictions(db: Session, gp_id: int, roster: tuple, user_ids: Optional[List[int]] = None) -> dict:
+    """
+    {user_id: ReplayPrediction} del GP con tres queries de columnas.
+    Con `user_ids` solo las de esos usuarios (replay de una partición).
+    """
+    by_id = {}
+    preds = {}
+    unpacked_ids = []
+    query = db.query(
+        Prediction.id, Prediction.user_id, Prediction.points, Prediction.packed_positions
+    ).filter(Prediction.gp_id == gp_id)
+    if user_ids is not None:
+        query = query.filter(Prediction.user_id.in_(user_ids))
+    for pid, uid, points, packed in query.order_by(Prediction.id):
+        pred = by_id[pid] = preds[uid] = ReplayPrediction(uid, points)
+        positions = None
+        if packed is not None and roster:
+            try:
+                positions = unpack_positions(packed, roster)
+            except IndexError:
+                pass # Parrilla cambiada sin re-empaquetar: las filas mandan
+        if positions is None:
+            unpacked_ids.append(pid)
+        else:
+            pred.positions = positions
+
+    for pid, event_type, value in db.query(
+        PredictionEvent.prediction_id, PredictionEvent.event_type, PredictionEvent.value
+    ).join(Prediction, Prediction.id == PredictionEvent.prediction_id).filter(
+        Prediction.gp_id == gp_id
+    ).order_by(PredictionEvent.id):
+        if pid in by_id:
+            by_id[pid].events.append(ReplayEvent(event_type, value))
+
+    # Solo las predicciones sin empaquetar necesitan sus filas de posiciones
+    if unpacked_ids:
+        for pid, position, driver in db.query(
+            PredictionPosition.prediction_id, PredictionPosition.position, PredictionPosition.driver_name
+        ).filter(PredictionPosition.prediction_id.in_(unpacked_ids)):
+            by_id[pid].positions.append(PackedPosition(position, driver))
+    return preds
+
+class GpGlobals(NamedTuple):
+    # La parte de GpContext que depende de TODOS los usuarios (ver compute_gp_globals)
+    max_points: Optional[int]
+    leader_id: Optional[int]
+    leader_gp_points: int
+
+def compute_gp_globals(gp_points: dict, season_points: Iterable) -> GpGlobals:
+    """
+    Mismas reglas que build_gp_context, sin queries.
+    `gp_points`: {user_id: puntos} de las predicciones del GP.
+    `season_points`: pares (user_id, puntos) de la temporada del GP en orden de
+    user_id (solo quien ha jugado en ella); el líder es el primero con el máximo.
+    """
+    points = [p for p in gp_points.values() if p is not None]
+    leader_id = max(season_points, key=lambda pair: pair[1], default=(None, None))[0]
+    return GpGlobals(
+        max_points=max(points) if points else None,
+        leader_id=leader_id,
+        leader_gp_points=(gp_points[leader_id] or 0) if leader_id in gp_points else 0,
+    )
+
+def load_season_memberships(db: Session, season_id: int) -> List[Tuple[int, int]]:
+    """Filas (user_id, team_id) de TeamMember de la temporada, en orden de alta."""
+    return db.query(TeamMember.user_id, TeamMember.team_id).filter(
+        TeamMember.season_id == season_id
+    ).order_by(TeamMember.id).all()
+
+def load_season_teams(db: Session, season_id: int) -> dict:
+    """{user_id: team_id} de la temporada."""
+    teams = {}
+    for uid, team_id in load_season_memberships(db, season_id):
+        # Como el .first() original: manda la primera fila del usuario
+        teams.setdefault(uid, team_id)
+    return teams
+
+def season_finale_awards(standings: Iterable, memberships: Iterable[Tuple[int, int]], user_ids: Iterable[int]) -> dict:
+    """
+    {user_id: slugs} de los premios finales en tiempo lineal; mismas reglas que
+    season_finale_slugs. `standings`: filas con user_id y points (UserSeasonStats)
+    de quienes han jugado en la temporada (se ordenan aquí; los empates conservan su orden).
+    `memberships`: filas (user_id, team_id) de load_season_memberships.
+    """
+    ranking = sorted(standings, key=lambda st: st.points, reverse=True)
+    rank, points = {}, {}
+    for i, st in enumerate(ranking):
+        rank.setdefault(st.user_id, i + 1)
+        points.setdefault(st.user_id, st.points)
+
+    # Escudería de cada usuario (su primera fila) y todas las filas de cada escudería
+    team_of, team_rows = {}, defaultdict(list)
+    for uid, team_id in memberships:
+        team_of.setdefault(uid, team_id)
+        team_rows[team_id].append(uid)
+    team_range = {}
+    for team_id, mate_ids in team_rows.items():
+        team_pts = [points[uid] for uid in set(mate_ids) if uid in points]
+        if len(mate_ids) > 1 and team_pts:
+            team_range[team_id] = (max(team_pts), min(team_pts))
+
+    awards = {}
+    for uid in user_ids:
+        slugs = set()
+        position = rank.get(uid)
+        if position == 1: slugs.add("career_champion")
+        if position == 2: slugs.add("career_runner_up")
+        if position == 3: slugs.add("career_bronze")
+
+        bounds = team_range.get(team_of.get(uid))
+        if uid in points and bounds:
+            if points[uid] == bounds[0]: slugs.add("season_squad_leader")
+            if points[uid] == bounds[1]: slugs.add("season_backpack")
+        if slugs:
+            awards[uid] = slugs
+    return awards
+
+class AchievementReplay:
+    """
+    Estado de la reconstrucción: UserStats / UserSeasonStats / UserGpStats como
+    filas planas (sin ORM) y los logros de cada usuario como {achievement_id: OwnedAchievement}.
+    Aplica las mismas reglas que sync_race_achievements sin leer la BD entre GPs.
+    """
+
+    def __init__(self, db: Session, user_ids: List[int]):
+        self.db = db
+        self.user_ids = user_ids
+        self.catalog = get_achievement_catalog(db)
+        self.stats = {}         # {user_id: fila UserStats}
+        self.season_stats = defaultdict(dict)  # {season_id: {user_id: fila UserSeasonStats}}
+        self.gp_stats = []      # Filas UserGpStats en orden de creación
+        # En el replay el "id" de cada OwnedAchievement es su achievement_id (uno por usuario)
+        self.owned = {uid: {} for uid in user_ids}          # {user_id: {achievement_id: OwnedAchievement}}
+        self.unlocked_gp = {}                               # {(user_id, achievement_id): gp_id}
+        self.historical = {uid: set() for uid in user_ids}  # Slugs de HISTORICAL_GP_CONDITIONS ya cumplidos
+        self._teams = {}        # {season_id: {user_id: team_id}}
+        self._dirty = set()     # (user_id, achievement_id) tocados desde el último checkpoint
+        # Evaluadores persistentes: entre GPs se saltan las reglas cuyas entradas no cambian
+        self.career_rules = RuleEvaluator(CAREER_SEASON_RULES)
+        self.event_rules = RuleEvaluator(EVENT_RULES)
+
+        # Fallbacks de verify_historical_validity que no dependen del GP
+        self.predictors = {uid for (uid,) in db.query(Prediction.user_id).distinct()}
+        self.team_members = {uid for (uid,) in db.query(TeamMember.user_id).distinct()}
+
+    @classmethod
+    def resume(cls, db: Session, user_ids: List[int]) -> "AchievementReplay":
+        """Estado del último checkpoint, leído de las tablas que escribe checkpoint()."""
+        replay = cls(db, user_ids)
+        columns = UserStats.__table__.columns.keys()
+        for st in db.query(UserStats).order_by(UserStats.user_id):
+            replay.stats[st.user_id] = _plain_row(UserStats, **{key: getattr(st, key) for key in columns})
+        columns = UserSeasonStats.__table__.columns.keys()
+        for st in db.query(UserSeasonStats).order_by(UserSeasonStats.season_id, UserSeasonStats.user_id):
+            replay.season_stats[st.season_id][st.user_id] = _plain_row(
+                UserSeasonStats, **{key: getattr(st, key) for key in columns}
+            )
+        for uid, aid, season_id, gp_id in db.query(
+            UserAchievement.user_id, UserAchievement.achievement_id, UserAchievement.season_id, UserAchievement.gp_id
+        ).order_by(UserAchievement.id):
+            replay.owned.setdefault(uid, {})[aid] = OwnedAchievement(aid, aid, season_id)
+            replay.unlocked_gp[(uid, aid)] = gp_id
+        replay.historical.update(load_historical_event_slugs(db, user_ids))
+        return replay
+
+    def season_teams(self, season_id: int) -> dict:
+        teams = self._teams.get(season_id)
+        if teams is None:
+            teams = self._teams[season_id] = load_season_teams(self.db, season_id)
+        return teams
+
+    def still_valid(self, user_id: int) -> Callable[[str], bool]:
+        historical = self.historical[user_id]
+        def check(slug: str) -> bool:
+            if slug in HISTORICAL_GP_CONDITIONS: return slug in historical
+            if slug == "event_join_team": return user_id in self.team_members
+            if slug == "event_first": return user_id in self.predictors
+            return True
+        return check
+
+    def _diff(self, user_id: int, should_have: Set[str], season_id: int, gp_id: Optional[int], revoke: bool = True):
+        owned = self.owned[user_id]
+        if revoke:
+            for aid in plan_revokes(self.catalog, list(owned.values()), should_have, season_id, self.still_valid(user_id)):
+                del owned[aid]
+                self._dirty.add((user_id, aid))
+        for row in plan_grants(self.catalog, user_id, should_have, owned.keys(), season_id, gp_id):
+            aid = row["achievement_id"]
+            owned[aid] = OwnedAchievement(aid, aid, row["season_id"])
+            self.unlocked_gp[(user_id, aid)] = row["gp_id"]
+            self._dirty.add((user_id, aid))
+
+    def replay_gp(self, gp: GrandPrix, closes_season: bool):
         print(f"   ⟳ Procesando GP: {gp.name} (Season {gp.season_id})...")
-        
-        # Sincronizar (Stats + Event Achievements)
-        for uid in user_ids:
-            sync_achievements(db, uid, gp)
-            
-        # Check if this is the last GP of the season (that has happened so far)
-        # O si es la última carrera programada de la temporada.
-        # Si la temporada ya acabó, deberíamos cerrar.
-        # Simplificación: Al final de procesar un GP, miramos si era el último de esa season en nuestra lista de 'past_gps'.
-        season_gps = gps_by_season[gp.season_id]
-        if season_gps[-1].id == gp.id:
-            # Es el último GP jugado de esta temporada
-            # ¿Pero ha terminado la temporada?
-            # Asumiremos que si estamos reconstruyendo, queremos dar los premios de final de temporada
-            # si ya se han jugado todos los GPs previstos O si es una temporada pasada.
-            # Por simplicidad: Siempre evaluamos "Season Finale" al terminar el último GP disponible de una season.
-            # Si luego hay más carreras, se recalculará.
+        self.process_gp(gp)
+        if closes_season:
             print(f"   🏆 Cerrando Temporada {gp.season_id}...")
-            evaluate_season_finale_achievements(db, gp.season_id)
-
-    print("✅ RECONSTRUCCIÓN COMPLETADA.")
\ No newline at end of file
+            self.close_season(gp.season_id)
+
+    def process_gp(self, gp: GrandPrix, shared: Optional[GpGlobals] = None):
+        """
+        Aplica el GP a los usuarios del replay. Con `shared` (replay de una partición
+        de usuarios) el máximo y el líder vienen calculados sobre todos los usuarios;
+        sin él se calculan con las stats de este replay.
+        """
+        rules = get_season_rules(self.db, gp.season_id)
+        index = build_result_index(gp.race_result, rules.roster)
+        preds = load_replay_predictions(self.db, gp.id, rules.roster, self.user_ids if shared else None)
+        metrics = {}
+        season_rows = self.season_stats[gp.season_id]
+
+        # --- STATS DE TODOS ---
+        for uid in self.user_ids:
+            stats = self.stats.get(uid)
+            if not stats:
+                stats = self.stats[uid] = _plain_row(UserStats, user_id=uid, **_NEW_STATS_COUNTERS)
+
+            pred = preds.get(uid)
+            if not pred:
+                continue
+            m = metrics[uid] = calculate_gp_metrics(pred, index)
+            # Protección de orden cronológico (ver update_stats_incremental)
+            if stats.last_gp_played_id and gp.id < stats.last_gp_played_id:
+                continue
+            season_stats = season_rows.get(uid)
+            if not season_stats:
+                season_stats = season_rows[uid] = _plain_row(
+                    UserSeasonStats, user_id=uid, season_id=gp.season_id, **_NEW_SEASON_STATS_COUNTERS
+                )
+            gp_stats = _accumulate_gp_stats(stats, season_stats, None, m, gp, new_row=self._new_gp_row)
+            self.gp_stats.append(gp_stats)
+            self.historical[uid] |= historical_event_slugs(gp_stats)
+
+        # --- CONTEXTO GLOBAL DEL GP (mismas reglas que build_gp_context) ---
+        if shared is None:
+            shared = compute_gp_globals(
+                {uid: p.points for uid, p in preds.items()},
+                ((uid, season_rows[uid].points) for uid in self.user_ids if uid in season_rows),
+            )
+        ctx = GpContext(
+            max_points=shared.max_points,
+            leader_id=shared.leader_id,
+            leader_gp_points=shared.leader_gp_points,
+            team_user_ids=frozenset(self.season_teams(gp.season_id)),
+            rules=rules,
+        )
+
+        # --- LOGROS (una pasada por grupo de reglas para todos) ---
+        season_points = {uid: st.points for uid, st in season_rows.items()}
+        should_have = career_season_slugs(self.user_ids, self.stats, season_points, self.career_rules)
+        events = event_achievement_slugs(self.user_ids, preds, ctx, index, metrics, self.event_rules)
+        for uid in self.user_ids:
+            self._diff(uid, should_have[uid] | events[uid], gp.season_id, gp.id)
+
+    @staticmethod
+    def _new_gp_row(**values) -> SimpleNamespace:
+        return _plain_row(UserGpStats, **values)
+
+    def close_season(self, season_id: int, awards: Optional[dict] = None):
+        """
+        Wipe & Assign de los premios finales, como evaluate_season_finale_achievements.
+        `awards` ({user_id: slugs}) viene ya calculado en el replay de una partición:
+        la clasificación es de todos los usuarios.
+        """
+        finale_ids = {self.catalog.by_slug[slug].id for slug in SEASON_FINALE_SLUGS if slug in self.catalog.by_slug}
+        for uid, owned in self.owned.items():
+            for aid in [aid for aid, ua in owned.items() if aid in finale_ids and ua.season_id == season_id]:
+                del owned[aid]
+                self._dirty.add((uid, aid))
+
+        if awards is None:
+            season_rows = self.season_stats.get(season_id, {})
+            standings = [season_rows[uid] for uid in self.user_ids if uid in season_rows]
+            awards = season_finale_awards(standings, load_season_memberships(self.db, season_id), self.user_ids)
+
+        for uid in self.user_ids:
+            slugs = awards.get(uid)
+            if slugs:
+                self._diff(uid, slugs, season_id, None, revoke=False)
+
+    def _achievement_row(self, user_id: int, achievement_id: int) -> dict:
+        return {
+            "user_id": user_id,
+            "achievement_id": achievement_id,
+            "season_id": self.owned[user_id][achievement_id].season_id,
+            "gp_id": self.unlocked_gp[(user_id, achievement_id)],
+        }
+
+    def achievement_rows(self) -> List[dict]:
+        """Filas UserAchievement del estado actual, usuario a usuario."""
+        return [
+            self._achievement_row(uid, aid)
+            for uid, owned in self.owned.items()
+            for aid in owned
+        ]
+
+    def _write_stats(self, db: Session):
+        stats_rows = [_as_insert_row(st) for st in self.stats.values()]
+        season_rows = [_as_insert_row(st) for rows in self.season_stats.values() for st in rows.values()]
+        gp_rows = [_as_insert_row(gs) for gs in self.gp_stats]
+        if stats_rows: db.execute(insert(UserStats), stats_rows)
+        if season_rows: db.execute(insert(UserSeasonStats), season_rows)
+        if gp_rows: db.execute(insert(UserGpStats), gp_rows)
+        self.gp_stats = []
+
+    def write(self, db: Session):
+        """Sustituye las cuatro tablas con INSERT masivos. No hace commit."""
+        db.query(UserAchievement).delete()
+        db.query(UserStats).delete()
+        db.query(UserSeasonStats).delete()
+        db.query(UserGpStats).delete()
+
+        self._write_stats(db)
+        ach_rows = self.achievement_rows()
+        if ach_rows: db.execute(insert(UserAchievement), ach_rows)
+        self._dirty.clear()
+
+    def checkpoint(self, db: Session):
+        """
+        Vuelca solo lo cambiado desde el último checkpoint: añade las filas
+        UserGpStats nuevas, reescribe user_stats / user_season_stats y re-inserta
+        los logros tocados. No hace commit (el job lo hace junto a su progreso).
+        """
+        db.query(UserStats).delete()
+        db.query(UserSeasonStats).delete()
+        self._write_stats(db)
+
+        if self._dirty:
+            table = UserAchievement.__table__
+            db.execute(
+                delete(table).where(
+                    table.c.user_id == bindparam("b_user_id"),
+                    table.c.achievement_id == bindparam("b_achievement_id"),
+                ),
+                [{"b_user_id": uid, "b_achievement_id": aid} for uid, aid in self._dirty],
+            )
+            ach_rows = [
+                self._achievement_row(uid, aid)
+                for uid, aid in self._dirty
+                if aid in self.owned.get(uid, {})
+            ]
+            if ach_rows: db.execute(insert(UserAchievement), ach_rows)
+            self._dirty.clear()
+
+def _as_insert_row(obj) -> dict:
+    # Sin los None: así se aplican los defaults de columna (JSON, contadores...)
+    return {key: value for key, value in vars(obj).items() if value is not None}
@@ -12,6 +12,11 @@ from app.db.models.race_event import RaceEvent
 from app.db.models.driver import Driver
 from app.db.models.season import Season
 from app.services.achievements_service import evaluate_race_achievements
+from app.services.packing import pack_positions
+from app.services.profile_metrics import refresh_gp_profile_metrics
+from app.services.response_cache import bump_data_version
+from app.services.results_service import score_gp_predictions
+from app.services.season_rules import get_season_rules
 
 # Configuración caché
 CACHE_DIR = 'cache'
@@ -94,6 +99,7 @@ def sync_race_data_manual(db: Session, gp_id: int):
         db.query(RacePosition).filter(RacePosition.race_result_id == existing_result.id).delete()
         db.query(RaceEvent).filter(RaceEvent.race_result_id == existing_result.id).delete()
         db.delete(existing_result)
+        bump_data_version(db, gp.season_id)
         db.commit()
 
     # 3. Preparar FastF1
@@ -180,6 +186,11 @@ def sync_race_data_manual(db: Session, gp_id: int):
             positions_to_add.append(pos_entry)
 
         db.add_all(positions_to_add)
+        # Con posiciones repetidas (varios P20) no se empaqueta y se leen las filas
+        new_race_result.packed_positions = pack_positions(
+            [(p.position, p.driver_name) for p in positions_to_add],
+            get_season_rules(db, gp.season_id).roster_slots
+        )
         log(f"✅ {len(positions_to_add)} posiciones registradas.")
 
         # ==========================================
@@ -256,18 +267,29 @@ def sync_race_data_manual(db: Session, gp_id: int):
 
         # Guardar Eventos
         db.add_all(events_to_add)
+        bump_data_version(db, gp.season_id)
         db.commit()
 
         # ==========================================
         # PARTE C: CÁLCULOS FINALES
         # ==========================================
         log("🏆 Recalculando puntos y logros de usuarios...")
+        # Puntos antes que logros: los stats se calculan con Prediction.points
+        changed_rows = score_gp_predictions(db, gp)
+        bump_data_version(db, gp.season_id)
+        db.commit()
+        log(f"✅ Puntuaciones calculadas ({len(changed_rows)} cambios).")
         try:
             evaluate_race_achievements(db, gp.id)
             log("✅ Logros actualizados.")
         except Exception as e:
             log(f"⚠️ Error en logros: {e}")
 
+        # Radar de perfil de quienes predijeron este GP
+        refresh_gp_profile_metrics(db, gp.id)
+        bump_data_version(db, gp.season_id)
+        db.commit()
+
         log("🎉 Sincronización COMPLETA.")
         return True, logs
 
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import threading
+import time
+from typing import Optional
+
+from app.db.session import SessionLocal
+from app.db.models.grand_prix import GrandPrix
+from app.services.simulation import get_gp_snapshot, simulate_gp
+
+# Como mucho un recálculo por GP cada X segundos; lo que llegue entremedias se agrupa
+LIVE_THROTTLE_SECONDS = 1.0
+
+# ==============================================================================
+# CANAL EN DIRECTO DE UN GP
+# ==============================================================================
+
+class LiveGpChannel:
+    """
+    Clasificación provisional de un GP durante la carrera.
+
+    Las posiciones intermedias se guardan como "pendientes" (solo vale la
+    última). Una única tarea recalcula la clasificación con el simulador, como
+    mucho una vez cada LIVE_THROTTLE_SECONDS, y reparte el mismo JSON a todos
+    los suscriptores. Cada suscriptor tiene una cola de tamaño 1: si un cliente
+    va lento se queda con la versión más reciente, no con todas.
+    Sin suscriptores no se guarda nada pendiente: quien se conecte después
+    recibe la siguiente publicación. El canal sale del registro en cuanto no
+    tiene suscriptores.
+    Vive en la memoria del proceso: solo llega a los clientes del mismo worker.
+    """
+
+    def __init__(self, gp_id: int):
+        self.gp_id = gp_id
+        self.version = 0
+        self.latest: Optional[str] = None          # Último JSON emitido
+        self._pending: Optional[tuple] = None       # (positions, events)
+        self._lock = threading.Lock()
+        self._subscribers: set[asyncio.Queue] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_run = 0.0
+
+    # --- PRODUCTORES (admin / job de sync) ---
+
+    def publish(self, positions: dict[int, str], events: dict[str, str]):
+        """Se puede llamar desde cualquier hilo."""
+        with self._lock:
+            if not self._subscribers:
+                return
+            self._pending = (dict(positions), dict(events))
+            loop = self._loop
+
+        if loop and not loop.is_closed():
+            loop.call_soon_threadsafe(self._ensure_task)
+
+    # --- SUSCRIPTORES (SSE) ---
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=1)
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._subscribers.add(queue)
+
+        if self.latest is not None:
+            queue.put_nowait((self.version, self.latest))
+        self._ensure_task()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        with self._lock:
+            self._subscribers.discard(queue)
+        _drop_if_idle(self)
+
+    # --- CÁLCULO COMPARTIDO ---
+
+    def _ensure_task(self):
+        if self._pending is None or not self._subscribers:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        try:
+            await self._recompute_loop()
+        finally:
+            _drop_if_idle(self)
+
+    async def _recompute_loop(self):
+        while self._subscribers:
+            wait = self._last_run + LIVE_THROTTLE_SECONDS - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            with self._lock:
+                pending, self._pending = self._pending, None
+            if pending is None:
+                return
+
+            self._last_run = time.monotonic()
+            try:
+                board = await asyncio.to_thread(self._compute, *pending)
+            except Exception as e:
+                # Un fallo puntual no debe tumbar el canal; se espera a la siguiente publicación
+                print(f"⚠️ Error en clasificación en directo GP {self.gp_id}: {e}")
+                continue
+            if board is None:
+                continue
+
+            self.version += 1
+            self.latest = json.dumps(board)
+            self._broadcast((self.version, self.latest))
+
+    def _compute(self, positions, events) -> Optional[dict]:
+        db = SessionLocal()
+        try:
+            snapshot = get_gp_snapshot(db, self.gp_id)
+        finally:
+            db.close()
+
+        if not snapshot:
+            return None
+        return simulate_gp(snapshot, positions, events)
+
+    def _broadcast(self, message):
+        for queue in list(self._subscribers):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+# ==============================================================================
+# REGISTRO DE CANALES
+# ==============================================================================
+
+_channels: dict[int, LiveGpChannel] = {}
+_channels_lock = threading.Lock()
+
+def gp_exists(gp_id: int) -> bool:
+    db = SessionLocal()
+    try:
+        return db.query(GrandPrix.id).filter(GrandPrix.id == gp_id).scalar() is not None
+    finally:
+        db.close()
+
+def _channel(gp_id: int) -> LiveGpChannel:
+    # Llamar con _channels_lock cogido
+    channel = _channels.get(gp_id)
+    if channel is None:
+        channel = _channels[gp_id] = LiveGpChannel(gp_id)
+    return channel
+
+def _drop_if_idle(channel: LiveGpChannel):
+    """Quita el canal del registro si nadie lo escucha (lo pendiente ya no tiene destinatario)."""
+    with _channels_lock:
+        with channel._lock:
+            idle = not channel._subscribers
+            if idle:
+                channel._pending = None
+        if idle and _channels.get(channel.gp_id) is channel:
+            del _channels[channel.gp_id]
+
+def get_live_channel(gp_id: int) -> LiveGpChannel:
+    """Canal del GP (se crea si no existe). Comprobar antes que el GP existe (gp_exists)."""
+    with _channels_lock:
+        return _channel(gp_id)
+
+def publish_live_positions(gp_id: int, positions: dict[int, str], events: dict[str, str]):
+    """
+    Punto de entrada para el admin y los jobs de sincronización. Sin canal (nadie
+    escuchando en este worker) la publicación se descarta.
+    """
+    # Con el registro bloqueado: el canal no puede retirarse entre buscarlo y publicar
+    with _channels_lock:
+        channel = _channels.get(gp_id)
+        if channel is not None:
+            channel.publish(positions, events)
@@ -0,0 +1,128 @@
+from collections import defaultdict, namedtuple
+from typing import Iterable, Mapping, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.db.models.grand_prix import GrandPrix
+from app.db.models.prediction import Prediction
+from app.db.models.prediction_position import PredictionPosition
+from app.db.models.race_result import RaceResult
+from app.db.models.race_position import RacePosition
+from app.services.season_rules import get_season_rules, invalidate_season_rules
+from app.services.response_cache import bump_rules_version
+
+# Longitud fija del array empaquetado (una posición por byte); cabe una parrilla completa
+PACKED_SLOTS = 24
+# Byte de hueco: posición sin piloto
+EMPTY_SLOT = 255
+
+# Mismos atributos que PredictionPosition / RacePosition
+PackedPosition = namedtuple("PackedPosition", "position driver_name")
+
+# ==============================================================================
+# 1. CODIFICAR / DECODIFICAR
+# ==============================================================================
+
+def pack_positions(position_pairs: Iterable, roster_slots: Mapping[str, int]) -> Optional[bytes]:
+    """
+    Empaqueta pares (position, driver_name) en PACKED_SLOTS bytes: el byte i es el
+    índice en la parrilla del piloto en P(i+1), o EMPTY_SLOT si no hay nadie.
+    Devuelve None si no se puede representar (posición fuera de rango o repetida,
+    piloto repetido o fuera de la parrilla); los lectores usan entonces las filas.
+    """
+    packed = bytearray([EMPTY_SLOT]) * PACKED_SLOTS
+    seen = set()
+    for position, driver in position_pairs:
+        slot = roster_slots.get(driver)
+        if slot is None or slot >= EMPTY_SLOT or driver in seen:
+            return None
+        if not isinstance(position, int) or not 1 <= position <= PACKED_SLOTS or packed[position - 1] != EMPTY_SLOT:
+            return None
+        packed[position - 1] = slot
+        seen.add(driver)
+    return bytes(packed)
+
+def unpack_positions(packed: bytes, roster: tuple) -> list:
+    """Devuelve las PackedPosition ocupadas, en orden de posición."""
+    return [
+        PackedPosition(i + 1, roster[slot])
+        for i, slot in enumerate(packed)
+        if slot != EMPTY_SLOT
+    ]
+
+def positions_of(owner, roster: tuple = ()):
+    """
+    Posiciones de una Prediction o un RaceResult. Con la parrilla de su temporada
+    y el array empaquetado no se cargan las filas; si falta algo, `owner.positions`.
+    """
+    packed = getattr(owner, "packed_positions", None)
+    if packed is None or not roster:
+        return owner.positions
+    try:
+        return unpack_positions(packed, roster)
+    except IndexError:
+        # Parrilla cambiada sin re-empaquetar: las filas mandan
+        return owner.positions
+
+# ==============================================================================
+# 2. RE-EMPAQUETADO DE UNA TEMPORADA
+# ==============================================================================
+
+def repack_season(db: Session, season_id: int) -> dict:
+    """
+    Recalcula `packed_positions` de todas las predicciones y resultados de la
+    temporada a partir de sus filas. Necesario cuando cambia la parrilla (un
+    piloto borrado desplaza los índices). Sube la versión de reglas de la
+    temporada: va en la misma transacción que el cambio de parrilla. No hace commit.
+    """
+    bump_rules_version(db, season_id)
+    invalidate_season_rules(season_id)
+    roster_slots = get_season_rules(db, season_id).roster_slots
+
+    pred_pairs = defaultdict(list)
+    for prediction_id, position, driver in (
+        db.query(PredictionPosition.prediction_id, PredictionPosition.position, PredictionPosition.driver_name)
+        .join(Prediction, Prediction.id == PredictionPosition.prediction_id)
+        .join(GrandPrix, GrandPrix.id == Prediction.gp_id)
+        .filter(GrandPrix.season_id == season_id)
+    ):
+        pred_pairs[prediction_id].append((position, driver))
+
+    result_pairs = defaultdict(list)
+    for result_id, position, driver in (
+        db.query(RacePosition.race_result_id, RacePosition.position, RacePosition.driver_name)
+        .join(RaceResult, RaceResult.id == RacePosition.race_result_id)
+        .join(GrandPrix, GrandPrix.id == RaceResult.gp_id)
+        .filter(GrandPrix.season_id == season_id)
+    ):
+        result_pairs[result_id].append((position, driver))
+
+    prediction_ids = [
+        pid for (pid,) in db.query(Prediction.id).join(GrandPrix, GrandPrix.id == Prediction.gp_id)
+        .filter(GrandPrix.season_id == season_id)
+    ]
+    result_ids = [
+        rid for (rid,) in db.query(RaceResult.id).join(GrandPrix, GrandPrix.id == RaceResult.gp_id)
+        .filter(GrandPrix.season_id == season_id)
+    ]
+
+    pred_rows = [
+        {"id": pid, "packed_positions": pack_positions(pred_pairs.get(pid, ()), roster_slots)}
+        for pid in prediction_ids
+    ]
+    result_rows = [
+        {"id": rid, "packed_positions": pack_positions(result_pairs.get(rid, ()), roster_slots)}
+        for rid in result_ids
+    ]
+    if pred_rows:
+        db.execute(update(Prediction), pred_rows)
+    if result_rows:
+        db.execute(update(RaceResult), result_rows)
+
+    return {
+        "predictions": len(pred_rows),
+        "predictions_packed": sum(1 for r in pred_rows if r["packed_positions"] is not None),
+        "results": len(result_rows),
+        "results_packed": sum(1 for r in result_rows if r["packed_positions"] is not None),
+    }
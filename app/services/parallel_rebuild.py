@@ -0,0 +1,207 @@
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import NamedTuple, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal, engine
+from app.db.models.user import User
+from app.db.models.prediction import Prediction
+from app.db.models.user_stats import UserStats, UserGpStats, UserSeasonStats
+from app.db.models.achievement import UserAchievement
+from app.services.achievements_service import (
+    AchievementReplay,
+    compute_gp_globals,
+    load_rebuild_plan,
+    load_season_memberships,
+    season_closing_gp_ids,
+    season_finale_awards,
+)
+from app.services.response_cache import bump_data_version
+
+# Orden de las tuplas que devuelven los workers
+STATS_COLUMNS = tuple(UserStats.__table__.columns.keys())
+SEASON_STATS_COLUMNS = tuple(UserSeasonStats.__table__.columns.keys())
+GP_STATS_COLUMNS = tuple(UserGpStats.__table__.columns.keys())
+ACHIEVEMENT_COLUMNS = ("user_id", "achievement_id", "season_id", "gp_id")
+
+class Standing(NamedTuple):
+    # Lo que season_finale_awards lee de un UserSeasonStats
+    user_id: int
+    points: float
+
+# ==============================================================================
+# 1. CONTEXTO GLOBAL (UNA PASADA, SOLO PUNTOS)
+# ==============================================================================
+
+def compute_rebuild_globals(db: Session, plan: list, closing_ids: set, user_ids: list):
+    """
+    Lo único que cruza usuarios en la reconstrucción: máximo y líder de cada GP
+    (GpGlobals) y los premios finales de cada temporada. Basta con los puntos de
+    las predicciones y las mismas reglas de orden que _accumulate_gp_stats.
+    Devuelve ({gp_id: GpGlobals}, {season_id: {user_id: slugs}}).
+    """
+    gp_points = defaultdict(dict)
+    for gp_id, uid, points in db.query(Prediction.gp_id, Prediction.user_id, Prediction.points).filter(
+        Prediction.gp_id.in_([gp.id for gp in plan])
+    ).order_by(Prediction.id):
+        gp_points[gp_id][uid] = points
+
+    season_points = defaultdict(dict)   # {season_id: {user_id: puntos}}
+    last_gp = dict.fromkeys(user_ids)
+    shared, awards = {}, {}
+    for gp in plan:
+        points_by_user = gp_points[gp.id]
+        season = season_points[gp.season_id]
+        for uid in user_ids:
+            if uid not in points_by_user:
+                continue
+            # Protección de orden cronológico (ver update_stats_incremental)
+            if last_gp[uid] and gp.id < last_gp[uid]:
+                continue
+            season[uid] = season.get(uid, 0.0) + (points_by_user[uid] or 0)
+            last_gp[uid] = gp.id
+
+        in_season = [uid for uid in user_ids if uid in season]
+        shared[gp.id] = compute_gp_globals(points_by_user, ((uid, season[uid]) for uid in in_season))
+
+        if gp.id in closing_ids:
+            standings = [Standing(uid, season[uid]) for uid in in_season]
+            awards[gp.season_id] = season_finale_awards(standings, load_season_memberships(db, gp.season_id), user_ids)
+    return shared, awards
+
+# ==============================================================================
+# 2. WORKER (UNA PARTICIÓN DE USUARIOS POR TAREA)
+# ==============================================================================
+
+def _init_worker():
+    # Las conexiones heredadas del padre (fork) no se comparten: cada proceso abre las suyas
+    engine.dispose(close=False)
+
+def replay_shard(db: Session, user_ids: list, gp_ids: list, shared: dict, awards: dict):
+    """
+    Reproduce la carrera completa de `user_ids` con el contexto global ya
+    calculado. Lee la BD pero no escribe.
+    Devuelve (stats, season_stats, gp_stats, logros, segundos) como tuplas de columnas.
+    """
+    start = time.perf_counter()
+    plan = load_rebuild_plan(db, gp_ids)
+    closing_ids = season_closing_gp_ids(plan)
+
+    replay = AchievementReplay(db, user_ids)
+    for gp in plan:
+        replay.process_gp(gp, shared[gp.id])
+        if gp.id in closing_ids:
+            replay.close_season(gp.season_id, awards.get(gp.season_id, {}))
+
+    stats = [tuple(getattr(st, key) for key in STATS_COLUMNS) for st in replay.stats.values()]
+    season_stats = [
+        tuple(getattr(st, key) for key in SEASON_STATS_COLUMNS)
+        for rows in replay.season_stats.values()
+        for st in rows.values()
+    ]
+    gp_stats = [tuple(getattr(gs, key) for key in GP_STATS_COLUMNS) for gs in replay.gp_stats]
+    achievements = [tuple(row[key] for key in ACHIEVEMENT_COLUMNS) for row in replay.achievement_rows()]
+    return stats, season_stats, gp_stats, achievements, time.perf_counter() - start
+
+def replay_shard_worker(user_ids: list, gp_ids: list, shared: dict, awards: dict):
+    """Se ejecuta en un proceso del pool, con su propia sesión."""
+    db = SessionLocal()
+    try:
+        return replay_shard(db, user_ids, gp_ids, shared, awards)
+    finally:
+        db.close()
+
+# ==============================================================================
+# 3. ORQUESTADOR
+# ==============================================================================
+
+def _insert_rows(columns: tuple, rows: list) -> list:
+    # Sin los None: así se aplican los defaults de columna (ids, JSON...)
+    return [{key: value for key, value in zip(columns, row) if value is not None} for row in rows]
+
+def rebuild_all_achievements_parallel(db: Session, workers: Optional[int] = None) -> dict:
+    """
+    ⚠️ DANGER ZONE: misma reconstrucción que rebuild_all_achievements, repartida
+    por usuarios. El padre calcula el contexto global en una pasada; cada proceso
+    del pool reproduce la carrera de su partición de usuarios; el padre junta las
+    filas y sustituye las cuatro tablas en un solo commit.
+    """
+    wall_start = time.perf_counter()
+    print("🔥 INICIANDO RECONSTRUCCIÓN PARALELA DE LOGROS Y ESTADÍSTICAS...")
+
+    plan = load_rebuild_plan(db)
+    closing_ids = season_closing_gp_ids(plan)
+    gp_ids = [gp.id for gp in plan]
+    user_ids = [uid for (uid,) in db.query(User.id).order_by(User.id)]
+
+    shared, awards = compute_rebuild_globals(db, plan, closing_ids, user_ids)
+    globals_seconds = time.perf_counter() - wall_start
+
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, len(user_ids)))
+    # Reparto alterno: los usuarios nuevos (menos GPs) quedan repartidos entre particiones
+    shards = [user_ids[i::workers] for i in range(workers)] if user_ids else []
+
+    results = []
+    per_shard = []
+
+    def _collect(shard, stats, season_stats, gp_stats, achievements, seconds):
+        results.append((stats, season_stats, gp_stats, achievements))
+        per_shard.append({"users": len(shard), "gp_stats": len(gp_stats), "seconds": round(seconds, 4)})
+        print(f"   ⟳ [{len(per_shard)}/{len(shards)}] {len(shard)} usuarios reproducidos")
+
+    if workers == 1:
+        for shard in shards:
+            _collect(shard, *replay_shard(db, shard, gp_ids, shared, awards))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = {
+                pool.submit(replay_shard_worker, shard, gp_ids, shared, awards): shard
+                for shard in shards
+            }
+            for future in as_completed(futures):
+                _collect(futures[future], *future.result())
+
+    # Mismo orden de inserción que la versión secuencial (por GP y usuario)
+    user_pos = {uid: i for i, uid in enumerate(user_ids)}
+    gp_pos = {gp_id: i for i, gp_id in enumerate(gp_ids)}
+    uid_at = STATS_COLUMNS.index("user_id")
+    gs_uid_at, gs_gp_at = GP_STATS_COLUMNS.index("user_id"), GP_STATS_COLUMNS.index("gp_id")
+    ss_uid_at, ss_season_at = SEASON_STATS_COLUMNS.index("user_id"), SEASON_STATS_COLUMNS.index("season_id")
+    stats = sorted((row for r in results for row in r[0]), key=lambda row: user_pos[row[uid_at]])
+    season_stats = sorted(
+        (row for r in results for row in r[1]),
+        key=lambda row: (row[ss_season_at], user_pos[row[ss_uid_at]]),
+    )
+    gp_stats = sorted(
+        (row for r in results for row in r[2]),
+        key=lambda row: (gp_pos[row[gs_gp_at]], user_pos[row[gs_uid_at]]),
+    )
+    achievements = sorted((row for r in results for row in r[3]), key=lambda row: user_pos[row[0]])
+
+    write_start = time.perf_counter()
+    db.query(UserAchievement).delete()
+    db.query(UserStats).delete()
+    db.query(UserSeasonStats).delete()
+    db.query(UserGpStats).delete()
+    if stats: db.execute(insert(UserStats), _insert_rows(STATS_COLUMNS, stats))
+    if season_stats: db.execute(insert(UserSeasonStats), _insert_rows(SEASON_STATS_COLUMNS, season_stats))
+    if gp_stats: db.execute(insert(UserGpStats), _insert_rows(GP_STATS_COLUMNS, gp_stats))
+    if achievements: db.execute(insert(UserAchievement), _insert_rows(ACHIEVEMENT_COLUMNS, achievements))
+    bump_data_version(db)
+    db.commit()
+    print("✅ RECONSTRUCCIÓN PARALELA COMPLETADA.")
+
+    return {
+        "users": len(user_ids),
+        "gps": len(plan),
+        "workers": workers,
+        "per_shard": per_shard,
+        "globals_seconds": round(globals_seconds, 4),
+        "write_seconds": round(time.perf_counter() - write_start, 4),
+        "wall_seconds": round(time.perf_counter() - wall_start, 4),
+    }
@@ -0,0 +1,216 @@
+import bisect
+import statistics
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from app.db.models.user import User
+from app.db.models.grand_prix import GrandPrix
+from app.db.models.prediction import Prediction
+from app.db.models.prediction_event import PredictionEvent
+from app.db.models.race_result import RaceResult
+from app.db.models.race_event import RaceEvent
+from app.db.models.user_stats import UserProfileMetrics
+from app.services.packing import positions_of
+from app.services.season_rules import get_season_rules
+
+# Ejes del radar: (columna de UserProfileMetrics, etiqueta, menos es mejor)
+RADAR_AXES = (
+    ("regularity", "Regularidad", True),
+    ("commitment", "Compromiso", False),
+    ("anticipation", "Anticipación", False),
+    ("podium", "Calidad/Podios", False),
+    ("vidente", "Vidente", False),
+)
+
+# Regularidad de quien tiene menos de 3 predicciones (la peor posible)
+NO_VARIANCE = 999999
+
+def _utc(dt: datetime) -> datetime:
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+# ==============================================================================
+# 1. CÁLCULO EN BLOQUE (ANTES "BUCLE ARAÑA" DE stats._calculate_stats)
+# ==============================================================================
+
+def compute_profile_metrics(db: Session, user_ids: Optional[Iterable[int]] = None) -> dict:
+    """
+    {user_id: {columna: valor}} de los usuarios (todos si `user_ids` es None)
+    que tienen alguna predicción. Mismas fórmulas que el radar original, pero
+    con un puñado de queries para todo el bloque en vez de varias por usuario.
+    """
+    users = db.query(User.id, User.created_at)
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        users = users.filter(User.id.in_(user_ids))
+    users = users.all()
+    if not users:
+        return {}
+
+    # Solo los GPs que predijeron estos usuarios (todos si user_ids es None)
+    gps = db.query(GrandPrix.id, GrandPrix.season_id, GrandPrix.race_datetime)
+    if user_ids is not None:
+        gps = gps.filter(GrandPrix.id.in_(
+            select(Prediction.gp_id).where(Prediction.user_id.in_(user_ids)).distinct()
+        ))
+    gps = gps.all()
+    gps_dates = {gp_id: _utc(race_dt) for gp_id, _, race_dt in gps}
+    season_of = {gp_id: season_id for gp_id, season_id, _ in gps}
+    gp_ids = list(gps_dates)
+
+    # El compromiso cuenta todo el calendario: basta con las fechas, ordenadas
+    if user_ids is None:
+        calendar = sorted(gps_dates.values())
+    else:
+        calendar = sorted(_utc(race_dt) for (race_dt,) in db.query(GrandPrix.race_datetime))
+
+    participation = dict(
+        db.query(Prediction.gp_id, func.count(Prediction.user_id))
+        .filter(Prediction.gp_id.in_(gp_ids))
+        .group_by(Prediction.gp_id)
+        .all()
+    )
+
+    # Parrilla de cada temporada para leer las posiciones empaquetadas
+    rosters = {}
+    def gp_roster(gp_id):
+        season_id = season_of.get(gp_id)
+        if season_id not in rosters:
+            rosters[season_id] = get_season_rules(db, season_id).roster if season_id else ()
+        return rosters[season_id]
+
+    official_events = defaultdict(dict)
+    for gp_id, event_type, value in db.query(RaceResult.gp_id, RaceEvent.event_type, RaceEvent.value).join(
+        RaceEvent, RaceEvent.race_result_id == RaceResult.id
+    ).filter(RaceResult.gp_id.in_(gp_ids)).order_by(RaceEvent.id):
+        official_events[gp_id][event_type] = value
+    official_results = {
+        rr.gp_id: {
+            "positions": {p.position: p.driver_name for p in positions_of(rr, gp_roster(rr.gp_id))},
+            "events": official_events.get(rr.gp_id, {}),
+        }
+        for rr in db.query(RaceResult).filter(RaceResult.gp_id.in_(gp_ids))
+    }
+
+    preds_query = db.query(Prediction)
+    events_query = db.query(PredictionEvent.prediction_id, PredictionEvent.event_type, PredictionEvent.value)
+    if user_ids is not None:
+        preds_query = preds_query.filter(Prediction.user_id.in_(user_ids))
+        events_query = events_query.join(Prediction, Prediction.id == PredictionEvent.prediction_id).filter(
+            Prediction.user_id.in_(user_ids)
+        )
+    preds_by_user = defaultdict(list)
+    for p in preds_query.order_by(Prediction.id):
+        preds_by_user[p.user_id].append(p)
+    pred_events = defaultdict(list)
+    for prediction_id, event_type, value in events_query:
+        pred_events[prediction_id].append((event_type, value))
+
+    metrics = {}
+    for uid, created_at in users:
+        u_preds = preds_by_user.get(uid)
+        if not u_preds:
+            continue
+
+        points_list = [p.points for p in u_preds]
+        regularity = statistics.variance(points_list) if len(points_list) >= 3 else NO_VARIANCE
+
+        user_created_at = _utc(created_at) if created_at else datetime.min.replace(tzinfo=timezone.utc)
+        relevant_gps = len(calendar) - bisect.bisect_right(calendar, user_created_at)
+        commitment = 1.0 if relevant_gps == 0 else len(u_preds) / relevant_gps
+
+        deltas = [
+            max(0, (gps_dates[p.gp_id] - _utc(p.updated_at)).total_seconds())
+            for p in u_preds if p.gp_id in gps_dates
+        ]
+        anticipation = statistics.mean(deltas) if deltas else 0
+
+        weighted_sum = sum(p.points * participation.get(p.gp_id, 1) for p in u_preds)
+        podium = weighted_sum / len(u_preds)
+
+        hits, possible = 0, 0
+        for p in u_preds:
+            official = official_results.get(p.gp_id)
+            if not official: continue
+            for pp in positions_of(p, gp_roster(p.gp_id)):
+                possible += 1
+                if official["positions"].get(pp.position) == pp.driver_name: hits += 1
+            for event_type, value in pred_events.get(p.id, ()):
+                possible += 1
+                if official["events"].get(event_type, "").lower() == value.lower(): hits += 1
+        vidente = hits / possible if possible > 0 else 0
+
+        metrics[uid] = {
+            "regularity": regularity, "commitment": commitment,
+            "anticipation": anticipation, "podium": podium, "vidente": vidente,
+        }
+    return metrics
+
+# ==============================================================================
+# 2. REFRESCO (LO LLAMAN LAS RUTAS DE ESCRITURA)
+# ==============================================================================
+
+def refresh_profile_metrics(db: Session, user_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Recalcula y sustituye las filas de `user_ids` (todas si es None). Un usuario
+    sin predicciones se queda sin fila. No hace commit. Devuelve las filas escritas.
+    """
+    if user_ids is not None:
+        user_ids = list(set(user_ids))
+        if not user_ids:
+            return 0
+    metrics = compute_profile_metrics(db, user_ids)
+
+    stale = db.query(UserProfileMetrics)
+    if user_ids is not None:
+        stale = stale.filter(UserProfileMetrics.user_id.in_(user_ids))
+    stale.delete(synchronize_session=False)
+
+    rows = [{"user_id": uid, **values} for uid, values in metrics.items()]
+    if rows:
+        db.execute(insert(UserProfileMetrics), rows)
+    return len(rows)
+
+def refresh_gp_profile_metrics(db: Session, gp_id: int) -> int:
+    """
+    Tras guardar el resultado (o una predicción) de un GP: solo cambian los
+    valores de quienes lo predijeron (puntos, aciertos y participación del GP).
+    """
+    user_ids = [uid for (uid,) in db.query(Prediction.user_id).filter(Prediction.gp_id == gp_id)]
+    return refresh_profile_metrics(db, user_ids)
+
+# ==============================================================================
+# 3. LECTURA
+# ==============================================================================
+
+def load_profile_metrics(db: Session, user_id: int):
+    """
+    (fila UserProfileMetrics del usuario, {columna: (mínimo, máximo) global}),
+    o (None, {}) si no tiene predicciones. Una lectura por clave y los extremos
+    de cada columna por su índice, sin recorrer la tabla.
+    Si la tabla está sin rellenar (BD anterior a ella) se calcula aquí una vez.
+    """
+    row = db.get(UserProfileMetrics, user_id)
+    if row is None and db.query(UserProfileMetrics.user_id).first() is None:
+        if refresh_profile_metrics(db):
+            db.commit()
+        row = db.get(UserProfileMetrics, user_id)
+    if row is None:
+        return None, {}
+
+    # Un MIN/MAX por subconsulta: así cada uno lo resuelve el índice de su columna
+    columns = [getattr(UserProfileMetrics, column) for column, _, _ in RADAR_AXES]
+    values = db.execute(select(
+        *[select(func.min(c)).scalar_subquery() for c in columns],
+        *[select(func.max(c)).scalar_subquery() for c in columns],
+    )).one()
+    bounds = {
+        column: (values[i], values[i + len(columns)])
+        for i, (column, _, _) in enumerate(RADAR_AXES)
+    }
+    return row, bounds
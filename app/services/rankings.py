@@ -0,0 +1,172 @@
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.db.models.grand_prix import GrandPrix
+from app.db.models.prediction import Prediction
+from app.db.models.race_result import RaceResult
+from app.db.models.team import Team
+from app.db.models.team_member import TeamMember
+from app.db.models.user import User
+
+# Columna de Prediction que lee cada modo de /stats y si se acumula sumando o multiplicando
+MODE_COLUMNS = {
+    "base": Prediction.points_base,
+    "total": Prediction.points,
+    "multiplier": Prediction.multiplier,
+}
+
+def is_product(mode: str) -> bool:
+    return mode == "multiplier"
+
+class SeasonMatrix(NamedTuple):
+    """
+    Puntos de una temporada pivotados: una fila por usuario (o escudería) y una
+    columna por GP. Las celdas sin predicción llevan el neutro del modo (0 o 1.0).
+    """
+    gp_ids: List[int]             # Columnas, en orden de carrera
+    completed_gp_ids: set         # GPs con resultado
+    row_ids: List[int]            # User.id / Team.id de cada fila
+    labels: List[tuple]           # (nombre, acrónimo) de cada fila (acrónimo None en escuderías)
+    values: np.ndarray            # Puntos (o multiplicador) de cada fila en cada GP
+    predicted: np.ndarray         # bool: la fila tiene alguna predicción en ese GP
+
+# ==============================================================================
+# 1. CARGA (UNA QUERY DE PREDICCIONES POR TEMPORADA)
+# ==============================================================================
+
+def _season_gps(db: Session, season_id: int, completed_only: bool):
+    query = db.query(GrandPrix.id).filter(GrandPrix.season_id == season_id)
+    if completed_only:
+        query = query.join(RaceResult, RaceResult.gp_id == GrandPrix.id)
+    gp_ids = [gp_id for (gp_id,) in query.order_by(GrandPrix.race_datetime, GrandPrix.id)]
+    completed = {
+        gp_id for (gp_id,) in db.query(RaceResult.gp_id).filter(RaceResult.gp_id.in_(gp_ids))
+    } if gp_ids else set()
+    return gp_ids, completed
+
+def _prediction_rows(db: Session, gp_ids: List[int], mode: str, user_ids: Optional[List[int]] = None):
+    """(user_id, gp_id, valor) de todas las predicciones de los GPs, por usuario."""
+    query = db.query(Prediction.user_id, Prediction.gp_id, MODE_COLUMNS[mode]).filter(Prediction.gp_id.in_(gp_ids))
+    if user_ids is not None:
+        query = query.filter(Prediction.user_id.in_(user_ids))
+    return query.order_by(Prediction.user_id, Prediction.gp_id).all()
+
+def _neutral(mode: str):
+    return 1.0 if is_product(mode) else 0
+
+def _empty_values(rows: int, columns: int, mode: str) -> np.ndarray:
+    if is_product(mode):
+        return np.ones((rows, columns), dtype=np.float64)
+    return np.zeros((rows, columns), dtype=np.int64)
+
+def load_user_matrix(
+    db: Session,
+    season_id: int,
+    mode: str,
+    users: Optional[list] = None,
+    completed_only: bool = False
+) -> SeasonMatrix:
+    """
+    Matriz usuarios × GPs de la temporada. `users`: filas (id, username, acronym)
+    a incluir (todos los usuarios si es None). `completed_only`: solo GPs con resultado.
+    """
+    gp_ids, completed = _season_gps(db, season_id, completed_only)
+    filter_ids = None
+    if users is None:
+        users = db.query(User.id, User.username, User.acronym).order_by(User.id).all()
+    else:
+        filter_ids = [uid for uid, _, _ in users]
+    row_ids = [uid for uid, _, _ in users]
+    values = _empty_values(len(row_ids), len(gp_ids), mode)
+    predicted = np.zeros(values.shape, dtype=bool)
+
+    if row_ids and gp_ids:
+        row_of = {uid: i for i, uid in enumerate(row_ids)}
+        col_of = {gp_id: j for j, gp_id in enumerate(gp_ids)}
+        neutral = _neutral(mode)
+        rows = [
+            (row_of[uid], col_of[gp_id], neutral if value is None else value)
+            for uid, gp_id, value in _prediction_rows(db, gp_ids, mode, filter_ids)
+            if uid in row_of
+        ]
+        if rows:
+            r, c, v = zip(*rows)
+            values[list(r), list(c)] = v
+            predicted[list(r), list(c)] = True
+
+    labels = [(name, acronym) for _, name, acronym in users]
+    return SeasonMatrix(gp_ids, completed, row_ids, labels, values, predicted)
+
+def load_team_matrix(
+    db: Session,
+    season_id: int,
+    mode: str,
+    teams: Optional[list] = None,
+    completed_only: bool = False
+) -> SeasonMatrix:
+    """
+    Matriz escuderías × GPs: cada celda suma (o multiplica, en orden de user_id)
+    las predicciones de sus miembros en ese GP. `teams`: filas (id, name).
+    """
+    gp_ids, completed = _season_gps(db, season_id, completed_only)
+    if teams is None:
+        teams = db.query(Team.id, Team.name).filter(Team.season_id == season_id).order_by(Team.id).all()
+    row_ids = [team_id for team_id, _ in teams]
+    values = _empty_values(len(row_ids), len(gp_ids), mode)
+    predicted = np.zeros(values.shape, dtype=bool)
+
+    if row_ids and gp_ids:
+        row_of = {team_id: i for i, team_id in enumerate(row_ids)}
+        col_of = {gp_id: j for j, gp_id in enumerate(gp_ids)}
+        teams_of = {}
+        for team_id, uid in db.query(TeamMember.team_id, TeamMember.user_id).filter(
+            TeamMember.team_id.in_(row_ids)
+        ).distinct():
+            teams_of.setdefault(uid, []).append(row_of[team_id])
+
+        neutral = _neutral(mode)
+        r, c, v = [], [], []
+        for uid, gp_id, value in _prediction_rows(db, gp_ids, mode, list(teams_of)):
+            for i in teams_of[uid]:
+                r.append(i); c.append(col_of[gp_id]); v.append(neutral if value is None else value)
+        if r:
+            # .at aplica cada fila en orden (sin buffer): mismo producto que el bucle original
+            ufunc = np.multiply if is_product(mode) else np.add
+            ufunc.at(values, (np.array(r), np.array(c)), np.array(v, dtype=values.dtype))
+            predicted[r, c] = True
+
+    return SeasonMatrix(gp_ids, completed, row_ids, [(name, None) for _, name in teams], values, predicted)
+
+# ==============================================================================
+# 2. ACUMULADOS Y ORDEN
+# ==============================================================================
+
+def accumulate(values: np.ndarray, mode: str) -> np.ndarray:
+    """Acumulado GP a GP de cada fila (suma o producto corrido)."""
+    if values.shape[1] == 0:
+        return values.copy()
+    return np.cumprod(values, axis=1) if is_product(mode) else np.cumsum(values, axis=1)
+
+def rounded(values: np.ndarray) -> list:
+    """round(x, 4) de Python elemento a elemento (el de NumPy no redondea igual)."""
+    if values.dtype.kind in "iu":
+        return values.tolist()
+    return [round(x, 4) for x in values.tolist()]
+
+def top_order(keys, limit: Optional[int] = None) -> list:
+    """
+    Índices de mayor a menor `keys` (empates: orden original, como un sort
+    estable), cortados a `limit`. Con límite solo se ordenan los candidatos
+    al top-K (np.partition), no todas las filas.
+    """
+    keys = np.asarray(keys)
+    n = len(keys)
+    if limit and 0 < limit < n:
+        kth = np.partition(keys, n - limit)[n - limit]
+        candidates = np.flatnonzero(keys >= kth)
+    else:
+        candidates = np.arange(n)
+    order = candidates[np.lexsort((candidates, -keys[candidates]))].tolist()
+    return order[:limit] if limit else order
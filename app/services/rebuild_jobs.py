@@ -0,0 +1,277 @@
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.db.models.rebuild_job import RebuildJob
+from app.db.models.user import User
+from app.db.models.user_stats import UserStats, UserGpStats, UserSeasonStats
+from app.db.models.achievement import UserAchievement
+from app.services.achievements_service import (
+    AchievementReplay,
+    load_rebuild_plan,
+    season_closing_gp_ids,
+)
+from app.services.response_cache import bump_data_version
+
+ACTIVE_STATUSES = ("PENDING", "RUNNING")
+
+# Un job RUNNING sin latido en este tiempo se da por huérfano (su worker murió)
+LEASE_SECONDS = 300
+
+# Identifica a este proceso como dueño de los jobs que ejecuta
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+class LeaseLost(Exception):
+    """Otro worker ha reclamado el job (este dejó caducar el lease)."""
+
+# ==============================================================================
+# 1. CREAR / CONSULTAR
+# ==============================================================================
+
+def create_rebuild_job(db: Session) -> RebuildJob:
+    """
+    Crea un job con el plan de GPs fijado (los pasados con resultado).
+    Si ya hay uno pendiente o en marcha, devuelve ese: nunca dos a la vez
+    (el índice único de `active` lo garantiza aunque dos workers lo creen a la vez).
+    """
+    active = db.query(RebuildJob).filter(RebuildJob.status.in_(ACTIVE_STATUSES)).first()
+    if active:
+        return active
+
+    gp_ids = [gp.id for gp in load_rebuild_plan(db)]
+    job = RebuildJob(
+        status="PENDING", active=True, gp_ids=gp_ids, total_gps=len(gp_ids), processed_gps=0, timings=[]
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Otro worker creó el suyo entre la consulta y el INSERT
+        db.rollback()
+        return db.query(RebuildJob).filter(RebuildJob.active.is_(True)).one()
+    db.refresh(job)
+    return job
+
+def reopen_rebuild_job(db: Session, job_id: int) -> bool:
+    """
+    Vuelve a poner en PENDING un job FAILED para reanudarlo desde su checkpoint.
+    False si hay otro job activo (no pueden convivir dos).
+    """
+    table = RebuildJob.__table__
+    try:
+        db.execute(
+            update(table)
+            .where(table.c.id == job_id, table.c.status == "FAILED")
+            .values(status="PENDING", active=True, owner=None, heartbeat_at=None)
+        )
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return False
+    return True
+
+def job_status(job: RebuildJob) -> dict:
+    """Progreso del job con ETA estimada por la media de los GPs ya procesados."""
+    timings = job.timings or []
+    remaining = job.total_gps - job.processed_gps
+    eta = None
+    if job.status in ACTIVE_STATUSES and timings:
+        eta = round(sum(t["seconds"] for t in timings) / len(timings) * remaining, 1)
+
+    return {
+        "id": job.id,
+        "status": job.status,
+        "processed": job.processed_gps,
+        "total": job.total_gps,
+        "last_gp_id": job.last_gp_id,
+        "eta_seconds": eta,
+        "timings": timings,
+        "error": job.error,
+        "owner": job.owner,
+        "heartbeat_at": job.heartbeat_at,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "updated_at": job.updated_at,
+        "finished_at": job.finished_at,
+    }
+
+# ==============================================================================
+# 2. RECLAMAR EL JOB (LEASE CON LATIDO)
+# ==============================================================================
+
+def _lease_expired(now: datetime):
+    table = RebuildJob.__table__
+    return or_(table.c.heartbeat_at.is_(None), table.c.heartbeat_at < now - timedelta(seconds=LEASE_SECONDS))
+
+def claim_rebuild_job(db: Session, job_id: int, owner: str = WORKER_ID) -> bool:
+    """
+    Reclama el job con un único UPDATE condicional: solo si está PENDING o
+    RUNNING con el lease caducado. Si dos workers lo intentan a la vez, solo
+    uno ve rowcount == 1 y lo ejecuta. Hace commit.
+    """
+    now = datetime.utcnow()
+    table = RebuildJob.__table__
+    claimed = db.execute(
+        update(table)
+        .where(
+            table.c.id == job_id,
+            or_(table.c.status == "PENDING", and_(table.c.status == "RUNNING", _lease_expired(now)))
+        )
+        .values(status="RUNNING", owner=owner, heartbeat_at=now, updated_at=now)
+    ).rowcount == 1
+    db.commit()
+    return claimed
+
+def _heartbeat(db: Session, job_id: int, owner: str):
+    """
+    Renueva el lease en la transacción del checkpoint. Si otro worker se ha
+    quedado el job, lanza LeaseLost antes de confirmar nada.
+    """
+    table = RebuildJob.__table__
+    renewed = db.execute(
+        update(table)
+        .where(table.c.id == job_id, table.c.owner == owner, table.c.status == "RUNNING")
+        .values(heartbeat_at=datetime.utcnow())
+    ).rowcount == 1
+    if not renewed:
+        raise LeaseLost(f"Job {job_id} reclamado por otro worker")
+
+# ==============================================================================
+# 3. EJECUCIÓN CON CHECKPOINT POR GP
+# ==============================================================================
+
+def run_rebuild_job(job_id: int, owner: str = WORKER_ID):
+    """
+    Ejecuta (o reanuda) el job en su propia sesión si consigue reclamarlo.
+    Tras cada GP hace un único commit con el estado acumulado, el progreso del
+    job y el latido: si el proceso muere, el siguiente worker que lo reclame
+    (con el lease caducado) sigue desde el último GP confirmado.
+    """
+    db = SessionLocal()
+    try:
+        if not claim_rebuild_job(db, job_id, owner):
+            return
+        job = db.get(RebuildJob, job_id)
+
+        user_ids = [uid for (uid,) in db.query(User.id).order_by(User.id)]
+        if job.processed_gps == 0:
+            print(f"🔥 Job {job.id}: reconstrucción desde cero ({job.total_gps} GPs)...")
+            db.query(UserAchievement).delete()
+            db.query(UserStats).delete()
+            db.query(UserSeasonStats).delete()
+            db.query(UserGpStats).delete()
+            replay = AchievementReplay(db, user_ids)
+        else:
+            print(f"⏯️ Job {job.id}: reanudando en el GP {job.processed_gps + 1}/{job.total_gps}...")
+            replay = AchievementReplay.resume(db, user_ids)
+
+        job.error = None
+        job.started_at = job.started_at or datetime.utcnow()
+        # El borrado (o lo que quedó a medias) invalida las clasificaciones de todas las temporadas
+        bump_data_version(db)
+        _heartbeat(db, job_id, owner)
+        db.commit()
+
+        # El cierre de temporada se decide con el plan completo, no con lo que queda
+        plan = load_rebuild_plan(db, job.gp_ids)
+        closing_ids = season_closing_gp_ids(plan)
+        plan_by_id = {gp.id: gp for gp in plan}
+
+        for gp_id in job.gp_ids[job.processed_gps:]:
+            start = time.perf_counter()
+            gp = plan_by_id.get(gp_id)
+            if gp:  # Un GP borrado (o sin resultado) desde que se creó el job se salta
+                replay.replay_gp(gp, gp.id in closing_ids)
+                replay.checkpoint(db)
+                bump_data_version(db, gp.season_id)
+
+            job.processed_gps += 1
+            job.last_gp_id = gp_id
+            job.timings = job.timings + [{
+                "gp_id": gp_id,
+                "name": gp.name if gp else None,
+                "seconds": round(time.perf_counter() - start, 3),
+            }]
+            job.updated_at = datetime.utcnow()
+            _heartbeat(db, job_id, owner)
+            db.commit() # CHECKPOINT
+
+        # El latido va antes: comprueba que el job sigue siendo de este worker
+        _heartbeat(db, job_id, owner)
+        job.status = "DONE"
+        job.active = None
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        print(f"✅ Job {job.id}: reconstrucción completada.")
+    except LeaseLost as e:
+        # El nuevo dueño sigue desde el último checkpoint confirmado
+        db.rollback()
+        print(f"⚠️ {e}: se abandona en este proceso.")
+    except Exception as e:
+        # Lo confirmado hasta el último GP se queda: se puede reanudar
+        db.rollback()
+        table = RebuildJob.__table__
+        db.execute(
+            update(table)
+            .where(table.c.id == job_id, table.c.owner == owner)
+            .values(status="FAILED", active=None, error=str(e), updated_at=datetime.utcnow())
+        )
+        db.commit()
+        print(f"Error en job de reconstrucción {job_id}: {e}")
+    finally:
+        db.close()
+
+# ==============================================================================
+# 4. HILOS EN SEGUNDO PLANO
+# ==============================================================================
+
+_running: set[int] = set()
+_running_lock = threading.Lock()
+
+def launch_rebuild_job(job_id: int) -> bool:
+    """Lanza el job en un hilo. False si ya está corriendo en este proceso."""
+    with _running_lock:
+        if job_id in _running:
+            return False
+        _running.add(job_id)
+
+    def target():
+        try:
+            run_rebuild_job(job_id)
+        finally:
+            with _running_lock:
+                _running.discard(job_id)
+
+    threading.Thread(target=target, name=f"rebuild-job-{job_id}", daemon=True).start()
+    return True
+
+def resume_interrupted_jobs(db: Optional[Session] = None) -> list[int]:
+    """
+    Al arrancar (en cada worker): relanza los jobs PENDING y los RUNNING cuyo
+    lease ha caducado (su worker murió a medias); siguen desde su último
+    checkpoint. Si varios workers arrancan a la vez, solo uno gana el claim.
+    """
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        job_ids = [
+            jid for (jid,) in db.query(RebuildJob.id).filter(or_(
+                RebuildJob.status == "PENDING",
+                and_(RebuildJob.status == "RUNNING", _lease_expired(datetime.utcnow())),
+            ))
+        ]
+    finally:
+        if own_session:
+            db.close()
+
+    for job_id in job_ids:
+        launch_rebuild_job(job_id)
+    return job_ids
@@ -0,0 +1,213 @@
+import os
+import time
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.db.models.grand_prix import GrandPrix
+from app.db.models.prediction import Prediction
+from app.db.models.prediction_position import PredictionPosition
+from app.db.models.prediction_event import PredictionEvent
+from app.db.models.race_result import RaceResult
+from app.db.models.race_position import RacePosition
+from app.db.models.race_event import RaceEvent
+from app.services.scoring import ResultIndex, score_gp_batch
+from app.services.season_rules import get_season_rules, invalidate_season_rules
+from app.services.simulation import (
+    SnapshotPrediction,
+    SnapshotPosition,
+    SnapshotEvent,
+    invalidate_gp_snapshots,
+)
+from app.services.results_service import mark_gp_scored, write_prediction_scores
+from app.services.profile_metrics import refresh_profile_metrics
+from app.services.response_cache import bump_rules_version
+from app.services.rebuild_jobs import create_rebuild_job
+
+# Lo mínimo de cada predicción que el padre necesita para comparar y escribir
+StoredScore = namedtuple("StoredScore", "id user_id gp_id points points_base multiplier")
+
+# ==============================================================================
+# 1. FOTO DE SOLO LECTURA DE LA TEMPORADA
+# ==============================================================================
+
+def load_season_snapshot(db: Session, season_id: int):
+    """
+    Carga con pocas queries de columnas (sin ORM) todo lo necesario para
+    puntuar los GPs con resultado de la temporada.
+    Devuelve (gps, jobs, stored) donde jobs es {gp_id: (position_pairs, events, predictions)}.
+    """
+    gps = (
+        db.query(GrandPrix.id, GrandPrix.name)
+        .join(RaceResult, RaceResult.gp_id == GrandPrix.id)
+        .filter(GrandPrix.season_id == season_id)
+        .order_by(GrandPrix.race_datetime)
+        .all()
+    )
+    gp_ids = [gp_id for gp_id, _ in gps]
+    if not gp_ids:
+        return gps, {}, {}
+
+    result_positions = defaultdict(list)
+    for gp_id, position, driver in (
+        db.query(RaceResult.gp_id, RacePosition.position, RacePosition.driver_name)
+        .join(RacePosition, RacePosition.race_result_id == RaceResult.id)
+        .filter(RaceResult.gp_id.in_(gp_ids))
+        .order_by(RacePosition.id)
+    ):
+        result_positions[gp_id].append((position, driver))
+
+    result_events = defaultdict(dict)
+    for gp_id, event_type, value in (
+        db.query(RaceResult.gp_id, RaceEvent.event_type, RaceEvent.value)
+        .join(RaceEvent, RaceEvent.race_result_id == RaceResult.id)
+        .filter(RaceResult.gp_id.in_(gp_ids))
+        .order_by(RaceEvent.id)
+    ):
+        result_events[gp_id][event_type] = value
+
+    pred_positions = defaultdict(list)
+    for prediction_id, position, driver in (
+        db.query(PredictionPosition.prediction_id, PredictionPosition.position, PredictionPosition.driver_name)
+        .join(Prediction, Prediction.id == PredictionPosition.prediction_id)
+        .filter(Prediction.gp_id.in_(gp_ids))
+        .order_by(PredictionPosition.id)
+    ):
+        pred_positions[prediction_id].append(SnapshotPosition(position, driver))
+
+    pred_events = defaultdict(list)
+    for prediction_id, event_type, value in (
+        db.query(PredictionEvent.prediction_id, PredictionEvent.event_type, PredictionEvent.value)
+        .join(Prediction, Prediction.id == PredictionEvent.prediction_id)
+        .filter(Prediction.gp_id.in_(gp_ids))
+        .order_by(PredictionEvent.id)
+    ):
+        pred_events[prediction_id].append(SnapshotEvent(event_type, value))
+
+    stored = defaultdict(list)
+    predictions = defaultdict(list)
+    for row in (
+        db.query(Prediction.id, Prediction.user_id, Prediction.gp_id,
+                 Prediction.points, Prediction.points_base, Prediction.multiplier)
+        .filter(Prediction.gp_id.in_(gp_ids))
+        .order_by(Prediction.id)
+    ):
+        stored[row.gp_id].append(StoredScore(*row))
+        predictions[row.gp_id].append(SnapshotPrediction(
+            user_id=row.user_id,
+            positions=tuple(pred_positions.get(row.id, ())),
+            events=tuple(pred_events.get(row.id, ())),
+        ))
+
+    jobs = {
+        gp_id: (tuple(result_positions[gp_id]), result_events[gp_id], tuple(predictions[gp_id]))
+        for gp_id in gp_ids
+    }
+    return gps, jobs, stored
+
+# ==============================================================================
+# 2. WORKER (UN GP POR TAREA)
+# ==============================================================================
+
+def score_gp_snapshot(gp_id: int, position_pairs, events, predictions, multipliers):
+    """
+    Se ejecuta en un proceso del pool: no toca la BD.
+    Devuelve (gp_id, scores, segundos) con solo los campos que se persisten.
+    """
+    start = time.perf_counter()
+    index = ResultIndex.from_pairs(position_pairs, events)
+    scores = [
+        {"final_points": s["final_points"], "base_points": s["base_points"], "multiplier": s["multiplier"]}
+        for s in score_gp_batch(predictions, index, multipliers)
+    ]
+    return gp_id, scores, time.perf_counter() - start
+
+# ==============================================================================
+# 3. ORQUESTADOR
+# ==============================================================================
+
+def rescore_season(
+    db: Session,
+    season_id: int,
+    workers: Optional[int] = None,
+    progress: Optional[Callable[[int, int, dict], None]] = None
+) -> dict:
+    """
+    Re-puntúa todos los GPs con resultado de la temporada (p.ej. tras cambiar
+    multiplicadores). Cada GP se puntúa en un proceso del pool a partir de una
+    foto de solo lectura; el padre junta los resultados y hace una única
+    escritura por lotes (que también corrige los puntos de stats).
+    Si algún punto cambia, crea un job de reconstrucción (sin lanzarlo) para que
+    los logros se re-evalúen GP a GP con el contexto de cada momento (líder,
+    totales de carrera); su id va en `rebuild_job_id`.
+    `progress(hechos, total, info_gp)` se llama al terminar cada GP.
+    """
+    wall_start = time.perf_counter()
+
+    # Los multiplicadores pueden haber cambiado fuera de la API
+    invalidate_season_rules(season_id)
+    multipliers = get_season_rules(db, season_id).multipliers
+
+    gps, jobs, stored = load_season_snapshot(db, season_id)
+    gp_names = dict(gps)
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, len(jobs)))
+
+    scores_by_gp = {}
+    per_gp = []
+
+    def _collect(gp_id, scores, seconds):
+        scores_by_gp[gp_id] = scores
+        info = {"gp_id": gp_id, "name": gp_names[gp_id], "predictions": len(scores), "seconds": round(seconds, 4)}
+        per_gp.append(info)
+        print(f"   ⟳ [{len(per_gp)}/{len(jobs)}] {info['name']}: {info['predictions']} predicciones")
+        if progress:
+            progress(len(per_gp), len(jobs), info)
+
+    if workers == 1:
+        for gp_id, (pairs, events, predictions) in jobs.items():
+            _collect(*score_gp_snapshot(gp_id, pairs, events, predictions, multipliers))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(score_gp_snapshot, gp_id, pairs, events, predictions, multipliers)
+                for gp_id, (pairs, events, predictions) in jobs.items()
+            ]
+            for future in as_completed(futures):
+                _collect(*future.result())
+
+    # Una sola escritura por lotes para toda la temporada
+    records, scores = [], []
+    for gp_id, _ in gps:
+        records.extend(stored[gp_id])
+        scores.extend(scores_by_gp[gp_id])
+    changed_rows = write_prediction_scores(db, records, scores)
+    mark_gp_scored(db, [gp_id for gp_id, _ in gps])
+
+    refresh_profile_metrics(db, {row["user_id"] for row in changed_rows if row["points"][0] != row["points"][1]})
+    # Los demás workers recargan los multiplicadores con los que se ha puntuado
+    bump_rules_version(db, season_id)
+    db.commit()
+
+    rebuild_job_id = None
+    if changed_rows:
+        invalidate_gp_snapshots()
+        # Re-evaluar sobre el estado actual daría a los GPs pasados el líder y los
+        # totales de hoy: el replay cronológico reconstruye cada GP con los suyos
+        rebuild_job_id = create_rebuild_job(db).id
+
+    order = {gp_id: i for i, (gp_id, _) in enumerate(gps)}
+    per_gp.sort(key=lambda info: order[info["gp_id"]])
+
+    return {
+        "season_id": season_id,
+        "gps": len(jobs),
+        "predictions": len(records),
+        "changed_rows": len(changed_rows),
+        "rebuild_job_id": rebuild_job_id,
+        "workers": workers,
+        "per_gp": per_gp,
+        "wall_seconds": round(time.perf_counter() - wall_start, 4),
+    }
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Optional
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db.models.data_version import DataVersion
+
+# Fila de data_versions de lo que no es de una temporada (usuarios, temporadas...)
+GLOBAL_SCOPE = 0
+
+# Respuestas que guarda cada proceso (las menos usadas salen primero)
+MAX_CACHED_RESPONSES = 512
+
+# ==============================================================================
+# 1. VERSIÓN DE DATOS (CONTADOR EN BD, COMÚN A TODOS LOS WORKERS)
+# ==============================================================================
+
+def _bump(db: Session, season_id: Optional[int], rules: bool):
+    key = GLOBAL_SCOPE if season_id is None else season_id
+    table = DataVersion.__table__
+    values = {"version": table.c.version + 1, "updated_at": datetime.utcnow()}
+    if rules:
+        values["rules_version"] = table.c.rules_version + 1
+    bump = update(table).where(table.c.season_id == key).values(**values)
+    if db.execute(bump).rowcount:
+        return
+    try:
+        with db.begin_nested():
+            db.execute(insert(table).values(
+                season_id=key, version=1, rules_version=int(rules), updated_at=datetime.utcnow()
+            ))
+    except IntegrityError:
+        # Otro worker creó la fila a la vez
+        db.execute(bump)
+
+def bump_data_version(db: Session, season_id: Optional[int] = None):
+    """
+    Invalida las respuestas cacheadas de la temporada (None = datos globales,
+    invalida todas). Va en la transacción del llamador: no hace commit, así el
+    cambio y la nueva versión se confirman juntos.
+    """
+    _bump(db, season_id, rules=False)
+
+def bump_rules_version(db: Session, season_id: Optional[int] = None):
+    """
+    Como bump_data_version, pero además invalida las reglas cacheadas de la
+    temporada (parrilla, multiplicadores) o, con None, el catálogo de logros.
+    Solo para esos cambios: el resto de escrituras no obliga a recargarlas.
+    """
+    _bump(db, season_id, rules=True)
+
+def data_version(db: Session, season_id: Optional[int] = None) -> int:
+    """Contador actual de la temporada (None = fila global); 0 si aún no tiene fila."""
+    key = GLOBAL_SCOPE if season_id is None else season_id
+    table = DataVersion.__table__
+    return db.execute(select(table.c.version).where(table.c.season_id == key)).scalar() or 0
+
+def rules_version(db: Session, season_id: Optional[int] = None) -> int:
+    """Contador de cambios de reglas de la temporada (None = catálogo de logros)."""
+    key = GLOBAL_SCOPE if season_id is None else season_id
+    table = DataVersion.__table__
+    return db.execute(select(table.c.rules_version).where(table.c.season_id == key)).scalar() or 0
+
+def data_version_token(db: Session, season_id: Optional[int] = None) -> str:
+    """
+    Etiqueta de la versión de los datos que lee una respuesta: la fila global
+    más la de la temporada, o la suma de todas (solo crecen) si season_id es None.
+    """
+    table = DataVersion.__table__
+    if season_id is None:
+        total = db.execute(select(func.coalesce(func.sum(table.c.version), 0))).scalar()
+        return f"all:{total}"
+    versions = dict(db.execute(
+        select(table.c.season_id, table.c.version).where(table.c.season_id.in_((GLOBAL_SCOPE, season_id)))
+    ).all())
+    return f"{versions.get(GLOBAL_SCOPE, 0)}:{season_id}:{versions.get(season_id, 0)}"
+
+# ==============================================================================
+# 2. CACHÉ EN PROCESO (LRU)
+# ==============================================================================
+
+_responses: "OrderedDict[str, tuple[str, bytes]]" = OrderedDict()
+_responses_lock = threading.Lock()
+
+def _cache_get(key: str, token: str) -> Optional[bytes]:
+    with _responses_lock:
+        entry = _responses.get(key)
+        if entry is None or entry[0] != token:
+            return None
+        _responses.move_to_end(key)
+        return entry[1]
+
+def _cache_put(key: str, token: str, body: bytes):
+    with _responses_lock:
+        _responses[key] = (token, body)
+        _responses.move_to_end(key)
+        while len(_responses) > MAX_CACHED_RESPONSES:
+            _responses.popitem(last=False)
+
+def clear_response_cache():
+    """Vacía la caché de este proceso (las versiones en BD no cambian)."""
+    with _responses_lock:
+        _responses.clear()
+
+# ==============================================================================
+# 3. RESPUESTA CON ETAG
+# ==============================================================================
+
+def _etag(key: str, token: str) -> str:
+    return '"' + hashlib.sha1(f"{key}|{token}".encode()).hexdigest()[:24] + '"'
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Comparación débil (RFC 9110): W/"x" y "x" son la misma etiqueta
+    return "*" in candidates or etag in (tag.removeprefix("W/") for tag in candidates)
+
+def cached_json(
+    request: Request,
+    db: Session,
+    compute: Callable[[], Any],
+    season_id: Optional[int] = None,
+    vary: str = ""
+) -> Response:
+    """
+    Respuesta JSON de `compute()` cacheada por ruta y parámetros (más `vary`,
+    p. ej. el usuario de /stats/me) y etiquetada con la versión de datos de
+    `season_id` (de todas las temporadas si es None). Con If-None-Match de la
+    versión vigente devuelve 304 sin calcular nada.
+    """
+    token = data_version_token(db, season_id)
+    query = urlencode(sorted(request.query_params.multi_items()))
+    key = f"{request.url.path}?{query}#{vary}"
+    etag = _etag(key, token)
+    # no-cache: el navegador guarda la respuesta pero la revalida siempre con el ETag
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    body = _cache_get(key, token)
+    if body is None:
+        # Mismo JSON que la JSONResponse por defecto de FastAPI
+        body = json.dumps(
+            jsonable_encoder(compute()), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+        ).encode("utf-8")
+        _cache_put(key, token, body)
+    return Response(content=body, media_type="application/json", headers=headers)
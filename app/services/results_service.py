@@ -0,0 +1,479 @@
+from collections import defaultdict, namedtuple
+from typing import Iterable, Set
+
+import numpy as np
+from sqlalchemy import func, or_, and_, select, update, bindparam
+from sqlalchemy.orm import Session, selectinload
+
+from app.db.models.grand_prix import GrandPrix
+from app.db.models.prediction import Prediction
+from app.db.models.prediction_position import PredictionPosition
+from app.db.models.prediction_event import PredictionEvent
+from app.db.models.race_result import RaceResult
+from app.db.models.race_position import RacePosition
+from app.db.models.race_event import RaceEvent
+from app.db.models.user_stats import UserStats, UserGpStats, UserSeasonStats
+from app.services.scoring import (
+    ResultDiff,
+    ResultIndex,
+    build_result_index,
+    diff_result_indexes,
+    score_gp_batch,
+)
+from app.services.achievements_service import evaluate_race_achievements, season_leader_id
+from app.services.simulation import invalidate_gp_snapshots
+from app.services.season_rules import get_season_rules
+from app.services.packing import pack_positions
+from app.services.profile_metrics import refresh_gp_profile_metrics
+from app.services.response_cache import bump_data_version
+
+# ==============================================================================
+# 1. ESCRITURA DELTA DEL RESULTADO
+# ==============================================================================
+
+def _apply_positions(db: Session, result: RaceResult, positions: dict):
+    """Actualiza solo las filas de RacePosition que cambian."""
+    rows_by_position = defaultdict(list)
+    for rp in result.positions:
+        rows_by_position[rp.position].append(rp)
+
+    for position in rows_by_position.keys() | positions.keys():
+        driver = positions.get(position)
+        rows = rows_by_position.get(position, [])
+
+        if driver is None:
+            for rp in rows: db.delete(rp)
+        elif rows:
+            if rows[0].driver_name != driver:
+                rows[0].driver_name = driver
+            # Posiciones duplicadas (ej: sync de FastF1 con varios P20) -> nos quedamos con una
+            for rp in rows[1:]: db.delete(rp)
+        else:
+            db.add(RacePosition(race_result_id=result.id, position=position, driver_name=driver))
+
+def _apply_events(db: Session, result: RaceResult, events: dict):
+    """Actualiza solo las filas de RaceEvent que cambian."""
+    rows_by_type = defaultdict(list)
+    for ev in result.events:
+        rows_by_type[ev.event_type].append(ev)
+
+    for event_type in rows_by_type.keys() | events.keys():
+        value = events.get(event_type)
+        rows = rows_by_type.get(event_type, [])
+
+        if value is None:
+            for ev in rows: db.delete(ev)
+        elif rows:
+            if rows[0].value != value:
+                rows[0].value = value
+            for ev in rows[1:]: db.delete(ev)
+        else:
+            db.add(RaceEvent(race_result_id=result.id, event_type=event_type, value=value))
+
+# ==============================================================================
+# 2. SELECCIÓN DE PREDICCIONES AFECTADAS
+# ==============================================================================
+
+def find_candidate_prediction_ids(db: Session, gp_id: int, diff: ResultDiff) -> Set[int]:
+    """
+    Devuelve los IDs de predicción del GP cuyo resultado puede cambiar con `diff`.
+    Se resuelve en SQL para no cargar las predicciones que no se tocan.
+    """
+    if diff.full:
+        return {pid for (pid,) in db.query(Prediction.id).filter(Prediction.gp_id == gp_id).all()}
+
+    conditions = []
+    drivers = list(diff.affected_drivers)
+
+    if drivers:
+        conditions.append(Prediction.id.in_(
+            select(PredictionPosition.prediction_id)
+            .where(PredictionPosition.driver_name.in_(drivers))
+        ))
+        # Eventos cuyo valor es un piloto afectado (DNF_DRIVER, FASTEST_LAP...)
+        conditions.append(Prediction.id.in_(
+            select(PredictionEvent.prediction_id)
+            .where(or_(
+                PredictionEvent.value.in_(drivers),
+                func.trim(PredictionEvent.value).in_(drivers)
+            ))
+        ))
+
+    for event_type, values in diff.event_values.items():
+        conditions.append(Prediction.id.in_(
+            select(PredictionEvent.prediction_id)
+            .where(and_(
+                PredictionEvent.event_type == event_type,
+                func.lower(func.trim(PredictionEvent.value)).in_(list(values))
+            ))
+        ))
+
+    if not conditions:
+        return set()
+
+    rows = db.query(Prediction.id).filter(Prediction.gp_id == gp_id, or_(*conditions)).all()
+    return {pid for (pid,) in rows}
+
+# ==============================================================================
+# 3. ESCRITURA EN BLOQUE DE PUNTUACIONES
+# ==============================================================================
+
+def write_prediction_scores(db: Session, predictions, scores) -> list[dict]:
+    """
+    Persiste el resultado de `score_gp_batch` con un único UPDATE por lotes
+    (executemany por ID de predicción). Las filas que no cambian no se escriben.
+    Devuelve las filas cambiadas con sus valores [antes, después].
+    Recalcula también los puestos (refresh_gp_ranks) de los GPs que cambian y
+    los puntos ya sumados en stats (refresh_stats_points).
+    No hace commit: los objetos ORM se refrescan al hacer commit el llamante.
+    """
+    changed_rows = []
+    mappings = []
+    changed_gp_ids = set()
+    for prediction, score in zip(predictions, scores):
+        before = (prediction.points, prediction.points_base, prediction.multiplier)
+        after = (score["final_points"], score["base_points"], score["multiplier"])
+        if before == after:
+            continue
+
+        changed_rows.append({
+            "prediction_id": prediction.id,
+            "user_id": prediction.user_id,
+            "gp_id": prediction.gp_id,
+            "points": [before[0], after[0]],
+            "points_base": [before[1], after[1]],
+            "multiplier": [before[2], after[2]],
+        })
+        mappings.append({
+            "id": prediction.id,
+            "points": after[0],
+            "points_base": after[1],
+            "multiplier": after[2],
+        })
+        changed_gp_ids.add(prediction.gp_id)
+
+    if mappings:
+        db.execute(update(Prediction), mappings)
+        refresh_gp_ranks(db, changed_gp_ids)
+        refresh_stats_points(db, [
+            (row["user_id"], row["gp_id"], row["points"][1])
+            for row in changed_rows if row["points"][0] != row["points"][1]
+        ])
+
+    return changed_rows
+
+def refresh_gp_ranks(db: Session, gp_ids: Iterable[int]) -> int:
+    """
+    Recalcula gp_rank y gp_percentile de todas las predicciones de `gp_ids` con
+    un searchsorted por GP sobre los puntos ordenados:
+    - gp_rank = 1 + predicciones con más puntos (oro, plata y bronce son 1, 2 y 3).
+    - gp_percentile = 100 - % de las demás con menos puntos (el "Top X%").
+    Solo escribe las filas que cambian y no toca updated_at. No hace commit.
+    """
+    gp_ids = list(set(gp_ids))
+    if not gp_ids:
+        return 0
+
+    rows_by_gp = defaultdict(list)
+    for row in db.query(
+        Prediction.id, Prediction.gp_id, Prediction.points, Prediction.gp_rank, Prediction.gp_percentile
+    ).filter(Prediction.gp_id.in_(gp_ids)):
+        rows_by_gp[row.gp_id].append(row)
+
+    mappings = []
+    for rows in rows_by_gp.values():
+        points = np.array([row.points or 0 for row in rows], dtype=np.float64)
+        ordered = np.sort(points)
+        total = len(rows)
+        better = total - np.searchsorted(ordered, points, side="right")
+        worse = np.searchsorted(ordered, points, side="left")
+        if total > 1:
+            percentiles = 100 - (worse / (total - 1) * 100).astype(np.int64)
+        else:
+            percentiles = np.full(total, 100)
+
+        for row, rank, percentile in zip(rows, (better + 1).tolist(), percentiles.tolist()):
+            if (row.gp_rank, row.gp_percentile) != (rank, percentile):
+                mappings.append({"b_id": row.id, "b_rank": rank, "b_percentile": percentile})
+
+    if mappings:
+        table = Prediction.__table__
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            # Sin esto el onupdate movería updated_at (la anticipación del radar)
+            .values(gp_rank=bindparam("b_rank"), gp_percentile=bindparam("b_percentile"), updated_at=table.c.updated_at),
+            mappings
+        )
+    return len(mappings)
+
+# ==============================================================================
+# 4. PUNTOS DE STATS TRAS RE-PUNTUAR
+# ==============================================================================
+
+def refresh_stats_points(db: Session, changes):
+    """
+    Aplica las diferencias de puntos a UserGpStats, UserSeasonStats y UserStats
+    con un UPDATE por lotes por tabla. `changes` es una lista de (user_id, gp_id, puntos_nuevos).
+    Solo se tocan los GPs que ya tenían caché de stats (ya evaluados), sea cual
+    sea su orden: sync_race_achievements no vuelve a aplicar un GP anterior al
+    último jugado, así que la corrección de un GP pasado solo llega por aquí.
+    Los aciertos (posiciones exactas, eventos) los recalcula la evaluación de logros.
+    """
+    if not changes:
+        return 0
+
+    # Lo que ya sumó cada (usuario, GP) en stats: de ahí sale la diferencia real
+    cached = {
+        (uid, gp_id): points
+        for uid, gp_id, points in db.query(UserGpStats.user_id, UserGpStats.gp_id, UserGpStats.points).filter(
+            UserGpStats.gp_id.in_(list({gp_id for _, gp_id, _ in changes}))
+        )
+    }
+    changes = [(uid, gp_id, cached[(uid, gp_id)], after) for uid, gp_id, after in changes if (uid, gp_id) in cached]
+    if not changes:
+        return 0
+
+    db.execute(
+        update(UserGpStats.__table__)
+        .where(UserGpStats.user_id == bindparam("b_user_id"), UserGpStats.gp_id == bindparam("b_gp_id"))
+        .values(points=bindparam("b_points")),
+        [{"b_user_id": uid, "b_gp_id": gp_id, "b_points": after} for uid, gp_id, _, after in changes]
+    )
+
+    season_of = dict(db.query(GrandPrix.id, GrandPrix.season_id).filter(
+        GrandPrix.id.in_(list({gp_id for _, gp_id, _, _ in changes}))
+    ))
+    deltas = defaultdict(int)
+    season_deltas = defaultdict(int)
+    for uid, gp_id, before, after in changes:
+        delta = (after or 0) - (before or 0)
+        deltas[uid] += delta
+        season_deltas[(uid, season_of[gp_id])] += delta
+
+    # Mismo criterio que update_stats_incremental: el GP corregido suma en total y en su temporada
+    season_rows = [
+        {"b_user_id": uid, "b_season_id": season_id, "b_delta": delta}
+        for (uid, season_id), delta in season_deltas.items() if delta
+    ]
+    if season_rows:
+        db.execute(
+            update(UserSeasonStats.__table__)
+            .where(UserSeasonStats.user_id == bindparam("b_user_id"), UserSeasonStats.season_id == bindparam("b_season_id"))
+            .values(points=UserSeasonStats.points + bindparam("b_delta")),
+            season_rows
+        )
+
+    stats_rows = [{"b_user_id": uid, "b_delta": delta} for uid, delta in deltas.items() if delta]
+    if stats_rows:
+        # current_season_points es la copia de la temporada de su último GP jugado
+        last_season_points = (
+            select(UserSeasonStats.points)
+            .where(
+                UserSeasonStats.user_id == UserStats.user_id,
+                UserSeasonStats.last_gp_played_id == UserStats.last_gp_played_id,
+            )
+            .scalar_subquery()
+        )
+        db.execute(
+            update(UserStats.__table__)
+            .where(UserStats.user_id == bindparam("b_user_id"))
+            .values(
+                total_points=UserStats.total_points + bindparam("b_delta"),
+                current_season_points=func.coalesce(last_season_points, UserStats.current_season_points),
+            ),
+            stats_rows
+        )
+
+    return len(changes)
+
+# ==============================================================================
+# 5. PUNTUACIÓN CONTRA EL RESULTADO GUARDADO
+# ==============================================================================
+
+def mark_gp_scored(db: Session, gp_ids: Iterable[int]):
+    """Marca como puntuadas todas las predicciones actuales de `gp_ids`. No hace commit."""
+    gp_ids = list(set(gp_ids))
+    if gp_ids:
+        db.execute(
+            update(RaceResult).where(RaceResult.gp_id.in_(gp_ids)).values(scored_at=func.now()),
+            execution_options={"synchronize_session": False}
+        )
+
+def has_unscored_predictions(db: Session, gp_id: int) -> bool:
+    """
+    True si el GP tiene predicciones que no se han puntuado contra su resultado:
+    el resultado nunca se puntuó entero o alguna predicción cambió después.
+    """
+    scored_at = select(RaceResult.scored_at).where(RaceResult.gp_id == gp_id).scalar_subquery()
+    return db.query(
+        db.query(Prediction.id).filter(
+            Prediction.gp_id == gp_id,
+            or_(scored_at.is_(None), Prediction.updated_at > scored_at)
+        ).exists()
+    ).scalar()
+
+def score_gp_predictions(db: Session, gp: GrandPrix, prediction_ids: Iterable[int] = None) -> list[dict]:
+    """
+    Puntúa contra el resultado guardado las predicciones `prediction_ids` del GP
+    (todas si es None, y entonces marca el GP como puntuado). Si el GP aún no
+    tiene resultado no hace nada. Devuelve las filas cambiadas. No hace commit.
+    """
+    result = (
+        db.query(RaceResult)
+        .options(selectinload(RaceResult.events))
+        .filter(RaceResult.gp_id == gp.id)
+        .first()
+    )
+    if not result:
+        return []
+
+    rules = get_season_rules(db, gp.season_id)
+    query = db.query(Prediction).options(selectinload(Prediction.events)).filter(Prediction.gp_id == gp.id)
+    if prediction_ids is not None:
+        query = query.filter(Prediction.id.in_(list(prediction_ids)))
+    predictions = query.all()
+
+    scores = score_gp_batch(predictions, build_result_index(result, rules.roster), rules.multipliers)
+    changed_rows = write_prediction_scores(db, predictions, scores)
+    if prediction_ids is None:
+        mark_gp_scored(db, [gp.id])
+    if changed_rows:
+        invalidate_gp_snapshots()
+    return changed_rows
+
+# ==============================================================================
+# 6. LOGROS TRAS RE-PUNTUAR
+# ==============================================================================
+
+# Lo que los logros de un usuario ven del resto del GP
+GpContext = namedtuple("GpContext", "max_points leader_id")
+
+def capture_gp_context(db: Session, gp: GrandPrix) -> GpContext:
+    """Máximo de puntos del GP y líder de la temporada. Llamar antes de re-puntuar."""
+    return GpContext(
+        max_points=db.query(func.max(Prediction.points)).filter(Prediction.gp_id == gp.id).scalar(),
+        leader_id=season_leader_id(db, gp.season_id),
+    )
+
+def evaluate_rescored_gp(
+    db: Session, gp: GrandPrix, user_ids: Iterable[int], changed_rows: list[dict], before: GpContext
+) -> Set[int]:
+    """
+    Evalúa los logros del GP con los puntos nuevos ya confirmados: los de
+    `user_ids` (los re-puntuados) y los de quienes cambian de contexto aunque
+    su predicción no cambie. Devuelve los usuarios evaluados.
+    """
+    user_ids = set(user_ids)
+
+    # Lobo Solitario depende del máximo del GP
+    new_max = db.query(func.max(Prediction.points)).filter(Prediction.gp_id == gp.id).scalar()
+    if before.max_points != new_max:
+        rows = db.query(Prediction.user_id).filter(
+            Prediction.gp_id == gp.id,
+            Prediction.points.in_([v for v in (before.max_points, new_max) if v is not None])
+        ).all()
+        user_ids.update(uid for (uid,) in rows)
+
+    evaluate_race_achievements(db, gp.id, user_ids=user_ids)
+
+    # David vs Goliath depende de los puntos del líder del mundial en este GP
+    changed_points_users = {
+        row["user_id"] for row in changed_rows if row["points"][0] != row["points"][1]
+    }
+    leader_after = season_leader_id(db, gp.season_id)
+    if before.leader_id != leader_after or leader_after in changed_points_users:
+        everyone = {uid for (uid,) in db.query(Prediction.user_id).filter(Prediction.gp_id == gp.id).all()}
+        rest = everyone - user_ids
+        evaluate_race_achievements(db, gp.id, user_ids=rest)
+        user_ids |= rest
+
+    return user_ids
+
+# ==============================================================================
+# 7. ORQUESTADOR
+# ==============================================================================
+
+def save_race_result(
+    db: Session,
+    gp: GrandPrix,
+    positions: dict[int, str],
+    events: dict[str, str],
+    full: bool = False
+) -> dict:
+    """
+    Guarda (o corrige) el resultado de un GP y re-puntúa SOLO las predicciones
+    que pueden cambiar. Se re-evalúa todo el GP con `full=True`, si el resultado
+    no cambia (re-guardar sirve de reparación) o si el GP tiene predicciones sin
+    puntuar (ver has_unscored_predictions).
+    Devuelve un informe con las filas que han cambiado.
+    """
+    result = (
+        db.query(RaceResult)
+        .options(selectinload(RaceResult.positions), selectinload(RaceResult.events))
+        .filter(RaceResult.gp_id == gp.id)
+        .first()
+    )
+
+    rules = get_season_rules(db, gp.season_id)
+    packed = pack_positions(positions.items(), rules.roster_slots)
+    old_index = ResultIndex.from_race_result(result) if result else None
+    new_index = ResultIndex.from_mappings(positions, events, roster=rules.roster, packed=packed)
+    diff = diff_result_indexes(old_index, new_index)
+    if not diff.full and (full or diff.is_empty or has_unscored_predictions(db, gp.id)):
+        diff = diff_result_indexes(None, new_index)
+
+    # 1. Persistir solo lo que cambia
+    if not result:
+        result = RaceResult(gp_id=gp.id)
+        db.add(result)
+        db.flush()
+    _apply_positions(db, result, positions)
+    _apply_events(db, result, events)
+    result.packed_positions = packed
+    bump_data_version(db, gp.season_id)
+    db.commit()
+
+    report = {
+        "created": old_index is None,
+        "full": diff.full,
+        "changed_positions": sorted(diff.changed_positions),
+        "changed_events": sorted(diff.changed_events),
+        "candidates": 0,
+        "changed_rows": [],
+        "achievements_evaluated": 0,
+    }
+
+    # 2. Re-puntuar solo las candidatas
+    candidate_ids = find_candidate_prediction_ids(db, gp.id, diff)
+    report["candidates"] = len(candidate_ids)
+
+    context_before = capture_gp_context(db, gp)
+
+    predictions = []
+    if candidate_ids:
+        predictions = (
+            db.query(Prediction)
+            .options(selectinload(Prediction.events))
+            .filter(Prediction.id.in_(candidate_ids))
+            .all()
+        )
+    scores = score_gp_batch(predictions, new_index, rules.multipliers)
+    report["changed_rows"] = write_prediction_scores(db, predictions, scores)
+    if report["changed_rows"]:
+        # Los puntos de temporada de las fotos del simulador ya no valen
+        invalidate_gp_snapshots()
+    # Radar de perfil: puntos y aciertos de quienes predijeron el GP
+    refresh_gp_profile_metrics(db, gp.id)
+    # Las no candidatas ya estaban puntuadas contra este resultado
+    mark_gp_scored(db, [gp.id])
+    bump_data_version(db, gp.season_id)
+
+    db.commit()
+
+    # 3. Logros: candidatas + usuarios afectados por el contexto global del GP
+    user_ids = evaluate_rescored_gp(
+        db, gp, {p.user_id for p in predictions}, report["changed_rows"], context_before
+    )
+    report["achievements_evaluated"] = len(user_ids)
+    return report
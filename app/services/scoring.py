@@ -1,3 +1,11 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+import numpy as np
+
+from app.services.packing import EMPTY_SLOT, positions_of
+
 def get_podium_drivers(positions_list):
     """
     Extrae los pilotos en las posiciones 1, 2 y 3.
@@ -18,8 +26,10 @@ def build_real_positions_map(race_positions):
         for rp in race_positions
     }
 
-def calculate_base_points(prediction_positions, race_positions):
-    real_map = build_real_positions_map(race_positions)
+def sum_position_points(prediction_positions, real_map):
+    """
+    Suma los puntos de posición contra un mapa {driver_name: position} ya construido.
+    """
     total = 0
 
     for pp in prediction_positions:
@@ -36,6 +46,10 @@ def calculate_base_points(prediction_positions, race_positions):
 
     return total
 
+def calculate_base_points(prediction_positions, race_positions):
+    real_map = build_real_positions_map(race_positions)
+    return sum_position_points(prediction_positions, real_map)
+
 def build_event_map(events):
     """
     Devuelve: {event_type: value}
@@ -45,32 +59,45 @@ def build_event_map(events):
         for e in events
     }
 
+def parse_dnf_drivers(value):
+    """
+    Convierte el valor real de DNF_DRIVER ("SAI, ALB") en un frozenset de códigos.
+    Las cadenas vacías se descartan.
+    """
+    # Si value es "", la lista será [''] y se limpia a vacío
+    return frozenset(x.strip() for x in str(value).split(",") if x.strip())
+
+def is_event_hit(event_type, value, real_events, real_dnf_drivers=None):
+    """
+    Decide si un evento declarado (tipo + valor) acierta contra el mapa real.
+    `real_dnf_drivers` permite pasar la lista de DNF ya parseada.
+    """
+    # Obtenemos el valor real, si no existe asumimos cadena vacía ""
+    pred_val = str(value) if value is not None else ""
+
+    if event_type == "DNF_DRIVER":
+        if real_dnf_drivers is None:
+            real_dnf_drivers = parse_dnf_drivers(real_events.get(event_type, ""))
+        
+        if not real_dnf_drivers and not pred_val:
+             # Caso especial: Realidad vacía y predicción vacía -> Acierto
+             return True
+        return pred_val in real_dnf_drivers
+
+    # Lógica estándar para el resto (Safety Car, etc)
+    # Nota: Asegúrate de que real_events tenga las claves para SC, etc.
+    if event_type in real_events: 
+        return pred_val == str(real_events[event_type])
+
+    return False
+
 def get_correct_events(prediction_events, race_events):
     real_events = build_event_map(race_events)
     correct = []
 
     for pe in prediction_events:
-        # Obtenemos el valor real, si no existe asumimos cadena vacía ""
-        real_val = str(real_events.get(pe.event_type, ""))
-        pred_val = str(pe.value) if pe.value is not None else ""
-
-        if pe.event_type == "DNF_DRIVER":
-            # Si real_val es "", la lista será ['']. Si pred_val es "", coincide.
-            real_dnf_list = [x.strip() for x in real_val.split(",")]
-            # Limpiamos cadenas vacías de la lista real por si acaso
-            real_dnf_list = [x for x in real_dnf_list if x] 
-            
-            if not real_dnf_list and not pred_val:
-                 # Caso especial: Realidad vacía y predicción vacía -> Acierto
-                 correct.append(pe.event_type)
-            elif pred_val in real_dnf_list:
-                correct.append(pe.event_type)
-
-        # Lógica estándar para el resto (Safety Car, etc)
-        # Nota: Asegúrate de que real_events tenga las claves para SC, etc.
-        elif pe.event_type in real_events: 
-             if pred_val == real_val:
-                correct.append(pe.event_type)
+        if is_event_hit(pe.event_type, pe.value, real_events):
+            correct.append(pe.event_type)
                 
     return correct
 
@@ -83,10 +110,10 @@ def calculate_multiplier(correct_events, multiplier_configs):
 
     return multiplier
 
-def evaluate_podium(prediction_positions, race_positions):
-    pred_podium = get_podium_drivers(prediction_positions)
-    real_podium = get_podium_drivers(race_positions)
-
+def compare_podiums(pred_podium, real_podium):
+    """
+    Compara dos podios [P1, P2, P3] (con None si falta alguno).
+    """
     if None in pred_podium or None in real_podium:
         return {
             "PODIUM_PARTIAL": False,
@@ -94,34 +121,230 @@ def evaluate_podium(prediction_positions, race_positions):
         }
 
     partial = set(pred_podium) == set(real_podium)
-    total = pred_podium == real_podium
+    total = list(pred_podium) == list(real_podium)
 
     return {
         "PODIUM_PARTIAL": partial,
         "PODIUM_TOTAL": total
     }
 
+def evaluate_podium(prediction_positions, race_positions):
+    pred_podium = get_podium_drivers(prediction_positions)
+    real_podium = get_podium_drivers(race_positions)
+
+    return compare_podiums(pred_podium, real_podium)
+
+# ==============================================================================
+# ÍNDICE PRECOMPILADO DEL RESULTADO (UNO POR GP)
+# ==============================================================================
+
+@dataclass(frozen=True)
+class ResultIndex:
+    """
+    Vista inmutable de un RaceResult, construida una sola vez por GP.
+    Evita reconstruir mapas y re-parsear DNF_DRIVER en cada predicción.
+    """
+    positions: Mapping[str, int]             # {driver_name: position}
+    drivers_by_position: Mapping[int, str]   # {position: driver_name}
+    events: Mapping[str, str]                # {event_type: value}
+    podium: tuple                            # (P1, P2, P3), None si falta
+    dnf_drivers: frozenset                   # Pilotos en DNF_DRIVER
+    top10: frozenset                         # Pilotos en P1..P10
+    roster: tuple = ()                       # Parrilla de la temporada (decodifica packed_positions)
+    packed: Optional[bytes] = None           # Clasificación empaquetada, si la hay
+
+    @classmethod
+    def from_pairs(cls, position_pairs, events, roster=(), packed=None):
+        """
+        Construye el índice a partir de pares (position, driver_name) y un mapa de eventos.
+        `packed` debe describir las mismas posiciones con los índices de `roster`.
+        """
+        positions = {driver: position for position, driver in position_pairs}
+        drivers_by_position = {position: driver for position, driver in position_pairs}
+        events = dict(events)
+
+        return cls(
+            positions=MappingProxyType(positions),
+            drivers_by_position=MappingProxyType(drivers_by_position),
+            events=MappingProxyType(events),
+            podium=(drivers_by_position.get(1), drivers_by_position.get(2), drivers_by_position.get(3)),
+            dnf_drivers=parse_dnf_drivers(events.get("DNF_DRIVER", "")),
+            top10=frozenset(
+                drivers_by_position.get(i) for i in range(1, 11) if drivers_by_position.get(i)
+            ),
+            roster=tuple(roster),
+            packed=packed,
+        )
+
+    @classmethod
+    def from_race_result(cls, race_result, roster=()):
+        """
+        Con la parrilla de la temporada, las posiciones salen de `packed_positions`
+        sin cargar las filas de RacePosition.
+        """
+        return cls.from_pairs(
+            [(p.position, p.driver_name) for p in positions_of(race_result, roster)],
+            build_event_map(race_result.events),
+            roster=roster,
+            packed=getattr(race_result, "packed_positions", None),
+        )
+
+    @classmethod
+    def from_mappings(cls, positions, events, roster=(), packed=None):
+        """
+        Para payloads de la API: positions = {position: driver_name}, events = {event_type: value}.
+        """
+        return cls.from_pairs(list(positions.items()), events, roster=roster, packed=packed)
+
+    def is_event_hit(self, event_type, value):
+        return is_event_hit(event_type, value, self.events, self.dnf_drivers)
+
+def build_result_index(race_result, roster=()):
+    """
+    Devuelve el ResultIndex de un RaceResult (o el mismo índice si ya lo es).
+    `roster` es la parrilla de la temporada (SeasonRules.roster).
+    """
+    if isinstance(race_result, ResultIndex):
+        return race_result
+    return ResultIndex.from_race_result(race_result, roster)
+
+
+# ==============================================================================
+# DIFERENCIAS ENTRE DOS VERSIONES DE UN RESULTADO (CORRECCIONES)
+# ==============================================================================
+
+# Eventos que intervienen en puntos o en métricas de logros
+TRACKED_EVENTS = ("FASTEST_LAP", "SAFETY_CAR", "DNFS", "DNF_DRIVER")
+
+def normalize_event_value(value):
+    """
+    Forma canónica para comparar valores de eventos (sin espacios, minúsculas).
+    Cualquier igualdad usada al puntuar implica igualdad en esta forma.
+    """
+    return str(value).strip().lower() if value is not None else ""
+
+def _dnf_count(index):
+    try:
+        return int(index.events.get("DNFS", 0))
+    except (TypeError, ValueError):
+        return None
+
+@dataclass(frozen=True)
+class ResultDiff:
+    """
+    Qué ha cambiado entre el resultado guardado y el nuevo.
+    Una predicción solo puede cambiar de puntos/métricas si menciona un piloto
+    de `affected_drivers` o declara un valor de `event_values`; si `full` es
+    True hay que re-evaluarlas todas.
+    """
+    changed_positions: frozenset
+    changed_events: frozenset
+    affected_drivers: frozenset
+    event_values: Mapping[str, frozenset]   # {event_type: valores normalizados antes/después}
+    full: bool
+
+    @property
+    def is_empty(self):
+        return not self.full and not self.changed_positions and not self.changed_events
+
+def diff_result_indexes(old, new):
+    """
+    Compara dos ResultIndex del mismo GP. `old` es None si el resultado es nuevo.
+    """
+    if old is None:
+        return ResultDiff(
+            changed_positions=frozenset(new.drivers_by_position),
+            changed_events=frozenset(new.events),
+            affected_drivers=frozenset(),
+            event_values=MappingProxyType({}),
+            full=True,
+        )
+
+    changed_positions = {
+        p for p in old.drivers_by_position.keys() | new.drivers_by_position.keys()
+        if old.drivers_by_position.get(p) != new.drivers_by_position.get(p)
+    }
+    affected = {old.drivers_by_position.get(p) for p in changed_positions}
+    affected |= {new.drivers_by_position.get(p) for p in changed_positions}
+    # Pilotos que cambian de posición (incluye duplicados raros en la parrilla)
+    affected |= {
+        d for d in old.positions.keys() | new.positions.keys()
+        if old.positions.get(d) != new.positions.get(d)
+    }
+
+    changed_events = {
+        t for t in old.events.keys() | new.events.keys()
+        if old.events.get(t) != new.events.get(t)
+    }
+
+    full = False
+    event_values = {}
+    for event_type in changed_events:
+        before = normalize_event_value(old.events.get(event_type))
+        after = normalize_event_value(new.events.get(event_type))
+        if event_type != "DNF_DRIVER":
+            # DNF_DRIVER se resuelve por piloto (diferencia simétrica) más abajo
+            event_values[event_type] = frozenset({before, after})
+        # Quien no declaró el evento compara contra "" en las métricas
+        if event_type in TRACKED_EVENTS and (not before or not after):
+            full = True
+
+    if "DNF_DRIVER" in changed_events:
+        affected |= old.dnf_drivers ^ new.dnf_drivers
+        if bool(old.dnf_drivers) != bool(new.dnf_drivers):
+            full = True
+
+    if "FASTEST_LAP" in changed_events:
+        # La Escoba depende de si el piloto de la VR está en el podio
+        affected.add(str(old.events.get("FASTEST_LAP", "")).strip())
+        affected.add(str(new.events.get("FASTEST_LAP", "")).strip())
+
+    if "DNFS" in changed_events:
+        before, after = _dnf_count(old), _dnf_count(new)
+        # dnf_driver_hit cambia de regla cuando el nº de DNFs pasa por 0
+        if before is None or after is None or (before == 0) != (after == 0):
+            full = True
+
+    affected.discard(None)
+    affected.discard("")
+
+    return ResultDiff(
+        changed_positions=frozenset(changed_positions),
+        changed_events=frozenset(changed_events),
+        affected_drivers=frozenset(affected),
+        event_values=MappingProxyType(event_values),
+        full=full,
+    )
+
 
 def calculate_prediction_score(
     prediction,
     race_result,
     multiplier_configs
 ):
-    base_points = calculate_base_points(
-        prediction.positions,
-        race_result.positions
+    """
+    `race_result` puede ser un RaceResult o un ResultIndex ya construido
+    (lo recomendable al puntuar muchas predicciones del mismo GP).
+    """
+    index = build_result_index(race_result)
+    positions = positions_of(prediction, index.roster)
+
+    base_points = sum_position_points(
+        positions,
+        index.positions
     )
 
     # Eventos declarativos
-    correct_events = get_correct_events(
-        prediction.events,
-        race_result.events
-    )
+    correct_events = [
+        pe.event_type
+        for pe in prediction.events
+        if index.is_event_hit(pe.event_type, pe.value)
+    ]
 
     # Eventos automáticos (podio)
-    podium_result = evaluate_podium(
-        prediction.positions,
-        race_result.positions
+    podium_result = compare_podiums(
+        get_podium_drivers(positions),
+        index.podium
     )
 
     if podium_result["PODIUM_TOTAL"]:
@@ -142,3 +365,185 @@ def calculate_prediction_score(
         "final_points": final_points,
         "correct_events": correct_events
     }
+
+# ==============================================================================
+# SCORING POR LOTES (UN GP COMPLETO DE GOLPE)
+# ==============================================================================
+
+AUTO_PODIUM_EVENTS = ("PODIUM_TOTAL", "PODIUM_PARTIAL")
+
+def _encode_positions(prediction, driver_index, roster=()):
+    """
+    Devuelve {position: driver_idx} para una predicción, o None si la predicción
+    no se puede codificar en la matriz (posiciones repetidas o < 1).
+    """
+    encoded = {}
+    for pp in positions_of(prediction, roster):
+        if pp.position is None or pp.position < 1 or pp.position in encoded:
+            return None
+        encoded[pp.position] = driver_index.setdefault(pp.driver_name, len(driver_index))
+    return encoded
+
+def _encode_by_name(predictions, index, fallback):
+    """
+    Matriz (usuarios x posiciones) con índices de piloto asignados sobre la marcha.
+    Añade a `fallback` las predicciones que no caben en la matriz.
+    Devuelve (matrix, real_rank, real_podium_idx, none_idx).
+    """
+    driver_index = {}
+    encoded_rows = []
+    for i, prediction in enumerate(predictions):
+        encoded = _encode_positions(prediction, driver_index, index.roster)
+        if encoded is None:
+            fallback.append(i)
+        encoded_rows.append(encoded)
+
+    for driver in index.positions:
+        driver_index.setdefault(driver, len(driver_index))
+
+    # real_rank[driver_idx] = posición real (0 = no clasificado, igual que "if not real_pos")
+    real_rank = np.zeros(len(driver_index) + 1, dtype=np.int64)
+    for driver, position in index.positions.items():
+        if position:
+            real_rank[driver_index[driver]] = position
+
+    width = max([10] + [max(row) for row in encoded_rows if row])
+    matrix = np.full((len(predictions), width), -1, dtype=np.int64)
+    for i, row in enumerate(encoded_rows):
+        if row:
+            matrix[i, np.fromiter(row.keys(), dtype=np.int64) - 1] = np.fromiter(row.values(), dtype=np.int64)
+
+    real_podium_idx = None
+    if None not in index.podium:
+        real_podium_idx = np.array([driver_index[d] for d in index.podium], dtype=np.int64)
+    return matrix, real_rank, real_podium_idx, driver_index.get(None, -1)
+
+def _encode_packed(predictions, index):
+    """
+    Matriz (usuarios x posiciones) leída tal cual de `packed_positions`: predicciones
+    y resultado comparten los índices de la parrilla de la temporada.
+    Devuelve (matrix, real_rank, real_podium_idx, none_idx).
+    """
+    matrix = np.frombuffer(b"".join(p.packed_positions for p in predictions), dtype=np.uint8)
+    matrix = matrix.reshape(len(predictions), -1).astype(np.int64)
+    matrix[matrix == EMPTY_SLOT] = -1
+
+    real = np.frombuffer(index.packed, dtype=np.uint8).astype(np.int64)
+    occupied = real != EMPTY_SLOT
+    # Una celda por índice posible; la última (EMPTY_SLOT) nunca se asigna y vale 0
+    real_rank = np.zeros(EMPTY_SLOT + 1, dtype=np.int64)
+    real_rank[real[occupied]] = np.flatnonzero(occupied) + 1
+
+    real_podium_idx = real[:3] if occupied[:3].all() else None
+    return matrix, real_rank, real_podium_idx, -1
+
+def score_gp_batch(predictions, race_result, multipliers):
+    """
+    Puntúa todas las predicciones de un GP con operaciones de NumPy.
+
+    Codifica las predicciones como una matriz (usuarios x posiciones) de índices
+    de piloto y los eventos como una matriz de códigos por tipo. Devuelve una
+    lista de resultados en el mismo orden que `predictions`, idéntica a llamar
+    a `calculate_prediction_score` una a una. `race_result` puede ser un
+    RaceResult o un ResultIndex. Si el resultado y todas las predicciones
+    tienen `packed_positions`, la matriz sale directamente de esos arrays.
+    """
+    predictions = list(predictions)
+    if not predictions:
+        return []
+
+    # --- 1. MATRIZ DE PREDICCIONES (usuarios x posiciones) + RESULTADO REAL ---
+    index = build_result_index(race_result)
+    fallback = []
+    if index.packed is not None and all(getattr(p, "packed_positions", None) is not None for p in predictions):
+        matrix, real_rank, real_podium_idx, none_idx = _encode_packed(predictions, index)
+    else:
+        matrix, real_rank, real_podium_idx, none_idx = _encode_by_name(predictions, index, fallback)
+    width = matrix.shape[1]
+
+    # --- 2. PUNTOS POR POSICIÓN ---
+    # -1 apunta a la última celda de real_rank, que siempre vale 0
+    real_positions = real_rank[matrix]
+    diff = np.abs(np.arange(1, width + 1) - real_positions)
+    points_matrix = np.where(diff == 0, 3, np.where(diff == 1, 1, 0))
+    base_points = np.where(real_positions != 0, points_matrix, 0).sum(axis=1)
+
+    # --- 3. PODIO AUTOMÁTICO ---
+    pred_podium = matrix[:, :3]
+    if real_podium_idx is None:
+        podium_total = np.zeros(len(predictions), dtype=bool)
+        podium_partial = podium_total.copy()
+    else:
+        # Un hueco (-1) o un piloto None en el podio predicho anula el podio
+        complete = ((pred_podium >= 0) & (pred_podium != none_idx)).all(axis=1)
+        podium_total = complete & (pred_podium == real_podium_idx).all(axis=1)
+        pred_in_real = np.isin(pred_podium, real_podium_idx).all(axis=1)
+        real_in_pred = (pred_podium[:, :, None] == real_podium_idx[None, None, :]).any(axis=1).all(axis=1)
+        podium_partial = complete & pred_in_real & real_in_pred & ~podium_total
+
+    # --- 4. EVENTOS DECLARATIVOS (códigos por tipo + tabla de aciertos) ---
+    event_types = {}
+    value_codes = []
+    event_orders = []
+    for i, prediction in enumerate(predictions):
+        order = []
+        for pe in prediction.events:
+            col = event_types.setdefault(pe.event_type, len(event_types))
+            if col == len(value_codes):
+                value_codes.append({})
+            value_codes[col].setdefault(pe.value, len(value_codes[col]))
+            if col in order and i not in fallback:
+                fallback.append(i)
+            order.append(col)
+        event_orders.append(order)
+
+    event_codes = np.full((len(predictions), len(event_types)), -1, dtype=np.int64)
+    for i, prediction in enumerate(predictions):
+        for pe in prediction.events:
+            col = event_types[pe.event_type]
+            event_codes[i, col] = value_codes[col][pe.value]
+
+    event_hits = np.zeros(event_codes.shape, dtype=bool)
+    for event_type, col in event_types.items():
+        # Un acierto por valor distinto, no por predicción
+        hit_table = np.array(
+            [index.is_event_hit(event_type, value) for value in value_codes[col]] + [False]
+        )
+        event_hits[:, col] = hit_table[event_codes[:, col]]
+
+    # --- 5. MULTIPLICADOR (mismo orden de productos que calculate_multiplier) ---
+    multiplier = np.ones(len(predictions), dtype=np.float64)
+    for mc in multipliers:
+        flags = np.zeros(len(predictions), dtype=bool)
+        if mc.event_type in event_types:
+            flags |= event_hits[:, event_types[mc.event_type]]
+        if mc.event_type == "PODIUM_TOTAL":
+            flags |= podium_total
+        elif mc.event_type == "PODIUM_PARTIAL":
+            flags |= podium_partial
+        multiplier = np.where(flags, multiplier * mc.multiplier, multiplier)
+
+    final_points = (base_points * multiplier).astype(np.int64)
+
+    # --- 6. RESULTADOS POR PREDICCIÓN ---
+    type_names = list(event_types)
+    results = []
+    for i in range(len(predictions)):
+        correct_events = [type_names[col] for col in event_orders[i] if event_hits[i, col]]
+        if podium_total[i]:
+            correct_events.append("PODIUM_TOTAL")
+        elif podium_partial[i]:
+            correct_events.append("PODIUM_PARTIAL")
+
+        results.append({
+            "base_points": int(base_points[i]),
+            "multiplier": float(multiplier[i]),
+            "final_points": int(final_points[i]),
+            "correct_events": correct_events
+        })
+
+    # Predicciones raras (posiciones repetidas...) -> scorer clásico
+    for i in fallback:
+        results[i] = calculate_prediction_score(predictions[i], index, multipliers)
+
+    return results
@@ -0,0 +1,105 @@
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from sqlalchemy.orm import Session
+
+from app.db.models.multiplier_config import MultiplierConfig
+from app.db.models.constructor import Constructor
+from app.db.models.driver import Driver
+from app.services.response_cache import rules_version
+
+# ==============================================================================
+# REGLAS DE UNA TEMPORADA (MULTIPLICADORES + PARRILLA)
+# ==============================================================================
+
+@dataclass(frozen=True)
+class MultiplierRule:
+    # Mismos atributos que MultiplierConfig, para pasarlo tal cual a scoring.py
+    event_type: str
+    multiplier: float
+
+@dataclass(frozen=True)
+class SeasonRules:
+    """
+    Copia inmutable de lo que scoring y logros necesitan de una temporada.
+    Se carga una vez y se comparte entre peticiones mientras no cambie la
+    versión de reglas de la temporada.
+    """
+    season_id: int
+    multipliers: tuple                          # MultiplierRule, en el orden de la BD
+    multipliers_by_event: Mapping[str, float]   # {event_type: multiplier}
+    driver_constructors: Mapping[str, int]      # {driver_code: constructor_id}
+    roster: tuple                               # Códigos de piloto; la posición es su índice empaquetado
+    roster_slots: Mapping[str, int]             # {driver_code: índice en roster}
+
+    def are_teammates(self, code_a: Optional[str], code_b: Optional[str]) -> bool:
+        team_a = self.driver_constructors.get(code_a)
+        return team_a is not None and team_a == self.driver_constructors.get(code_b)
+
+def load_season_rules(db: Session, season_id: int) -> SeasonRules:
+    multipliers = db.query(MultiplierConfig).filter(MultiplierConfig.season_id == season_id).all()
+    drivers = (
+        db.query(Driver.code, Driver.constructor_id)
+        .join(Constructor, Constructor.id == Driver.constructor_id)
+        .filter(Constructor.season_id == season_id)
+        .order_by(Driver.id)
+        .all()
+    )
+
+    driver_constructors = {}
+    for code, constructor_id in drivers:
+        # Si un código está repetido, manda el primero (como el antiguo .first())
+        driver_constructors.setdefault(code, constructor_id)
+    # Orden por Driver.id: un piloto nuevo se añade al final sin mover los índices existentes
+    roster = tuple(driver_constructors)
+
+    return SeasonRules(
+        season_id=season_id,
+        multipliers=tuple(MultiplierRule(mc.event_type, mc.multiplier) for mc in multipliers),
+        multipliers_by_event=MappingProxyType({mc.event_type: mc.multiplier for mc in multipliers}),
+        driver_constructors=MappingProxyType(driver_constructors),
+        roster=roster,
+        roster_slots=MappingProxyType({code: slot for slot, code in enumerate(roster)}),
+    )
+
+# ==============================================================================
+# CACHÉ EN PROCESO
+# ==============================================================================
+
+# {season_id: (versión de reglas con la que se cargó, reglas)}
+_rules: dict[int, tuple[int, SeasonRules]] = {}
+_rules_lock = threading.Lock()
+
+def get_season_rules(db: Session, season_id: int) -> SeasonRules:
+    """
+    Reglas de la temporada, cacheadas con su rules_version en data_versions
+    (las escrituras de resultados o predicciones no la suben). La parrilla
+    define qué significa cada byte de packed_positions: si otro worker la
+    cambia (y sube la versión), aquí se recarga en vez de decodificar mal.
+    """
+    # La versión se lee antes que las reglas: si cambian entre medias, la
+    # entrada queda con la versión vieja y se recarga en la siguiente llamada
+    version = rules_version(db, season_id)
+    with _rules_lock:
+        entry = _rules.get(season_id)
+    if entry and entry[0] == version:
+        return entry[1]
+
+    rules = load_season_rules(db, season_id)
+    with _rules_lock:
+        _rules[season_id] = (version, rules)
+    return rules
+
+def invalidate_season_rules(season_id: Optional[int] = None):
+    """
+    Descarta la caché de este proceso (None = todas). Los cambios de constructores,
+    pilotos o multiplicadores deben además subir la versión de reglas de la
+    temporada (bump_rules_version) en su transacción para que los demás workers recarguen.
+    """
+    with _rules_lock:
+        if season_id is None:
+            _rules.clear()
+        else:
+            _rules.pop(season_id, None)
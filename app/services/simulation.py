@@ -0,0 +1,170 @@
+import threading
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload
+
+from app.db.models.grand_prix import GrandPrix
+from app.db.models.prediction import Prediction
+from app.db.models.user import User
+from app.services.scoring import ResultIndex, score_gp_batch
+from app.services.season_rules import get_season_rules
+
+# Segundos que vive en memoria la foto de un GP
+SNAPSHOT_TTL_SECONDS = 30
+
+# ==============================================================================
+# 1. FOTO EN MEMORIA DE UN GP (SIN ORM)
+# ==============================================================================
+
+@dataclass(frozen=True)
+class SnapshotPosition:
+    position: int
+    driver_name: str
+
+@dataclass(frozen=True)
+class SnapshotEvent:
+    event_type: str
+    value: str
+
+@dataclass(frozen=True)
+class SnapshotPrediction:
+    user_id: int
+    positions: tuple   # SnapshotPosition
+    events: tuple      # SnapshotEvent
+
+@dataclass(frozen=True)
+class GpSnapshot:
+    """
+    Todo lo necesario para puntuar un GP hipotético sin volver a la BD:
+    predicciones, multiplicadores de la temporada, usuarios y los puntos de
+    temporada que cada usuario lleva sin contar este GP.
+    """
+    gp_id: int
+    season_id: int
+    predictions: tuple                      # SnapshotPrediction
+    multipliers: tuple                      # MultiplierRule
+    users: Mapping[int, tuple]              # {user_id: (username, acronym)}
+    season_points: Mapping[int, int]        # {user_id: puntos sin este GP}
+    loaded_at: float
+
+def load_gp_snapshot(db: Session, gp_id: int) -> Optional[GpSnapshot]:
+    gp = db.query(GrandPrix).get(gp_id)
+    if not gp:
+        return None
+
+    predictions = (
+        db.query(Prediction)
+        .options(selectinload(Prediction.positions), selectinload(Prediction.events))
+        .filter(Prediction.gp_id == gp.id)
+        .all()
+    )
+    multipliers = get_season_rules(db, gp.season_id).multipliers
+
+    season_points = (
+        db.query(Prediction.user_id, func.coalesce(func.sum(Prediction.points), 0))
+        .join(GrandPrix, GrandPrix.id == Prediction.gp_id)
+        .filter(GrandPrix.season_id == gp.season_id, Prediction.gp_id != gp.id)
+        .group_by(Prediction.user_id)
+        .all()
+    )
+    users = db.query(User.id, User.username, User.acronym).all()
+
+    return GpSnapshot(
+        gp_id=gp.id,
+        season_id=gp.season_id,
+        predictions=tuple(
+            SnapshotPrediction(
+                user_id=p.user_id,
+                positions=tuple(SnapshotPosition(pp.position, pp.driver_name) for pp in p.positions),
+                events=tuple(SnapshotEvent(pe.event_type, pe.value) for pe in p.events),
+            )
+            for p in predictions
+        ),
+        multipliers=multipliers,
+        users=MappingProxyType({uid: (username, acronym) for uid, username, acronym in users}),
+        season_points=MappingProxyType({uid: int(points) for uid, points in season_points}),
+        loaded_at=time.monotonic(),
+    )
+
+# ==============================================================================
+# 2. CACHÉ POR GP CON TTL
+# ==============================================================================
+
+_snapshots: dict[int, GpSnapshot] = {}
+_snapshots_lock = threading.Lock()
+
+def get_gp_snapshot(db: Session, gp_id: int) -> Optional[GpSnapshot]:
+    """
+    Devuelve la foto del GP desde caché; solo consulta la BD si no hay foto
+    o si ha caducado. None si el GP no existe.
+    """
+    now = time.monotonic()
+    with _snapshots_lock:
+        snapshot = _snapshots.get(gp_id)
+        if snapshot and now - snapshot.loaded_at < SNAPSHOT_TTL_SECONDS:
+            return snapshot
+
+    snapshot = load_gp_snapshot(db, gp_id)
+    if snapshot:
+        with _snapshots_lock:
+            _snapshots[gp_id] = snapshot
+    return snapshot
+
+def invalidate_gp_snapshots(gp_id: Optional[int] = None):
+    """Descarta la foto de un GP (o todas si gp_id es None)."""
+    with _snapshots_lock:
+        if gp_id is None:
+            _snapshots.clear()
+        else:
+            _snapshots.pop(gp_id, None)
+
+# ==============================================================================
+# 3. SIMULACIÓN
+# ==============================================================================
+
+def simulate_gp(snapshot: GpSnapshot, positions: dict[int, str], events: dict[str, str]) -> dict:
+    """
+    Puntúa el resultado hipotético con las mismas reglas que scoring.py y
+    devuelve la clasificación provisional del GP y del mundial.
+    """
+    index = ResultIndex.from_mappings(positions, events)
+    scores = score_gp_batch(snapshot.predictions, index, snapshot.multipliers)
+
+    gp_table = []
+    gp_points = {}
+    for prediction, score in zip(snapshot.predictions, scores):
+        username, acronym = snapshot.users.get(prediction.user_id, (None, None))
+        gp_points[prediction.user_id] = score["final_points"]
+        gp_table.append({
+            "user_id": prediction.user_id,
+            "name": username,
+            "acronym": acronym,
+            "points": score["final_points"],
+            "points_base": score["base_points"],
+            "multiplier": score["multiplier"],
+            "correct_events": score["correct_events"],
+        })
+    gp_table.sort(key=lambda x: x["points"], reverse=True)
+
+    season_table = []
+    for user_id, (username, acronym) in snapshot.users.items():
+        previous = snapshot.season_points.get(user_id, 0)
+        season_table.append({
+            "user_id": user_id,
+            "name": username,
+            "acronym": acronym,
+            "gp_points": gp_points.get(user_id, 0),
+            "accumulated": previous + gp_points.get(user_id, 0),
+        })
+    season_table.sort(key=lambda x: x["accumulated"], reverse=True)
+
+    return {
+        "gp_id": snapshot.gp_id,
+        "season_id": snapshot.season_id,
+        "gp": gp_table,
+        "season": season_table,
+    }
@@ -0,0 +1,48 @@
+"""
+Compara dos ficheros de benchmarks.run (por ejemplo, de dos commits).
+
+Uso:
+    python -m benchmarks.compare antes.json despues.json
+"""
+import json
+import sys
+
+def _index(report):
+    return {
+        (r["dataset"]["users"], r["dataset"]["seasons"], r["dataset"]["gps_per_season"]): r["results"]
+        for r in report["runs"]
+    }
+
+def compare(old: dict, new: dict) -> list[dict]:
+    """Filas {dataset, benchmark, old, new, ratio} con las medianas de ambos ficheros."""
+    rows = []
+    old_runs, new_runs = _index(old), _index(new)
+    for key in sorted(old_runs.keys() & new_runs.keys()):
+        for name in sorted(old_runs[key].keys() & new_runs[key].keys()):
+            before = old_runs[key][name]["median"]
+            after = new_runs[key][name]["median"]
+            rows.append({
+                "dataset": "%du x %dgp x %ds" % (key[0], key[2], key[1]),
+                "benchmark": name,
+                "old": before,
+                "new": after,
+                "ratio": round(after / before, 3) if before else None,
+            })
+    return rows
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    if len(argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+
+    with open(argv[0]) as f: old = json.load(f)
+    with open(argv[1]) as f: new = json.load(f)
+
+    print(f"{old['meta'].get('commit')} -> {new['meta'].get('commit')}")
+    for row in compare(old, new):
+        ratio = f"x{row['ratio']}" if row["ratio"] is not None else "-"
+        print(f"{row['dataset']:<22} {row['benchmark']:<32} {row['old']:>10.4f}s {row['new']:>10.4f}s  {ratio}")
+
+if __name__ == "__main__":
+    main()
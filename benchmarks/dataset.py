@@ -0,0 +1,224 @@
+import random
+import string
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, update
+
+from app.db.session import engine, Base
+from app.db.models import _all
+from app.db.models.user import User
+from app.db.models.season import Season
+from app.db.models.grand_prix import GrandPrix
+from app.db.models.team import Team
+from app.db.models.team_member import TeamMember
+from app.db.models.multiplier_config import MultiplierConfig
+from app.db.models.constructor import Constructor
+from app.db.models.driver import Driver
+from app.db.models.achievement import Achievement, AchievementRarity, AchievementType
+from app.db.models.prediction import Prediction
+from app.db.models.prediction_position import PredictionPosition
+from app.db.models.prediction_event import PredictionEvent
+from app.db.models.race_result import RaceResult
+from app.db.models.race_position import RacePosition
+from app.db.models.race_event import RaceEvent
+from app.db.models.bingo import BingoTile, BingoSelection
+from app.core.security import hash_password
+from app.services.scoring import ResultIndex, score_gp_batch
+from app.services.season_rules import MultiplierRule
+from app.services.packing import pack_positions
+from app.services.simulation import SnapshotPrediction, SnapshotPosition, SnapshotEvent
+from app.scripts.seed_data_long_run import (
+    ACHIEVEMENT_DEFINITIONS,
+    GP_LIST,
+    generate_prediction,
+    generate_race_result,
+)
+
+# Misma parrilla y multiplicadores que seed_data_long_run
+TEAMS_DATA = [
+    ("Red Bull", "#0600EF", ["VER", "PER"]),
+    ("Ferrari", "#FF0000", ["LEC", "HAM"]),
+    ("McLaren", "#FF8700", ["NOR", "PIA"]),
+    ("Mercedes", "#00D2BE", ["RUS", "ANT"]),
+    ("Aston Martin", "#006F62", ["ALO", "STR"]),
+    ("Alpine", "#0090FF", ["GAS", "DOO"]),
+    ("Williams", "#005AFF", ["ALB", "SAI"]),
+    ("VCARB", "#6692FF", ["TSU", "LAW"]),
+    ("Sauber", "#52E252", ["HUL", "BOR"]),
+    ("Haas", "#B6BABD", ["OCO", "BEA"]),
+]
+MULTIPLIERS = [("FASTEST_LAP", 1.5), ("SAFETY_CAR", 1.5), ("DNFS", 1.5),
+               ("DNF_DRIVER", 1.5), ("PODIUM_PARTIAL", 1.25), ("PODIUM_TOTAL", 1.5)]
+
+BINGO_TILES_PER_SEASON = 50
+BINGO_PICKS_PER_USER = 10
+
+# Filas por executemany (SQLite limita variables por sentencia, no filas)
+CHUNK = 20000
+
+def _bulk(conn, model, rows):
+    for i in range(0, len(rows), CHUNK):
+        conn.execute(insert(model.__table__), rows[i:i + CHUNK])
+
+def _acronym(n: int) -> str:
+    """Acrónimo único de 3 letras (AAA, AAB...) sin chocar con ADM."""
+    letters = string.ascii_uppercase
+    n += 1000
+    return letters[n // 676 % 26] + letters[n // 26 % 26] + letters[n % 26]
+
+def build_dataset(num_users: int, num_seasons: int = 3, gps_per_season: int = 24, seed: int = 42) -> dict:
+    """
+    Crea desde cero (en la BD de DATABASE_URL) un dataset determinista con los
+    generadores de seed_data_long_run. La última temporada es la activa y deja
+    sin resultado el último tercio de sus GPs, como la simulación original.
+    Devuelve un resumen con IDs útiles para los benchmarks.
+    """
+    random.seed(seed)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    # Un solo hash: bcrypt es caro y no es lo que medimos
+    password = hash_password("123")
+    now = datetime(2026, 1, 1)
+
+    users = [{"id": 1, "email": "admin@admin.com", "username": "Admin", "acronym": "ADM",
+              "hashed_password": password, "role": "admin", "created_at": now}]
+    skills = {1: 0.5}
+    for uid in range(2, num_users + 1):
+        users.append({"id": uid, "email": f"user{uid}@bench.com", "username": f"user_{uid}",
+                      "acronym": _acronym(uid), "hashed_password": password, "role": "user", "created_at": now})
+        skills[uid] = random.triangular(0.2, 0.9, 0.5)
+
+    achievements = [
+        {"slug": d["slug"], "name": d["name"], "description": d["desc"], "icon": d["icon"],
+         "rarity": AchievementRarity(d["rare"]), "type": AchievementType(d["type"])}
+        for d in ACHIEVEMENT_DEFINITIONS
+    ]
+
+    seasons, multipliers, constructors, drivers = [], [], [], []
+    teams, members, gps, results, race_positions, race_events = [], [], [], [], [], []
+    predictions, pred_positions, pred_events = [], [], []
+    tiles, selections = [], []
+    completed_gp_ids = []
+
+    for s_idx in range(num_seasons):
+        season_id = s_idx + 1
+        year = 2026 - num_seasons + 1 + s_idx
+        is_current = s_idx == num_seasons - 1
+        seasons.append({"id": season_id, "year": year, "name": f"F1 {year}", "is_active": is_current})
+
+        season_multipliers = []
+        for evt, val in MULTIPLIERS:
+            multipliers.append({"season_id": season_id, "event_type": evt, "multiplier": val})
+            season_multipliers.append(MultiplierRule(evt, val))
+
+        driver_codes = []
+        for t_name, color, codes in TEAMS_DATA:
+            constructor_id = len(constructors) + 1
+            constructors.append({"id": constructor_id, "name": t_name, "color": color, "season_id": season_id})
+            for code in codes:
+                drivers.append({"code": code, "name": code, "constructor_id": constructor_id})
+                driver_codes.append(code)
+        # Mismos índices que SeasonRules.roster_slots (orden de Driver.id)
+        roster_slots = {code: slot for slot, code in enumerate(dict.fromkeys(driver_codes))}
+
+        # Equipos de 2 (como assign_teams_to_users)
+        players = list(range(2, num_users + 1))
+        random.shuffle(players)
+        for i in range(0, len(players) - 1, 2):
+            team_id = len(teams) + 1
+            teams.append({"id": team_id, "name": f"Squad {year} {i // 2 + 1}", "season_id": season_id,
+                          "join_code": f"S{year}-{i // 2}"})
+            for uid in players[i:i + 2]:
+                members.append({"team_id": team_id, "user_id": uid, "season_id": season_id})
+
+        # Bingo
+        season_tiles = []
+        for t in range(BINGO_TILES_PER_SEASON):
+            tile_id = len(tiles) + 1
+            tiles.append({"id": tile_id, "season_id": season_id, "description": f"Casilla {t + 1}",
+                          "is_completed": random.random() < 0.3})
+            season_tiles.append(tile_id)
+        for uid in range(2, num_users + 1):
+            for tile_id in random.sample(season_tiles, BINGO_PICKS_PER_USER):
+                selections.append({"user_id": uid, "bingo_tile_id": tile_id})
+
+        played = (gps_per_season * 2) // 3 if is_current else gps_per_season
+        start = datetime(year, 3, 1)
+        for g in range(gps_per_season):
+            gp_id = len(gps) + 1
+            gps.append({"id": gp_id, "name": f"GP {GP_LIST[g % len(GP_LIST)]}",
+                        "race_datetime": start + timedelta(weeks=g), "season_id": season_id})
+            if g >= played:
+                continue
+
+            real_pos, real_evts = generate_race_result(driver_codes)
+            result_id = len(results) + 1
+            results.append({"id": result_id, "gp_id": gp_id, "packed_positions": pack_positions(
+                enumerate(real_pos, start=1), roster_slots
+            )})
+            race_positions.extend(
+                {"race_result_id": result_id, "position": i + 1, "driver_name": d} for i, d in enumerate(real_pos)
+            )
+            race_events.extend(
+                {"race_result_id": result_id, "event_type": k, "value": str(v)} for k, v in real_evts.items()
+            )
+            completed_gp_ids.append(gp_id)
+
+            gp_predictions = []
+            for uid in range(1, num_users + 1):
+                p_pos, p_evts = generate_prediction(real_pos, real_evts, skills[uid])
+                prediction_id = len(predictions) + 1
+                predictions.append({"id": prediction_id, "user_id": uid, "gp_id": gp_id, "packed_positions": pack_positions(
+                    enumerate(p_pos, start=1), roster_slots
+                )})
+                gp_predictions.append(SnapshotPrediction(
+                    user_id=uid,
+                    positions=tuple(SnapshotPosition(i + 1, d) for i, d in enumerate(p_pos)),
+                    events=tuple(SnapshotEvent(k, str(v)) for k, v in p_evts.items()),
+                ))
+                pred_positions.extend(
+                    {"prediction_id": prediction_id, "position": i + 1, "driver_name": d} for i, d in enumerate(p_pos)
+                )
+                pred_events.extend(
+                    {"prediction_id": prediction_id, "event_type": k, "value": str(v)} for k, v in p_evts.items()
+                )
+
+            index = ResultIndex.from_mappings(dict(enumerate(real_pos, start=1)), real_evts)
+            first_id = len(predictions) - len(gp_predictions) + 1
+            for offset, score in enumerate(score_gp_batch(gp_predictions, index, season_multipliers)):
+                row = predictions[first_id - 1 + offset]
+                row["points"] = score["final_points"]
+                row["points_base"] = score["base_points"]
+                row["multiplier"] = score["multiplier"]
+
+    with engine.begin() as conn:
+        _bulk(conn, User, users)
+        _bulk(conn, Achievement, achievements)
+        _bulk(conn, Season, seasons)
+        _bulk(conn, MultiplierConfig, multipliers)
+        _bulk(conn, Constructor, constructors)
+        _bulk(conn, Driver, drivers)
+        _bulk(conn, Team, teams)
+        _bulk(conn, TeamMember, members)
+        _bulk(conn, BingoTile, tiles)
+        _bulk(conn, BingoSelection, selections)
+        _bulk(conn, GrandPrix, gps)
+        _bulk(conn, RaceResult, results)
+        _bulk(conn, RacePosition, race_positions)
+        _bulk(conn, RaceEvent, race_events)
+        _bulk(conn, Prediction, predictions)
+        _bulk(conn, PredictionPosition, pred_positions)
+        _bulk(conn, PredictionEvent, pred_events)
+        # Las predicciones ya van puntuadas contra su resultado
+        conn.execute(update(RaceResult).values(scored_at=func.now()))
+
+    return {
+        "users": num_users,
+        "seasons": num_seasons,
+        "gps_per_season": gps_per_season,
+        "seed": seed,
+        "predictions": len(predictions),
+        "active_season_id": num_seasons,
+        "completed_gp_ids": completed_gp_ids,
+    }
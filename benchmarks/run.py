@@ -0,0 +1,91 @@
+"""
+Benchmarks de scoring, logros y rankings con datasets deterministas.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.run                                   # 100 usuarios
+    python -m benchmarks.run --users 100 1000 10000 --output bench.json
+    python -m benchmarks.compare antes.json despues.json
+
+Cada tamaño se ejecuta en un proceso aparte contra un SQLite temporal
+(DATABASE_URL), así la BD de desarrollo no se toca.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _run_child(args, users: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "result.json")
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        cmd = [
+            sys.executable, "-m", "benchmarks.run", "--child",
+            "--users", str(users),
+            "--seasons", str(args.seasons),
+            "--gps", str(args.gps),
+            "--seed", str(args.seed),
+            "--repeat", str(args.repeat),
+            "--output", out,
+        ]
+        subprocess.run(cmd, cwd=REPO_ROOT, env=env, check=True)
+        with open(out) as f:
+            return json.load(f)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de la API de porras")
+    parser.add_argument("--users", type=int, nargs="+", default=[100])
+    parser.add_argument("--seasons", type=int, default=3)
+    parser.add_argument("--gps", type=int, default=24, help="GPs por temporada")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones por medida (el rebuild se mide 1 vez)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        # Aquí DATABASE_URL ya apunta al SQLite temporal
+        from benchmarks.suite import run_suite
+        result = run_suite(args.users[0], args.seasons, args.gps, args.seed, args.repeat)
+        with open(args.output, "w") as f:
+            json.dump(result, f)
+        return
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "runs": [],
+    }
+    for users in args.users:
+        print(f"⏱️  {users} usuarios x {args.gps} GPs x {args.seasons} temporadas...")
+        run = _run_child(args, users)
+        report["runs"].append(run)
+        for name, timing in run["results"].items():
+            print(f"   {name:<32} mediana {timing['median']:.4f}s  min {timing['min']:.4f}s")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Resultados en {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import contextlib
+import io
+import statistics
+import time
+
+from sqlalchemy.orm import selectinload
+
+from benchmarks.dataset import build_dataset
+
+def timed(fn, repeat: int = 1) -> dict:
+    """Ejecuta `fn` `repeat` veces (silenciando prints) y devuelve los tiempos."""
+    runs = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            fn()
+            runs.append(time.perf_counter() - start)
+    return {
+        "runs": [round(r, 6) for r in runs],
+        "min": round(min(runs), 6),
+        "median": round(statistics.median(runs), 6),
+    }
+
+def run_suite(num_users: int, num_seasons: int, gps_per_season: int, seed: int, repeat: int) -> dict:
+    """
+    Construye el dataset en la BD de DATABASE_URL y mide cada operación.
+    Se importa después de fijar DATABASE_URL (ver benchmarks.run).
+    """
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        info = build_dataset(num_users, num_seasons, gps_per_season, seed)
+    build_seconds = time.perf_counter() - start
+
+    from fastapi.testclient import TestClient
+    from app.db.session import SessionLocal
+    from app.db.models.prediction import Prediction
+    from app.db.models.grand_prix import GrandPrix
+    from app.core.security import create_access_token
+    from app.services.scoring import calculate_prediction_score, score_gp_batch
+    from app.services.season_rules import get_season_rules
+    from app.services.achievements_service import evaluate_race_achievements, rebuild_all_achievements
+    from app.services.parallel_rebuild import rebuild_all_achievements_parallel
+    from app.services.response_cache import clear_response_cache
+    with contextlib.redirect_stdout(io.StringIO()):
+        import main
+
+    results = {}
+    db = SessionLocal()
+    last_gp_id = info["completed_gp_ids"][-1]
+    season_id = info["active_season_id"]
+
+    # --- 1. SCORING DE UN GP COMPLETO (sin contar la carga) ---
+    gp = db.get(GrandPrix, last_gp_id)
+    race_result = gp.race_result
+    multipliers = get_season_rules(db, gp.season_id).multipliers
+    predictions = (
+        db.query(Prediction)
+        .options(selectinload(Prediction.positions), selectinload(Prediction.events))
+        .filter(Prediction.gp_id == last_gp_id)
+        .all()
+    )
+    results["calculate_prediction_score"] = timed(
+        lambda: [calculate_prediction_score(p, race_result, multipliers) for p in predictions], repeat
+    )
+    results["score_gp_batch"] = timed(lambda: score_gp_batch(predictions, race_result, multipliers), repeat)
+    db.close()
+
+    # --- 2. LOGROS ---
+    def rebuild():
+        session = SessionLocal()
+        try:
+            rebuild_all_achievements(session)
+        finally:
+            session.close()
+
+    def rebuild_parallel():
+        session = SessionLocal()
+        try:
+            rebuild_all_achievements_parallel(session)
+        finally:
+            session.close()
+
+    def evaluate():
+        session = SessionLocal()
+        try:
+            evaluate_race_achievements(session, last_gp_id)
+        finally:
+            session.close()
+
+    # El rebuild deja el estado que necesita evaluate (UserStats al día)
+    results["rebuild_all_achievements"] = timed(rebuild, 1)
+    results["rebuild_all_achievements_parallel"] = timed(rebuild_parallel, 1)
+    results["evaluate_race_achievements"] = timed(evaluate, repeat)
+
+    # --- 3. ENDPOINTS ---
+    client = TestClient(main.app)
+    headers = {"Authorization": "Bearer " + create_access_token({"sub": "2"})}
+
+    def get(url):
+        # Sin la caché de respuestas: mide el cálculo (comparable con versiones anteriores)
+        clear_response_cache()
+        response = client.get(url, headers=headers)
+        response.raise_for_status()
+
+    def get_cached(url):
+        response = client.get(url, headers=headers)
+        response.raise_for_status()
+        return response
+
+    def revalidate(url, etag):
+        response = client.get(url, headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 304
+
+    for name, url in (
+        ("GET /stats/ranking", f"/stats/ranking?season_id={season_id}&type=users"),
+        ("GET /stats/me", "/stats/me"),
+        ("GET /bingo/standings", "/bingo/standings"),
+    ):
+        results[name] = timed(lambda: get(url), repeat)
+        etag = get_cached(url).headers["ETag"]
+        results[f"{name} (cached)"] = timed(lambda: get_cached(url), repeat)
+        results[f"{name} (304)"] = timed(lambda: revalidate(url, etag), repeat)
+
+    info = {k: v for k, v in info.items() if k != "completed_gp_ids"}
+    return {"dataset": info, "build_seconds": round(build_seconds, 3), "results": results}
@@ -15,6 +15,9 @@ from app.api.auth import router as auth_router
 from app.api.grand_prix import router as grand_prix_router
 from app.api.predictions import router as predictions_router
 from app.api.race_results import router as race_results_router
+from app.api.scoring import router as scoring_router
+from app.api.standings import router as standings_router
+from app.api.live import router as live_router
 from app.api.admin import router as admin_router
 from app.api import stats
 from app.api.seasons import router as seasons_router
@@ -22,6 +25,7 @@ from app.api.teams import router as teams_router
 from app.api.bingo import router as bingo_router
 from app.api.avatars import router as avatars_router
 from app.api.achievements import router as achievements_router
+from app.services.rebuild_jobs import resume_interrupted_jobs
 
 
 app = FastAPI(
@@ -39,11 +43,19 @@ app.mount("/static", StaticFiles(directory="app/static"), name="static")
 # Creamos las tablas en la base de datos
 Base.metadata.create_all(bind=engine)
 
+# Reconstrucciones de logros que quedaron a medias (el proceso murió): siguen desde su checkpoint
+@app.on_event("startup")
+def resume_rebuild_jobs():
+    resume_interrupted_jobs()
+
 # Conectamos las piezas (routers)
 app.include_router(auth_router)
 app.include_router(grand_prix_router)
 app.include_router(predictions_router)
 app.include_router(race_results_router)
+app.include_router(scoring_router)
+app.include_router(standings_router)
+app.include_router(live_router)
 app.include_router(admin_router)
 app.include_router(stats.router)
 app.include_router(seasons_router)
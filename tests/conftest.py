@@ -0,0 +1,35 @@
+import os
+import tempfile
+
+# session.py lee DATABASE_URL al importarse: la BD de pruebas se fija antes de importar la app
+_tmp_dir = tempfile.mkdtemp(prefix="porras-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'test.db')}"
+
+import pytest
+
+from app.db.models import _all  # noqa: F401  (registra todos los modelos)
+from app.db.session import SessionLocal
+from app.services.achievement_catalog import invalidate_achievement_catalog
+from app.services.response_cache import clear_response_cache
+from app.services.season_rules import invalidate_season_rules
+from app.services.simulation import invalidate_gp_snapshots
+from benchmarks.dataset import build_dataset
+
+@pytest.fixture
+def dataset():
+    """
+    Dataset determinista pequeño (el de los benchmarks) recreado en cada test:
+    2 temporadas, la segunda activa y con GPs aún sin resultado.
+    """
+    # Las cachés en proceso no deben sobrevivir a la BD anterior
+    invalidate_season_rules()
+    invalidate_achievement_catalog()
+    invalidate_gp_snapshots()
+    clear_response_cache()
+    return build_dataset(num_users=12, num_seasons=2, gps_per_season=6, seed=7)
+
+@pytest.fixture
+def db(dataset):
+    session = SessionLocal()
+    yield session
+    session.close()
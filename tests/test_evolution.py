@@ -0,0 +1,103 @@
+import contextlib
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.api.stats import _evolution
+from app.db.models.grand_prix import GrandPrix
+from app.db.models.prediction import Prediction
+from app.db.models.race_result import RaceResult
+from app.db.models.team import Team
+from app.db.models.user import User
+from app.db.session import engine
+from main import app
+
+MODES = ("total", "base", "multiplier")
+
+def _step(acc, predictions, mode):
+    if mode == "base":
+        return acc + sum(p.points_base for p in predictions)
+    if mode == "total":
+        return acc + sum(p.points for p in predictions)
+    for p in predictions:
+        acc *= p.multiplier
+    return acc
+
+def old_user_evolution(db, season_id, mode):
+    """/stats/evolution?type=users de antes: una query de predicciones por usuario."""
+    response = {}
+    for user in db.query(User).all():
+        preds = (
+            db.query(Prediction).join(GrandPrix).join(RaceResult, RaceResult.gp_id == GrandPrix.id)
+            .filter(Prediction.user_id == user.id, GrandPrix.season_id == season_id)
+            .order_by(GrandPrix.race_datetime)
+            .all()
+        )
+        acc, series = (1.0 if mode == "multiplier" else 0), []
+        for p in preds:
+            acc = _step(acc, [p], mode)
+            series.append({"gp_id": p.gp_id, "value": round(acc, 4)})
+        response[user.username] = series
+    return response
+
+def old_team_evolution(db, season_id, mode):
+    """Lo mismo por equipo: predicciones de los miembros agrupadas por GP."""
+    response = {}
+    for team in db.query(Team).filter(Team.season_id == season_id):
+        preds = (
+            db.query(Prediction).join(GrandPrix).join(RaceResult, RaceResult.gp_id == GrandPrix.id)
+            .filter(Prediction.user_id.in_([m.user_id for m in team.members]), GrandPrix.season_id == season_id)
+            .order_by(GrandPrix.race_datetime, Prediction.user_id)
+            .all()
+        )
+        by_gp = {}
+        for p in preds:
+            by_gp.setdefault(p.gp_id, []).append(p)
+        acc, series = (1.0 if mode == "multiplier" else 0), []
+        for gp_id in sorted(by_gp):
+            acc = _step(acc, by_gp[gp_id], mode)
+            series.append({"gp_id": gp_id, "value": round(acc, 4)})
+        response[team.name] = series
+    return response
+
+@contextlib.contextmanager
+def count_selects():
+    statements = []
+    def listener(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+@pytest.mark.parametrize("mode", MODES)
+def test_evolution_matches_the_per_user_queries(db, dataset, mode):
+    client = TestClient(app)
+    for season_id in range(1, dataset["seasons"] + 1):
+        users = client.get("/stats/evolution", params={"season_id": season_id, "type": "users", "mode": mode}).json()
+        assert users == old_user_evolution(db, season_id, mode)
+
+        teams = _evolution(db, season_id, "teams", None, None, mode, columnar=False)
+        assert teams and teams == old_team_evolution(db, season_id, mode)
+
+def test_columnar_format_carries_the_same_points(db, dataset):
+    rows = _evolution(db, 1, "users", None, None, "total", columnar=False)
+    columnar = _evolution(db, 1, "users", None, None, "total", columnar=True)
+
+    assert set(columnar["series"]) == set(rows)
+    for name, values in columnar["series"].items():
+        assert len(values) == len(columnar["gp_ids"])
+        assert [
+            {"gp_id": gp_id, "value": value} for gp_id, value in zip(columnar["gp_ids"], values) if value is not None
+        ] == rows[name]
+
+def test_query_count_does_not_grow_with_the_users(db, dataset):
+    one_user = [db.query(User.id).order_by(User.id).first()[0]]
+    with count_selects() as single:
+        _evolution(db, 1, "users", one_user, None, "total", columnar=False)
+    with count_selects() as everyone:
+        _evolution(db, 1, "users", None, None, "total", columnar=False)
+    assert len(everyone) == len(single)
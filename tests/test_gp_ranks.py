@@ -0,0 +1,52 @@
+from sqlalchemy import func, update
+
+from app.api.stats import _calculate_stats
+from app.db.models.prediction import Prediction
+from app.services.results_service import refresh_gp_ranks
+
+def counted_rank(db, prediction):
+    """Puesto y percentil como los calculaba stats antes: dos COUNT por predicción."""
+    better = db.query(func.count(Prediction.id)).filter(
+        Prediction.gp_id == prediction.gp_id, Prediction.points > prediction.points
+    ).scalar()
+    worse = db.query(func.count(Prediction.id)).filter(
+        Prediction.gp_id == prediction.gp_id, Prediction.points < prediction.points
+    ).scalar()
+    total = db.query(func.count(Prediction.id)).filter(Prediction.gp_id == prediction.gp_id).scalar()
+    percentile = 100 - int(worse / (total - 1) * 100) if total > 1 else 100
+    return better + 1, percentile
+
+def test_ranks_match_the_count_queries_with_ties(db, dataset):
+    # Empates forzados: tres predicciones en cabeza y dos a cero en el mismo GP
+    gp_id = dataset["completed_gp_ids"][0]
+    ids = [pid for (pid,) in db.query(Prediction.id).filter(Prediction.gp_id == gp_id).order_by(Prediction.id)]
+    db.execute(update(Prediction).where(Prediction.id.in_(ids[:3])).values(points=999))
+    db.execute(update(Prediction).where(Prediction.id.in_(ids[3:5])).values(points=0))
+    db.commit()
+    stamps = dict(db.query(Prediction.id, Prediction.updated_at))
+
+    assert refresh_gp_ranks(db, dataset["completed_gp_ids"])
+    db.commit()
+    db.expire_all()
+
+    for prediction in db.query(Prediction).filter(Prediction.gp_id.in_(dataset["completed_gp_ids"])):
+        assert (prediction.gp_rank, prediction.gp_percentile) == counted_rank(db, prediction), prediction.id
+    assert {db.get(Prediction, pid).gp_rank for pid in ids[:3]} == {1}
+    # El puesto no cuenta como edición de la predicción (anticipación del radar)
+    assert dict(db.query(Prediction.id, Prediction.updated_at)) == stamps
+
+    # Sin cambios de puntos no hay nada que reescribir
+    assert refresh_gp_ranks(db, dataset["completed_gp_ids"]) == 0
+
+def test_profile_trophies_use_the_stored_ranks(db, dataset):
+    user_id = db.query(Prediction.user_id).order_by(Prediction.user_id).first()[0]
+    # BD sin puestos: el primer perfil los calcula
+    assert db.query(Prediction.id).filter(Prediction.gp_rank.isnot(None)).count() == 0
+    stats = _calculate_stats(db, user_id)
+
+    predictions = db.query(Prediction).filter(Prediction.user_id == user_id).all()
+    ranks = [counted_rank(db, p)[0] for p in predictions]
+    assert stats["trophies"] == {"gold": ranks.count(1), "silver": ranks.count(2), "bronze": ranks.count(3)}
+
+    best = max(predictions, key=lambda p: p.points)
+    assert stats["insights"]["best_race"]["percentile"] == f"Top {max(1, counted_rank(db, best)[1])}%"
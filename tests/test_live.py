@@ -0,0 +1,24 @@
+import asyncio
+
+from app.services import live
+
+def test_channel_is_only_kept_while_someone_listens(monkeypatch):
+    monkeypatch.setattr(live.LiveGpChannel, "_compute", lambda self, positions, events: {"positions": positions})
+
+    # Nadie escucha: no se crea canal ni se guarda nada pendiente
+    live.publish_live_positions(1, {1: "VER"}, {})
+    assert 1 not in live._channels
+
+    async def scenario():
+        channel = live.get_live_channel(1)
+        queue = channel.subscribe()
+        live.publish_live_positions(1, {1: "NOR"}, {})
+        version, data = await asyncio.wait_for(queue.get(), timeout=5)
+        assert (version, data) == (1, '{"positions": {"1": "NOR"}}')
+
+        channel.unsubscribe(queue)
+        live.publish_live_positions(1, {1: "LEC"}, {})
+        return channel
+
+    channel = asyncio.run(scenario())
+    assert 1 not in live._channels and channel._pending is None
@@ -0,0 +1,83 @@
+from sqlalchemy.orm import selectinload
+
+from app.api.admin import delete_driver
+from app.db.models.constructor import Constructor
+from app.db.models.driver import Driver
+from app.db.models.grand_prix import GrandPrix
+from app.db.models.prediction import Prediction
+from app.services.packing import pack_positions, unpack_positions
+from app.services.response_cache import bump_data_version, bump_rules_version
+from app.services.scoring import ResultIndex, build_result_index, calculate_prediction_score, score_gp_batch
+from app.services.season_rules import get_season_rules
+
+def rows_of(owner):
+    return sorted((p.position, p.driver_name) for p in owner.positions)
+
+def season_owners(db, season_id):
+    """Resultados y predicciones de la temporada, con sus filas de posiciones."""
+    gps = db.query(GrandPrix).filter(GrandPrix.season_id == season_id).all()
+    owners = [gp.race_result for gp in gps if gp.race_result]
+    owners += (
+        db.query(Prediction)
+        .options(selectinload(Prediction.positions))
+        .filter(Prediction.gp_id.in_([gp.id for gp in gps]))
+        .all()
+    )
+    return owners
+
+def test_packed_positions_decode_to_their_rows(db, dataset):
+    for season_id in range(1, dataset["seasons"] + 1):
+        roster = get_season_rules(db, season_id).roster
+        for owner in season_owners(db, season_id):
+            assert owner.packed_positions is not None
+            assert [tuple(p) for p in unpack_positions(owner.packed_positions, roster)] == rows_of(owner)
+
+def test_unrepresentable_positions_are_not_packed(db, dataset):
+    slots = get_season_rules(db, 1).roster_slots
+    first, second = list(slots)[:2]
+    assert pack_positions([(1, first), (2, first)], slots) is None     # piloto repetido
+    assert pack_positions([(1, first), (1, second)], slots) is None    # posición repetida
+    assert pack_positions([(25, first)], slots) is None                 # fuera del array
+    assert pack_positions([(1, "XXX")], slots) is None                  # fuera de la parrilla
+    assert pack_positions([], slots) == bytes([255]) * 24
+
+def test_deleting_a_driver_repacks_the_season(db, dataset):
+    before = get_season_rules(db, 1)
+    # El primero de la parrilla: todos los demás índices se desplazan
+    driver = (
+        db.query(Driver).join(Constructor).filter(Constructor.season_id == 1).order_by(Driver.id).first()
+    )
+    code = driver.code
+    assert before.roster[0] == code
+    delete_driver(driver.id, current_user=None)
+
+    db.expire_all()
+    rules = get_season_rules(db, 1)
+    assert rules is not before and code not in rules.roster
+    for owner in season_owners(db, 1):
+        if code in {name for _, name in rows_of(owner)}:
+            assert owner.packed_positions is None
+        else:
+            assert [tuple(p) for p in unpack_positions(owner.packed_positions, rules.roster)] == rows_of(owner)
+
+    # El camino empaquetado puntúa igual que leer las filas por nombre
+    for gp_id in dataset["completed_gp_ids"]:
+        gp = db.get(GrandPrix, gp_id)
+        if gp.season_id != 1:
+            continue
+        predictions = db.query(Prediction).filter(Prediction.gp_id == gp_id).order_by(Prediction.id).all()
+        by_name = ResultIndex.from_pairs(rows_of(gp.race_result), {e.event_type: e.value for e in gp.race_result.events})
+        assert score_gp_batch(predictions, build_result_index(gp.race_result, rules.roster), rules.multipliers) == [
+            calculate_prediction_score(p, by_name, rules.multipliers) for p in predictions
+        ]
+
+def test_only_rules_changes_reload_the_rules(db, dataset):
+    rules = get_season_rules(db, 1)
+    bump_data_version(db, 1)
+    db.commit()
+    assert get_season_rules(db, 1) is rules
+
+    bump_rules_version(db, 1)
+    db.commit()
+    assert get_season_rules(db, 1) is not rules
+    assert get_season_rules(db, 2) is get_season_rules(db, 2)
@@ -0,0 +1,107 @@
+import statistics
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import update
+
+from app.db.models.grand_prix import GrandPrix
+from app.db.models.prediction import Prediction
+from app.db.models.race_result import RaceResult
+from app.db.models.user import User
+from app.db.models.user_stats import UserProfileMetrics
+from app.services.profile_metrics import RADAR_AXES, load_profile_metrics, refresh_profile_metrics
+from app.services.results_service import save_race_result
+
+AXES = [column for column, _, _ in RADAR_AXES]
+
+def _utc(dt):
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+def spider_metrics(db):
+    """El "bucle araña" original de stats._calculate_stats: usuario a usuario, leyendo las filas."""
+    gps_dates = {gp.id: _utc(gp.race_datetime) for gp in db.query(GrandPrix)}
+    participation = {}
+    for p in db.query(Prediction):
+        participation[p.gp_id] = participation.get(p.gp_id, 0) + 1
+    official = {
+        rr.gp_id: ({p.position: p.driver_name for p in rr.positions}, {e.event_type: e.value for e in rr.events})
+        for rr in db.query(RaceResult)
+    }
+
+    metrics = {}
+    for user in db.query(User):
+        preds = db.query(Prediction).filter(Prediction.user_id == user.id).all()
+        if not preds:
+            continue
+        created = _utc(user.created_at) if user.created_at else datetime.min.replace(tzinfo=timezone.utc)
+        relevant = sum(1 for d in gps_dates.values() if d > created)
+        deltas = [max(0, (gps_dates[p.gp_id] - _utc(p.updated_at)).total_seconds()) for p in preds]
+
+        hits = possible = 0
+        for p in preds:
+            if p.gp_id not in official:
+                continue
+            positions, events = official[p.gp_id]
+            for pp in p.positions:
+                possible += 1
+                hits += positions.get(pp.position) == pp.driver_name
+            for pe in p.events:
+                possible += 1
+                hits += events.get(pe.event_type, "").lower() == pe.value.lower()
+
+        points = [p.points for p in preds]
+        metrics[user.id] = {
+            "regularity": statistics.variance(points) if len(points) >= 3 else 999999,
+            "commitment": 1.0 if relevant == 0 else len(preds) / relevant,
+            "anticipation": statistics.mean(deltas) if deltas else 0,
+            "podium": sum(p.points * participation[p.gp_id] for p in preds) / len(preds),
+            "vidente": hits / possible if possible else 0,
+        }
+    return metrics
+
+def stored_metrics(db):
+    db.expire_all()
+    return {row.user_id: {axis: getattr(row, axis) for axis in AXES} for row in db.query(UserProfileMetrics)}
+
+def assert_matches_spider(db):
+    expected = spider_metrics(db)
+    stored = stored_metrics(db)
+    assert stored.keys() == expected.keys()
+    for user_id, values in expected.items():
+        assert stored[user_id] == pytest.approx(values), user_id
+
+def test_first_radar_read_fills_the_table_with_the_original_values(db, dataset):
+    assert db.query(UserProfileMetrics).count() == 0
+    user_id = db.query(Prediction.user_id).first()[0]
+    row, bounds = load_profile_metrics(db, user_id)
+
+    assert row.user_id == user_id
+    assert_matches_spider(db)
+    expected = spider_metrics(db).values()
+    for axis in AXES:
+        assert bounds[axis] == pytest.approx((min(m[axis] for m in expected), max(m[axis] for m in expected)))
+
+def test_single_user_refresh_only_rewrites_that_user(db, dataset):
+    refresh_profile_metrics(db)
+    db.commit()
+    target, other = [uid for (uid,) in db.query(UserProfileMetrics.user_id).order_by(UserProfileMetrics.user_id)][:2]
+    db.execute(update(UserProfileMetrics).values(vidente=-1.0))
+    db.commit()
+
+    refresh_profile_metrics(db, [target])
+    db.commit()
+    stored = stored_metrics(db)
+    assert stored[target] == pytest.approx(spider_metrics(db)[target])
+    assert stored[other]["vidente"] == -1.0
+
+def test_result_correction_refreshes_the_predictors(db, dataset):
+    refresh_profile_metrics(db)
+    db.commit()
+
+    gp = db.get(GrandPrix, dataset["completed_gp_ids"][-1])
+    positions = {p.position: p.driver_name for p in gp.race_result.positions}
+    events = {e.event_type: e.value for e in gp.race_result.events}
+    positions[1], positions[4] = positions[4], positions[1]
+    save_race_result(db, gp, positions, events)
+
+    assert_matches_spider(db)
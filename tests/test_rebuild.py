@@ -0,0 +1,88 @@
+import contextlib
+import io
+
+from app.db.models.achievement import UserAchievement
+from app.db.models.multiplier_config import MultiplierConfig
+from app.db.models.rebuild_job import RebuildJob
+from app.db.models.user_stats import UserStats, UserGpStats, UserSeasonStats
+from app.services.achievements_service import AchievementReplay, rebuild_all_achievements
+from app.services.parallel_rebuild import rebuild_all_achievements_parallel
+from app.services.rebuild_jobs import create_rebuild_job, reopen_rebuild_job, run_rebuild_job
+from app.services.rescoring import rescore_season
+
+# Columnas que dependen de cuándo se escribió, no de lo que se calculó
+IGNORED_COLUMNS = {"id", "unlocked_at", "created_at", "updated_at"}
+
+def _snapshot(db):
+    """Contenido de las tablas que reconstruyen los tres caminos, sin IDs ni fechas."""
+    db.expire_all()
+    snapshot = {}
+    for model in (UserStats, UserGpStats, UserSeasonStats, UserAchievement):
+        columns = [c for c in model.__table__.columns if c.name not in IGNORED_COLUMNS]
+        snapshot[model.__tablename__] = sorted(
+            (tuple(row) for row in db.execute(model.__table__.select().with_only_columns(*columns))),
+            key=repr,
+        )
+    return snapshot
+
+def _quiet(fn, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+def test_serial_job_and_parallel_rebuilds_are_equivalent(db, dataset):
+    _quiet(rebuild_all_achievements, db)
+    serial = _snapshot(db)
+    assert serial["user_gp_stats"] and serial["user_achievements"]
+
+    job = create_rebuild_job(db)
+    _quiet(run_rebuild_job, job.id)
+    db.expire_all()
+    assert db.get(RebuildJob, job.id).status == "DONE"
+    assert _snapshot(db) == serial
+
+    _quiet(rebuild_all_achievements_parallel, db, workers=2)
+    assert _snapshot(db) == serial
+
+def test_failed_job_resumes_to_the_serial_result(db, dataset, monkeypatch):
+    _quiet(rebuild_all_achievements, db)
+    serial = _snapshot(db)
+
+    job = create_rebuild_job(db)
+    failing_at = job.total_gps // 2
+    replay_gp = AchievementReplay.replay_gp
+    replayed = []
+
+    def crashing_replay_gp(self, gp, closes_season):
+        if len(replayed) == failing_at:
+            raise RuntimeError("caída simulada")
+        replayed.append(gp.id)
+        return replay_gp(self, gp, closes_season)
+
+    monkeypatch.setattr(AchievementReplay, "replay_gp", crashing_replay_gp)
+    _quiet(run_rebuild_job, job.id)
+    db.expire_all()
+    job = db.get(RebuildJob, job.id)
+    assert (job.status, job.processed_gps) == ("FAILED", failing_at)
+
+    # Se reanuda desde el checkpoint del último GP confirmado, no desde cero
+    monkeypatch.setattr(AchievementReplay, "replay_gp", replay_gp)
+    assert reopen_rebuild_job(db, job.id)
+    _quiet(run_rebuild_job, job.id)
+    db.expire_all()
+    assert db.get(RebuildJob, job.id).status == "DONE"
+    assert _snapshot(db) == serial
+
+def test_season_rescore_replays_achievements_in_order(db, dataset):
+    _quiet(rebuild_all_achievements, db)
+    for mc in db.query(MultiplierConfig).filter(MultiplierConfig.season_id == 1):
+        mc.multiplier = 3.0
+    db.commit()
+
+    report = _quiet(rescore_season, db, 1, workers=1)
+    assert report["changed_rows"] and report["rebuild_job_id"]
+    _quiet(run_rebuild_job, report["rebuild_job_id"])
+    rescored = _snapshot(db)
+
+    # Mismo estado que una reconstrucción desde cero con los puntos nuevos
+    _quiet(rebuild_all_achievements, db)
+    assert rescored == _snapshot(db)
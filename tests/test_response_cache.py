@@ -0,0 +1,74 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+
+from app.db.models.achievement import Achievement, AchievementRarity
+from app.db.models.grand_prix import GrandPrix
+from app.db.models.prediction import Prediction
+from app.services.achievement_catalog import get_achievement_catalog
+from app.services.response_cache import bump_data_version, bump_rules_version
+from main import app
+
+@pytest.fixture
+def client(dataset):
+    return TestClient(app)
+
+def _bump(db, season_id=None):
+    bump_data_version(db, season_id)
+    db.commit()
+
+def test_matching_etag_returns_304(client, dataset):
+    url = "/standings/season/1"
+    first = client.get(url)
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == "no-cache"
+    etag = first.headers["etag"]
+
+    again = client.get(url, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["etag"] == etag
+    assert again.content == b""
+
+    # Comparación débil y listas de etiquetas (RFC 9110)
+    assert client.get(url, headers={"If-None-Match": f'"otra", W/{etag}'}).status_code == 304
+    assert client.get(url, headers={"If-None-Match": '"otra"'}).status_code == 200
+
+def test_bump_invalidates_only_its_season(client, db, dataset):
+    season_1 = client.get("/standings/season/1").headers["etag"]
+    season_2 = client.get("/standings/season/2").headers["etag"]
+
+    _bump(db, 2)
+    assert client.get("/standings/season/1", headers={"If-None-Match": season_1}).status_code == 304
+    assert client.get("/standings/season/2", headers={"If-None-Match": season_2}).status_code == 200
+
+    # La fila global (usuarios, temporadas) invalida todas
+    _bump(db)
+    assert client.get("/standings/season/1", headers={"If-None-Match": season_1}).status_code == 200
+
+def test_cached_body_is_served_until_the_version_changes(client, db, dataset):
+    gp_id = dataset["completed_gp_ids"][0]
+    url = f"/standings/gp/{gp_id}"
+    before = client.get(url).json()
+
+    # Escritura sin subir la versión: la respuesta cacheada sigue valiendo
+    db.execute(update(Prediction).where(Prediction.gp_id == gp_id).values(points=Prediction.points + 1000))
+    db.commit()
+    assert client.get(url).json() == before
+
+    _bump(db, db.get(GrandPrix, gp_id).season_id)
+    after = client.get(url).json()
+    assert [row["points"] for row in after] == [row["points"] + 1000 for row in before]
+
+def test_catalog_reloads_when_another_worker_bumps_the_rules(db, dataset):
+    catalog = get_achievement_catalog(db)
+    slug, entry = next(iter(catalog.by_slug.items()))
+    rarity = next(r for r in AchievementRarity if r != entry.rarity)
+
+    # Otro worker re-tipa el logro: sin invalidar la caché de este proceso
+    db.execute(update(Achievement).where(Achievement.id == entry.id).values(rarity=rarity))
+    _bump(db)
+    assert get_achievement_catalog(db) is catalog
+
+    bump_rules_version(db)
+    db.commit()
+    assert get_achievement_catalog(db).get(slug).rarity == rarity
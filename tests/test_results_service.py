@@ -0,0 +1,89 @@
+from sqlalchemy import update
+
+from app.api.admin import upsert_prediction_admin
+from app.db.models.grand_prix import GrandPrix
+from app.db.models.prediction import Prediction
+from app.db.models.race_result import RaceResult
+from app.services import results_service
+from app.services.results_service import save_race_result
+
+def _payload(gp):
+    positions = {p.position: p.driver_name for p in gp.race_result.positions}
+    events = {e.event_type: e.value for e in gp.race_result.events}
+    return positions, events
+
+def _scores(db, gp_id):
+    db.expire_all()
+    return {
+        row.id: (row.points, row.points_base, row.multiplier)
+        for row in db.query(Prediction).filter(Prediction.gp_id == gp_id)
+    }
+
+def _corrected(positions, events):
+    """Corrección típica: P9 y P10 intercambiados y otra vuelta rápida."""
+    positions = dict(positions)
+    positions[9], positions[10] = positions[10], positions[9]
+    events = dict(events, FASTEST_LAP=positions[3])
+    return positions, events
+
+def test_delta_rescore_matches_full_rescore(db, dataset):
+    gp = db.get(GrandPrix, dataset["completed_gp_ids"][1])
+    positions, events = _corrected(*_payload(gp))
+
+    report = save_race_result(db, gp, positions, events)
+    assert not report["full"]
+    assert report["changed_rows"]
+    delta = _scores(db, gp.id)
+
+    # Un full=True con el mismo resultado no debe encontrar nada que corregir
+    report = save_race_result(db, gp, positions, events, full=True)
+    assert report["full"]
+    assert report["changed_rows"] == []
+    assert _scores(db, gp.id) == delta
+
+def test_same_result_resave_repairs_scores(db, dataset):
+    gp = db.get(GrandPrix, dataset["completed_gp_ids"][0])
+    before = _scores(db, gp.id)
+    db.execute(update(Prediction).where(Prediction.gp_id == gp.id).values(points=0, points_base=0, multiplier=1.0))
+    db.commit()
+
+    report = save_race_result(db, gp, *_payload(gp))
+    assert report["full"]
+    assert _scores(db, gp.id) == before
+
+def test_unscored_gp_gets_a_full_rescore_on_correction(db, dataset):
+    gp = db.get(GrandPrix, dataset["completed_gp_ids"][2])
+    original = _payload(gp)
+    corrected = _corrected(*original)
+
+    # Predicciones a cero (también las que la corrección no toca) en un GP nunca puntuado entero
+    db.execute(update(Prediction).where(Prediction.gp_id == gp.id).values(points=0, points_base=0, multiplier=1.0))
+    db.execute(update(RaceResult).where(RaceResult.gp_id == gp.id).values(scored_at=None))
+    db.commit()
+
+    report = save_race_result(db, gp, *corrected)
+    assert report["full"]
+    assert save_race_result(db, gp, *corrected, full=True)["changed_rows"] == []
+
+    # Ya puntuado entero: la siguiente corrección vuelve a ser delta
+    assert not save_race_result(db, gp, *original)["full"]
+
+def test_admin_upsert_evaluates_users_whose_gp_context_changed(db, dataset, monkeypatch):
+    gp = db.get(GrandPrix, dataset["completed_gp_ids"][3])
+    positions, events = _payload(gp)
+    predictions = db.query(Prediction).filter(Prediction.gp_id == gp.id).all()
+    old_max = max(p.points for p in predictions)
+    previous_leaders = {p.user_id for p in predictions if p.points == old_max}
+    user_id = next(p.user_id for p in predictions if p.points < old_max)
+
+    evaluated = set()
+    monkeypatch.setattr(
+        results_service, "evaluate_race_achievements",
+        lambda db, gp_id, user_ids=None: evaluated.update(user_ids or ()),
+    )
+    # Un pleno: supera el máximo del GP y quienes lo tenían pierden el Lobo Solitario
+    upsert_prediction_admin(user_id, gp.id, positions, events, current_user=None)
+
+    db.expire_all()
+    assert db.query(Prediction.points).filter(Prediction.user_id == user_id, Prediction.gp_id == gp.id).scalar() > old_max
+    assert {user_id} | previous_leaders <= evaluated
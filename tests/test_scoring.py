@@ -0,0 +1,59 @@
+import random
+
+from sqlalchemy.orm import selectinload
+
+from app.db.models.grand_prix import GrandPrix
+from app.db.models.prediction import Prediction
+from app.services.scoring import ResultIndex, build_result_index, calculate_prediction_score, score_gp_batch
+from app.services.season_rules import get_season_rules
+from app.services.simulation import SnapshotEvent, SnapshotPosition, SnapshotPrediction
+from app.scripts.seed_data_long_run import generate_prediction, generate_race_result
+
+def _single(predictions, index, multipliers):
+    return [calculate_prediction_score(p, index, multipliers) for p in predictions]
+
+def test_batch_matches_single_scorer_on_packed_predictions(db, dataset):
+    """Camino rápido: resultado y predicciones con packed_positions."""
+    for gp_id in dataset["completed_gp_ids"]:
+        gp = db.get(GrandPrix, gp_id)
+        rules = get_season_rules(db, gp.season_id)
+        predictions = (
+            db.query(Prediction)
+            .options(selectinload(Prediction.events))
+            .filter(Prediction.gp_id == gp_id)
+            .order_by(Prediction.id)
+            .all()
+        )
+        index = build_result_index(gp.race_result, rules.roster)
+        assert index.packed is not None
+
+        assert score_gp_batch(predictions, index, rules.multipliers) == _single(predictions, index, rules.multipliers)
+
+def test_batch_matches_single_scorer_on_edge_cases(db, dataset):
+    """Camino por nombre: huecos, pilotos repetidos o desconocidos y eventos raros."""
+    gp = db.get(GrandPrix, dataset["completed_gp_ids"][0])
+    rules = get_season_rules(db, gp.season_id)
+    roster = list(rules.roster)
+    # Los generadores de seed_data_long_run usan el random global
+    random.seed(3)
+
+    for _ in range(5):
+        real_pos, real_evts = generate_race_result(roster)
+        index = ResultIndex.from_mappings(dict(enumerate(real_pos, start=1)), real_evts)
+
+        predictions = []
+        for uid in range(40):
+            pred_pos, pred_evts = generate_prediction(real_pos, real_evts, random.random())
+            positions = [SnapshotPosition(i + 1, d) for i, d in enumerate(pred_pos[:10])]
+            if uid % 5 == 1:
+                positions[random.randrange(10)] = SnapshotPosition(random.randrange(1, 11), positions[0].driver_name)
+            elif uid % 5 == 2:
+                positions = positions[: random.randrange(0, 4)]
+            elif uid % 5 == 3:
+                positions[random.randrange(3)] = SnapshotPosition(1, "XXX")
+            events = [SnapshotEvent(k, v) for k, v in pred_evts.items()]
+            if uid % 7 == 0:
+                events.append(SnapshotEvent("FASTEST_LAP", f"  {real_evts['FASTEST_LAP'].lower()} "))
+            predictions.append(SnapshotPrediction(uid, tuple(positions), tuple(events)))
+
+        assert score_gp_batch(predictions, index, rules.multipliers) == _single(predictions, index, rules.multipliers)
@@ -0,0 +1,62 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import func
+
+from app.db.models.grand_prix import GrandPrix
+from app.db.models.multiplier_config import MultiplierConfig
+from app.db.models.prediction import Prediction
+from app.db.models.user_stats import UserStats, UserGpStats, UserSeasonStats
+from app.services.achievements_service import rebuild_all_achievements
+from app.services.rescoring import rescore_season
+from app.services.results_service import save_race_result
+from main import app
+
+def prediction_sums(db, season_id):
+    """La query de /standings/season antes de user_season_stats: suma de Prediction.points."""
+    return dict(
+        db.query(Prediction.user_id, func.coalesce(func.sum(Prediction.points), 0))
+        .join(GrandPrix, GrandPrix.id == Prediction.gp_id)
+        .filter(GrandPrix.season_id == season_id)
+        .group_by(Prediction.user_id)
+    )
+
+def assert_stats_match_predictions(db, dataset):
+    db.expire_all()
+    for season_id in range(1, dataset["seasons"] + 1):
+        season_points = dict(
+            db.query(UserSeasonStats.user_id, UserSeasonStats.points).filter(UserSeasonStats.season_id == season_id)
+        )
+        assert season_points == prediction_sums(db, season_id)
+
+    total = dict(db.query(Prediction.user_id, func.sum(Prediction.points)).group_by(Prediction.user_id))
+    assert dict(db.query(UserStats.user_id, UserStats.total_points)) == total
+
+    gp_points = {(s.user_id, s.gp_id): s.points for s in db.query(UserGpStats)}
+    assert gp_points == {
+        (p.user_id, p.gp_id): p.points for p in db.query(Prediction).filter(Prediction.gp_id.in_(dataset["completed_gp_ids"]))
+    }
+
+def test_correcting_an_earlier_gp_updates_season_totals(db, dataset):
+    rebuild_all_achievements(db)
+    assert_stats_match_predictions(db, dataset)
+
+    # Corrección de un GP que ya no es el último jugado de nadie
+    gp = db.get(GrandPrix, dataset["completed_gp_ids"][0])
+    positions = {p.position: p.driver_name for p in gp.race_result.positions}
+    events = {e.event_type: e.value for e in gp.race_result.events}
+    positions[1], positions[2] = positions[2], positions[1]
+    positions[5], positions[9] = positions[9], positions[5]
+    assert save_race_result(db, gp, positions, events)["changed_rows"]
+
+    assert_stats_match_predictions(db, dataset)
+
+    standings = TestClient(app).get(f"/standings/season/{gp.season_id}").json()
+    assert {row["id"]: row["points"] for row in standings} == prediction_sums(db, gp.season_id)
+
+def test_season_rescore_updates_season_totals(db, dataset):
+    rebuild_all_achievements(db)
+    for mc in db.query(MultiplierConfig).filter(MultiplierConfig.season_id == 1):
+        mc.multiplier *= 2
+    db.commit()
+
+    assert rescore_season(db, 1, workers=1)["changed_rows"]
+    assert_stats_match_predictions(db, dataset)